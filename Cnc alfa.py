@@ -1,9 +1,9 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QGraphicsView, QGraphicsScene, QFileDialog, QGraphicsEllipseItem,QSizePolicy
-from PyQt5.QtCore import Qt, QRectF, QPointF, QPoint
-from PyQt5.QtGui import QWheelEvent ,QIcon, QPixmap
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QGraphicsView, QGraphicsScene, QFileDialog, QGraphicsEllipseItem,QSizePolicy, QProgressBar
+from PyQt5.QtCore import Qt, QPointF, QPoint
+from PyQt5.QtGui import QWheelEvent ,QIcon, QPixmap, QPen
 
-import svgpathtools
+from preview import ProgressiveLoader, SvgPreview, iter_preview_paths
 
 
 class CNCPlasmaWindow(QMainWindow):
@@ -27,6 +27,8 @@ class CNCPlasmaWindow(QMainWindow):
         self.map_scene = QGraphicsScene()
         self.map_view.setScene(self.map_scene)
         self.layout.addWidget(self.map_view)
+        self.preview = None
+        self.loader = None
 
         #  control
         control_layout = QVBoxLayout()
@@ -85,6 +87,16 @@ class CNCPlasmaWindow(QMainWindow):
         self.map_scene.addItem(self.pointer_item)
         self.pointer_pos = QPointF(0, 0)  
 
+        # avance de la carga
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.cancel_load_button = QPushButton("Cancelar")
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_load_button)
+        self.progress_bar.hide()
+        self.cancel_load_button.hide()
+
     def move_pointer(self, dx, dy):
         new_x = self.pointer_pos.x() + dx
         new_y = self.pointer_pos.y() + dy
@@ -111,60 +123,64 @@ class CNCPlasmaWindow(QMainWindow):
             self.draw_svg(file_path)
 
     def draw_svg(self, file_path):
-        self.map_scene.clear()
-        paths, _ = svgpathtools.svg2paths(file_path)
-        min_x = float('inf')
-        min_y = float('inf')
-        max_x = float('-inf')
-        max_y = float('-inf')
-        for path in paths:
-            for segment in path:
-                if isinstance(segment, svgpathtools.Line):
-                    start = segment.start
-                    end = segment.end
-                    min_x = min(min_x, start.real, end.real)
-                    max_x = max(max_x, start.real, end.real)
-                    min_y = min(min_y, start.imag, end.imag)
-                    max_y = max(max_y, start.imag, end.imag)
-                elif isinstance(segment, svgpathtools.CubicBezier):
-                    points = segment.bpoints()
-                    for point in points:
-                        min_x = min(min_x, point.real)
-                        max_x = max(max_x, point.real)
-                        min_y = min(min_y, point.imag)
-                        max_y = max(max_y, point.imag)
-        width = max_x - min_x
-        height = max_y - min_y
-        view_rect = QRectF(min_x, -max_y, width, height)
+        # Un QGraphicsPathItem por camino del SVG, muestreado según el zoom.
+        # El archivo se lee en un hilo y los caminos se dibujan por lotes
+        self.cancel_loading()
+        if self.preview is not None:
+            self.preview.clear(self.map_scene)
+        self.preview = SvgPreview([], flip_y=True, pen=QPen(Qt.black, 0))
+        self.loader = ProgressiveLoader(iter_preview_paths(file_path), self)
+        self.loader.batch.connect(self.on_load_batch)
+        self.loader.finished.connect(self.on_load_finished)
+        self.loader.failed.connect(self.on_load_failed)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_load_button.show()
+        self.loader.start()
+
+    def on_load_batch(self, kind, paths, fraction):
+        first = not self.preview.paths
+        view_rect = self.preview.extend(self.map_scene, paths, self.map_view.transform().m11())
         self.map_scene.setSceneRect(view_rect)
+        if first:
+            self.map_view.fitInView(view_rect, Qt.KeepAspectRatio)
+        self.progress_bar.setValue(int(fraction * 100))
 
-       
-
-        for path in paths:
-            for segment in path:
-                if isinstance(segment, svgpathtools.Line):
-                    start = segment.start
-                    end = segment.end
-                    self.map_scene.addLine(start.real, -start.imag, end.real, -end.imag, pen=Qt.black)
-                elif isinstance(segment, svgpathtools.CubicBezier):
-                    start = segment.start
-                    control1 = segment.control1
-                    control2 = segment.control2
-                    end = segment.end
-
-                    num_segments = 20
-                    for i in range(num_segments):
-                        t0 = i / num_segments
-                        t1 = (i + 1) / num_segments
-                        start_point = segment.point(t0)
-                        end_point = segment.point(t1)
-                        self.map_scene.addLine(start_point.real, -start_point.imag, end_point.real, -end_point.imag,pen=Qt.black)
+    def on_load_finished(self, result):
+        self.end_loading()
+        view_rect = self.preview.rect
+        self.map_scene.setSceneRect(view_rect)
+        self.map_view.fitInView(view_rect, Qt.KeepAspectRatio)
+        self.update_detail()
+
+    def on_load_failed(self, error):
+        self.end_loading()
+        print(f"No se pudo leer el SVG: {error}")
+
+    def cancel_loading(self):
+        if self.loader is not None and self.loader.is_running():
+            self.loader.cancel()
+            print("Carga cancelada")
+        self.end_loading()
+
+    def end_loading(self):
+        self.loader = None
+        self.progress_bar.hide()
+        self.cancel_load_button.hide()
+
+    def update_detail(self):
+        # Vuelve a muestrear las curvas solo si la escala cambió lo suficiente
+        scale = self.map_view.transform().m11()
+        if self.preview is not None and self.preview.needs_update(scale):
+            self.preview.render(self.map_scene, scale)
 
     def zoom_in(self):
         self.map_view.scale(1.1, 1.1)
+        self.update_detail()
 
     def zoom_out(self):
         self.map_view.scale(0.9, 0.9)
+        self.update_detail()
 
 
 if __name__ == "__main__":
@@ -1,53 +1,37 @@
 
-import time
-import board
-import digitalio
+from gpio_backend import get_backend
+from coil_stepper import CoilStepper
 
-enable_pin = digitalio.DigitalInOut(board.D18)
-coil_A_1_pin = digitalio.DigitalInOut(board.D4)
-coil_A_2_pin = digitalio.DigitalInOut(board.D17)
-coil_B_1_pin = digitalio.DigitalInOut(board.D23)
-coil_B_2_pin = digitalio.DigitalInOut(board.D24)
+GPIO = get_backend()
 
-enable_pin.direction = digitalio.Direction.OUTPUT
-coil_A_1_pin.direction = digitalio.Direction.OUTPUT
-coil_A_2_pin.direction = digitalio.Direction.OUTPUT
-coil_B_1_pin.direction = digitalio.Direction.OUTPUT
-coil_B_2_pin.direction = digitalio.Direction.OUTPUT
+# Pines BCM (antes board.D18, D4, D17, D23, D24)
+enable_pin = 18
+coil_A_1_pin = 4
+coil_A_2_pin = 17
+coil_B_1_pin = 23
+coil_B_2_pin = 24
 
-enable_pin.value = True
+STEP_MODE = "half"  # "full", "half" o "wave"
+ACCELERATION = 2000.0  # Fases/s², None para arrancar directamente a la velocidad pedida
 
+GPIO.setwarnings(False)
+GPIO.setmode(GPIO.BCM)
+for pin in (enable_pin, coil_A_1_pin, coil_A_2_pin, coil_B_1_pin, coil_B_2_pin):
+    GPIO.setup(pin, GPIO.OUT)
+
+GPIO.output(enable_pin, GPIO.HIGH)
+
+stepper = CoilStepper(GPIO, (coil_A_1_pin, coil_A_2_pin, coil_B_1_pin, coil_B_2_pin), STEP_MODE)
+
+# Cada paso del usuario recorre la tabla completa; delay es el tiempo por fase
 def forward(delay, steps):
-    i = 0
-    while i in range(0, steps):
-        setStep(1, 0, 1, 0)
-        time.sleep(delay)
-        setStep(0, 1, 1, 0)
-        time.sleep(delay)
-        setStep(0, 1, 0, 1)
-        time.sleep(delay)
-        setStep(1, 0, 0, 1)
-        time.sleep(delay)
-        i += 1
+    stepper.move(steps * len(stepper.table), 1.0 / delay, ACCELERATION)
 
 def backwards(delay, steps):
-    i = 0
-    while i in range(0, steps):
-        setStep(1, 0, 0, 1)
-        time.sleep(delay)
-        setStep(0, 1, 0, 1)
-        time.sleep(delay)
-        setStep(0, 1, 1, 0)
-        time.sleep(delay)
-        setStep(1, 0, 1, 0)
-        time.sleep(delay)
-        i += 1
+    stepper.move(-steps * len(stepper.table), 1.0 / delay, ACCELERATION)
 
 def setStep(w1, w2, w3, w4):
-    coil_A_1_pin.value = w1
-    coil_A_2_pin.value = w2
-    coil_B_1_pin.value = w3
-    coil_B_2_pin.value = w4
+    GPIO.output([coil_A_1_pin, coil_A_2_pin, coil_B_1_pin, coil_B_2_pin], [w1, w2, w3, w4])
 
 while True:
     user_delay = input(":")
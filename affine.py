@@ -0,0 +1,122 @@
+# Transformaciones afines 2D como matrices 3×3 de NumPy.
+
+import math
+import re
+
+import numpy as np
+
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_NUMBER = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+
+
+def identity():
+    return np.eye(3)
+
+
+def matrix(a, b, c, d, e, f):
+    # Mismo orden que matrix() en SVG
+    return np.array([[a, c, e], [b, d, f], [0.0, 0.0, 1.0]])
+
+
+def translate(tx, ty=0.0):
+    return matrix(1.0, 0.0, 0.0, 1.0, tx, ty)
+
+
+def scale(sx, sy=None):
+    return matrix(sx, 0.0, 0.0, sx if sy is None else sy, 0.0, 0.0)
+
+
+def rotate(degrees, cx=0.0, cy=0.0):
+    angle = math.radians(degrees)
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    m = matrix(cos_a, sin_a, -sin_a, cos_a, 0.0, 0.0)
+    if cx or cy:
+        m = translate(cx, cy) @ m @ translate(-cx, -cy)
+    return m
+
+
+def mirror(horizontal=False, vertical=False, cx=0.0, cy=0.0):
+    # Espejo respecto a la vertical x = cx (horizontal) y/o a la horizontal y = cy
+    m = scale(-1.0 if horizontal else 1.0, -1.0 if vertical else 1.0)
+    return translate(cx, cy) @ m @ translate(-cx, -cy)
+
+
+def skew_x(degrees):
+    return matrix(1.0, 0.0, math.tan(math.radians(degrees)), 1.0, 0.0, 0.0)
+
+
+def skew_y(degrees):
+    return matrix(1.0, math.tan(math.radians(degrees)), 0.0, 1.0, 0.0, 0.0)
+
+
+def parse_transform(text):
+    # Atributo transform de SVG: lista de funciones aplicadas de izquierda a derecha
+    result = identity()
+    if not text:
+        return result
+    for name, args in _TRANSFORM.findall(text):
+        values = [float(v) for v in _NUMBER.findall(args)]
+        try:
+            if name == "matrix":
+                m = matrix(*values[:6])
+            elif name == "translate":
+                m = translate(*values[:2])
+            elif name == "scale":
+                m = scale(*values[:2])
+            elif name == "rotate":
+                m = rotate(*values[:3])
+            elif name == "skewX":
+                m = skew_x(values[0])
+            else:
+                m = skew_y(values[0])
+        except (TypeError, IndexError):
+            continue
+        result = result @ m
+    return result
+
+
+def is_identity(m):
+    return np.array_equal(m, np.eye(3))
+
+
+def max_scale(m):
+    # Máximo estiramiento que aplica la matriz (norma espectral de la parte lineal)
+    return float(np.linalg.norm(m[:2, :2], 2))
+
+
+def apply(m, points):
+    # points: arreglo n×2; devuelve un arreglo nuevo
+    return points @ m[:2, :2].T + m[:2, 2]
+
+
+def bounds(m, points):
+    # (min_x, min_y, max_x, max_y) de los puntos transformados, sin guardarlos
+    low, high = np.full(2, np.inf), np.full(2, -np.inf)
+    for first in range(0, len(points), 1 << 20):
+        block = apply(m, np.asarray(points[first:first + (1 << 20)], dtype=np.float64))
+        low = np.minimum(low, block.min(axis=0))
+        high = np.maximum(high, block.max(axis=0))
+    return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+
+def placement(points, width=None, height=None, x=None, y=None, rotation=0.0,
+              mirror_x=False, mirror_y=False):
+    # Matriz que espeja y gira los puntos, los escala al ancho y/o alto pedidos
+    # (con uno solo se conserva la proporción) y lleva su esquina inferior
+    # izquierda a (x, y); lo que no se pide queda como estaba
+    if not len(points):
+        return identity()
+    low_x, low_y, high_x, high_y = bounds(identity(), points)
+    m = mirror(mirror_x, mirror_y, (low_x + high_x) / 2, (low_y + high_y) / 2)
+    if rotation:
+        m = rotate(rotation, (low_x + high_x) / 2, (low_y + high_y) / 2) @ m
+        min_x, min_y, max_x, max_y = bounds(m, points)
+    else:
+        min_x, min_y, max_x, max_y = low_x, low_y, high_x, high_y
+    size_x, size_y = max_x - min_x, max_y - min_y
+    sx = width / size_x if width and size_x else None
+    sy = height / size_y if height and size_y else None
+    sx, sy = sx or sy or 1.0, sy or sx or 1.0
+    target_x = low_x if x is None else x
+    target_y = low_y if y is None else y
+    return translate(target_x, target_y) @ scale(sx, sy) @ translate(-min_x, -min_y) @ m
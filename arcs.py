@@ -0,0 +1,239 @@
+# Arcos de circunferencia como movimientos nativos.
+#
+# Un arco va del punto anterior a su punto final alrededor de un centro, en
+# sentido horario o antihorario (con el eje Y hacia arriba, como en G2/G3).
+# Se interpola directamente en pasos X/Y con un generador entero por
+# octantes, como el del círculo de punto medio: en cada octante el eje
+# mayor avanza un paso por tic y el menor se redondea sobre la
+# circunferencia, y el sentido de cada eje puede cambiar dentro del arco.
+# Los arcos llegan explícitos desde el G-code, o se reconocen en las
+# polilíneas ya aplanadas (tramos de puntos sobre una misma circunferencia)
+# para no frenar en cada cuerda.
+
+import math
+
+import numpy as np
+
+ARC_TOLERANCE = 0.005  # Distancia máxima de los puntos a la circunferencia ajustada (cm)
+ARC_MAX_SAGITTA = 0.02  # Flecha máxima entre el arco y cada cuerda reemplazada (cm)
+ARC_MIN_POINTS = 4  # Cuerdas mínimas que reemplaza un arco reconocido
+ARC_MAX_POINTS = 256  # Cuerdas máximas por arco reconocido
+ARC_MIN_RADIUS = 0.05  # cm; los arcos más cerrados se tratan como rectas
+ARC_MAX_RADIUS = 500.0  # cm; los más abiertos también
+ARC_MAX_FIT_SWEEP = 1.5 * math.pi  # Barrido máximo de un arco reconocido, lejos de la vuelta completa
+
+
+def arc_sweep(i, j, dx, dy, clockwise):
+    # Ángulo recorrido (0, 2π] de un arco que empieza en el origen con centro
+    # (i, j) y termina en (dx, dy); si termina donde empezó es una vuelta completa
+    a0 = math.atan2(-j, -i)
+    a1 = math.atan2(dy - j, dx - i)
+    sweep = (a0 - a1) if clockwise else (a1 - a0)
+    sweep %= 2 * math.pi
+    if sweep <= 1e-9:
+        sweep = 2 * math.pi
+    return sweep
+
+
+def arc_tangents(i, j, dx, dy, clockwise):
+    # Direcciones (sin normalizar) al empezar y al terminar el arco
+    ex, ey = dx - i, dy - j
+    if clockwise:
+        return (-j, i), (ey, -ex)
+    return (j, -i), (-ey, ex)
+
+
+def arc_bounds(x, y, nx, ny, cx, cy, clockwise):
+    # (min_x, min_y, max_x, max_y) de un arco de (x, y) a (nx, ny)
+    r = math.hypot(x - cx, y - cy)
+    a0 = math.atan2(y - cy, x - cx)
+    sweep = arc_sweep(cx - x, cy - y, nx - x, ny - y, clockwise)
+    xs, ys = [x, nx], [y, ny]
+    sign = -1 if clockwise else 1
+    for k in range(4):
+        # Extremos en los ejes (0, π/2, π, 3π/2) que caen dentro del barrido
+        angle = k * math.pi / 2
+        if (sign * (angle - a0)) % (2 * math.pi) <= sweep:
+            xs.append(cx + r * math.cos(angle))
+            ys.append(cy + r * math.sin(angle))
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _unit_steps(x, y):
+    # Pasos por tic (-1, 0 o 1 por eje) que recorren los puntos enteros dados;
+    # los saltos de más de un paso se reparten en línea recta
+    dx, dy = np.diff(x), np.diff(y)
+    moved = np.concatenate(([True], (dx != 0) | (dy != 0)))
+    x, y = x[moved], y[moved]
+    dx, dy = np.diff(x), np.diff(y)
+    counts = np.maximum(np.abs(dx), np.abs(dy))
+    if (counts == 1).all():
+        return dx, dy
+    owner = np.repeat(np.arange(len(counts)), counts)
+    t = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    n = counts[owner]
+    sx = np.rint(dx[owner] * t / n) - np.rint(dx[owner] * (t - 1) / n)
+    sy = np.rint(dy[owner] * t / n) - np.rint(dy[owner] * (t - 1) / n)
+    return sx.astype(np.int64), sy.astype(np.int64)
+
+
+def arc_steps(i, j, dx, dy, clockwise):
+    # Pasos por tic (sx, sy) de un arco en pasos desde el origen con centro
+    # (i, j) hasta (dx, dy), y la distancia recorrida al terminar cada tic (en
+    # pasos): cada tic cuenta lo que de verdad mueve la máquina, 1 o √2, de
+    # modo que su tiempo corresponde a su propio paso, también el último, que
+    # llega al punto final aunque quede fuera de la circunferencia
+    r = math.hypot(i, j)
+    sweep = arc_sweep(i, j, dx, dy, clockwise)
+    sign = -1 if clockwise else 1
+    a0 = math.atan2(-j, -i)
+    a1 = a0 + sign * sweep
+    # Cambios de eje mayor en π/4 + k·π/2
+    quarter = math.pi / 2
+    lo, hi = min(a0, a1), max(a0, a1)
+    cuts = [math.pi / 4 + k * quarter
+            for k in range(math.ceil((lo - math.pi / 4) / quarter), math.floor((hi - math.pi / 4) / quarter) + 1)]
+    cuts = [c for c in cuts if lo < c < hi]
+    bounds = [a0] + (cuts if sign > 0 else cuts[::-1]) + [a1]
+    xs, ys = [np.zeros(1, dtype=np.int64)], [np.zeros(1, dtype=np.int64)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        mid = (start + end) / 2
+        first = 0 if start == a0 else 1  # El inicio de cada tramo repite el final del anterior
+        if abs(math.sin(mid)) >= abs(math.cos(mid)):
+            # Cerca de arriba o abajo: X es el eje mayor
+            u0, u1 = round(i + r * math.cos(start)), round(i + r * math.cos(end))
+            u = np.arange(u0, u1 + (1 if u1 >= u0 else -1), 1 if u1 >= u0 else -1)
+            side = 1 if math.sin(mid) > 0 else -1
+            v = side * np.sqrt(np.maximum(r * r - (u - i) ** 2, 0.0))
+            xs.append(u[first:])
+            ys.append(np.rint(j + v[first:]).astype(np.int64))
+        else:
+            u0, u1 = round(j + r * math.sin(start)), round(j + r * math.sin(end))
+            u = np.arange(u0, u1 + (1 if u1 >= u0 else -1), 1 if u1 >= u0 else -1)
+            side = 1 if math.cos(mid) > 0 else -1
+            v = side * np.sqrt(np.maximum(r * r - (u - j) ** 2, 0.0))
+            xs.append(np.rint(i + v[first:]).astype(np.int64))
+            ys.append(u[first:])
+    # El punto final real puede quedar a un paso de la circunferencia
+    xs.append(np.array([dx], dtype=np.int64))
+    ys.append(np.array([dy], dtype=np.int64))
+    sx, sy = _unit_steps(np.concatenate(xs), np.concatenate(ys))
+    positions = np.cumsum(np.hypot(sx, sy))
+    return sx, sy, positions
+
+
+class _Circle:
+    __slots__ = ("cx", "cy", "clockwise", "r", "max_step", "angle", "total")
+
+    def extend(self, x, y, tolerance):
+        # Añade un punto si sigue sobre el arco, en el mismo sentido
+        if abs(math.hypot(x - self.cx, y - self.cy) - self.r) > tolerance:
+            return False
+        angle = math.atan2(y - self.cy, x - self.cx)
+        step = ((angle - self.angle) if not self.clockwise else (self.angle - angle)) % (2 * math.pi)
+        if step > self.max_step or step <= 0 or self.total + step > ARC_MAX_FIT_SWEEP:
+            return False
+        self.angle = angle
+        self.total += step
+        return True
+
+    @property
+    def arc(self):
+        return self.cx, self.cy, self.clockwise
+
+
+def _circle(anchor, run, tolerance, max_sagitta):
+    # Círculo por anchor y los puntos de run si están sobre un mismo arco
+    # recorrido en un solo sentido, o None
+    ax, ay = anchor
+    mx, my = run[(len(run) - 1) // 2][1:3]
+    ex, ey = run[-1][1:3]
+    bx, by = mx - ax, my - ay
+    qx, qy = ex - ax, ey - ay
+    d = 2 * (bx * qy - by * qx)
+    if abs(d) < 1e-12:
+        return None
+    b2, q2 = bx * bx + by * by, qx * qx + qy * qy
+    cx = ax + (qy * b2 - by * q2) / d
+    cy = ay + (bx * q2 - qx * b2) / d
+    r = math.hypot(ax - cx, ay - cy)
+    if not ARC_MIN_RADIUS <= r <= ARC_MAX_RADIUS:
+        return None
+    circle = _Circle()
+    circle.cx, circle.cy, circle.clockwise, circle.r = cx, cy, d < 0, r
+    circle.max_step = 2 * math.acos(max(-1.0, 1 - max_sagitta / r))
+    circle.angle = math.atan2(ay - cy, ax - cx)
+    circle.total = 0.0
+    for _, x, y, _ in run:
+        if not circle.extend(x, y, tolerance):
+            return None
+    return circle
+
+
+def fit_arcs(points, tolerance=ARC_TOLERANCE, breaks=None, max_sagitta=ARC_MAX_SAGITTA,
+             min_points=ARC_MIN_POINTS, max_points=ARC_MAX_POINTS):
+    # Recorre puntos (x, y[, avance[, arco]]) y entrega (índice, (x, y, avance,
+    # arco)) de cada movimiento: los tramos de puntos sobre una misma
+    # circunferencia salen como un solo arco (cx, cy, horario) con el índice
+    # de su último punto. `breaks[i]` verdadero corta el tramo en el punto i
+    # (p. ej. los inicios de contorno, a los que se llega en vacío); los
+    # puntos con un arco explícito pasan sin cambios.
+    anchor = None
+    run = []  # (índice, x, y, avance) pendientes después de anchor
+    circle = None  # Círculo de anchor + run, si lo hay
+
+    def line(item):
+        index, x, y, feed = item
+        return index, (x, y, feed, None)
+
+    for index, point in enumerate(points):
+        x, y = point[0], point[1]
+        feed = point[2] if len(point) > 2 else None
+        arc = point[3] if len(point) > 3 else None
+        if (anchor is None or arc is not None or (breaks is not None and breaks[index])
+                or (run and feed != run[0][3])):
+            if circle is not None and len(run) >= min_points:
+                yield run[-1][0], (run[-1][1], run[-1][2], run[-1][3], circle.arc)
+            else:
+                for item in run:
+                    yield line(item)
+            run, circle = [], None
+            yield index, (x, y, feed, arc)
+            anchor = (x, y)
+            continue
+        run.append((index, x, y, feed))
+        if circle is not None and circle.extend(x, y, tolerance):
+            # Sigue sobre el mismo círculo: no hace falta ajustarlo de nuevo
+            if len(run) >= max_points:
+                yield index, (x, y, feed, circle.arc)
+                anchor = (x, y)
+                run, circle = [], None
+            continue
+        while len(run) >= 2:
+            fitted = _circle(anchor, run, tolerance, max_sagitta)
+            if fitted is not None:
+                circle = fitted
+                if len(run) >= max_points:
+                    yield run[-1][0], (run[-1][1], run[-1][2], run[-1][3], circle.arc)
+                    anchor = run[-1][1:3]
+                    run, circle = [], None
+                break
+            last = run.pop()
+            if circle is not None and len(run) >= min_points:
+                # El punto nuevo ya no cabe: el tramo anterior es un arco
+                yield run[-1][0], (run[-1][1], run[-1][2], run[-1][3], circle.arc)
+                anchor = run[-1][1:3]
+                run, circle = [last], None
+                break
+            # Sin arco posible desde anchor: el primer punto sale como recta
+            first = run.pop(0) if run else last
+            yield line(first)
+            anchor = first[1:3]
+            circle = None
+            if first is not last:
+                run.append(last)
+    if circle is not None and len(run) >= min_points:
+        yield run[-1][0], (run[-1][1], run[-1][2], run[-1][3], circle.arc)
+    else:
+        for item in run:
+            yield line(item)
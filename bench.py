@@ -0,0 +1,261 @@
+# Banco de pruebas de rendimiento del flujo SVG -> pasos.
+#
+# Genera SVG sintéticos (líneas, curvas o arcos) de varios tamaños y mide
+# por separado cada etapa: lectura del XML, análisis de los caminos,
+# aplanado, verificación de límites, simplificación, orden de corte,
+# planificación y emisión de pasos (sin hardware). Reporta tiempo,
+# rendimiento y memoria pico por etapa, y la fluctuación real del proceso de
+# movimiento, en JSON para comparar contra una línea base guardada:
+#
+#     python bench.py --sizes 10,1000 -o actual.json
+#     python bench.py --sizes 10,1000 --baseline base.json
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+import affine
+from cnc_core import FLATTEN_TOLERANCE, SIMPLIFY_TOLERANCE, work_area_mask
+from cut_order import order_contours
+from motion_process import IDLE, MotionProcess
+from planner import Planner
+from simplify import simplify_contours
+from step_stream import move_records, segment_records
+from svg_loader import flatten_paths
+from svg_path import iter_subpaths
+from toolpath import iter_points
+
+KINDS = ("lines", "curves", "arcs")
+SIZES = (10, 1000, 100000)
+SEGMENTS_PER_PATH = 10
+JITTER_SECONDS = 0.5  # Duración de la muestra en tiempo real
+JITTER_DELAY = 0.0002  # Semiperiodo de los pulsos de la muestra (s)
+REGRESSION_THRESHOLD = 0.25  # Aumento relativo de tiempo que cuenta como regresión
+REGRESSION_MIN_SECONDS = 0.001  # Diferencias menores se consideran ruido
+FORMAT = 1
+
+X_PIN, Y_PIN = (6, 13), (16, 20)
+
+
+def make_svg(file_name, kind, segments, seed=0):
+    # Contornos cerrados de SEGMENTS_PER_PATH tramos repartidos en la mesa (cm)
+    rng = random.Random(seed)
+    paths = max(1, segments // SEGMENTS_PER_PATH)
+    per_path = min(segments, SEGMENTS_PER_PATH)
+    columns = math.ceil(math.sqrt(paths * 85 / 45))
+    rows = math.ceil(paths / columns)
+    cell = min(85 / columns, 45 / rows)
+    with open(file_name, "w") as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="90cm" height="50cm" '
+                'viewBox="0 0 90 50">\n')
+        for i in range(paths):
+            cx = 2.5 + (i % columns + 0.5) * cell
+            cy = 2.5 + (i // columns + 0.5) * cell
+            radius = 0.4 * cell
+            angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(per_path))
+            ring = [(cx + radius * rng.uniform(0.6, 1) * math.cos(a),
+                     cy + radius * rng.uniform(0.6, 1) * math.sin(a)) for a in angles]
+            commands = [f"M{ring[0][0]:.4f},{ring[0][1]:.4f}"]
+            for k in range(1, per_path + 1):
+                x0, y0 = ring[k - 1]
+                x, y = ring[k % per_path]
+                if kind == "lines":
+                    commands.append(f"L{x:.4f},{y:.4f}")
+                elif kind == "curves":
+                    commands.append(f"C{x0 + (cx - x0) * 0.3:.4f},{y0 + (cy - y0) * 0.3:.4f} "
+                                    f"{x + (cx - x) * 0.3:.4f},{y + (cy - y) * 0.3:.4f} "
+                                    f"{x:.4f},{y:.4f}")
+                else:
+                    r = 0.6 * math.hypot(x - x0, y - y0) + 1e-3
+                    commands.append(f"A{r:.4f},{r:.4f} 0 0 1 {x:.4f},{y:.4f}")
+            f.write(f'<path d="{" ".join(commands)}Z"/>\n')
+        f.write("</svg>\n")
+    return paths * per_path
+
+
+def measure(fn, repeat=1, memory=True):
+    # Mejor tiempo de `repeat` ejecuciones y memoria pico de una ejecución aparte
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def run_corpus(file_name, kind, segments, repeat=1, memory=True):
+    stages = {}
+
+    def stage(name, fn, count, unit):
+        result, seconds, peak = measure(fn, repeat, memory)
+        stages[name] = {
+            "seconds": seconds,
+            "count": count(result) if callable(count) else count,
+            "unit": unit,
+            "peak_bytes": peak,
+        }
+        entry = stages[name]
+        entry["throughput"] = entry["count"] / seconds if seconds > 0 else None
+        return result
+
+    def load_xml():
+        root = ET.parse(file_name).getroot()
+        return [e.get("d") for e in root.iter("{http://www.w3.org/2000/svg}path")]
+
+    identity = affine.identity()
+    data = stage("xml_load", load_xml, segments, "segments")
+    paths = stage("parse", lambda: [(list(iter_subpaths(d)), identity, 1.0) for d in data],
+                  segments, "segments")
+    contours = stage("flatten",
+                     lambda: [c for path in flatten_paths(paths, FLATTEN_TOLERANCE) for c in path],
+                     segments, "segments")
+    points = np.concatenate(contours)
+    stage("bounds", lambda: work_area_mask(points, bounds=None), len(points), "points")
+    contours = stage("simplify", lambda: simplify_contours(contours, SIMPLIFY_TOLERANCE, True)[0],
+                     len(points), "points")
+    order = stage("order", lambda: order_contours(contours), len(contours), "contours")
+    points = np.concatenate(order.apply(contours))
+    planner = Planner()
+    planned = stage("plan", lambda: list(planner.iter_plan(iter_points(points))),
+                    len(points), "segments")
+    ticks = sum(s.ticks for s in planned)
+
+    def emit_stream():
+        return sum(len(segment_records(s, True)) for s in planned)
+
+    stage("step_stream", emit_stream, ticks, "steps")
+    return {
+        "corpus": f"{kind}-{segments}",
+        "kind": kind,
+        "segments": segments,
+        "points": int(len(points)),
+        "ticks": int(ticks),
+        "estimated_time": sum(s.duration() for s in planned),
+        "stages": stages,
+    }
+
+
+def measure_jitter(seconds=JITTER_SECONDS, delay=JITTER_DELAY):
+    # Pulsos reales en el proceso de movimiento contra el backend de
+    # grabación, medidos con sus propias estadísticas de temporización
+    motion = MotionProcess(X_PIN, Y_PIN, backend="recorder", stats=True)
+    motion.start()
+    try:
+        steps = int(seconds / (2 * delay))
+        motion.write(move_records(steps, steps // 2, delay))
+        motion.finish()
+        motion.run()
+        while motion.pending():
+            time.sleep(0.01)
+        motion.wait_state((IDLE,), 1.0)
+        snapshot = motion.timing()
+        del snapshot["segments"]
+    finally:
+        motion.shutdown()
+    snapshot["period_us"] = 2 * delay * 1e6
+    return snapshot
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    # Filas (corpus, etapa, s base, s actual, razón, regresión)
+    old = {(r["corpus"], name): s["seconds"] for r in baseline.get("results", [])
+           for name, s in r["stages"].items()}
+    rows = []
+    for r in results["results"]:
+        for name, s in r["stages"].items():
+            base = old.get((r["corpus"], name))
+            if not base:
+                continue
+            ratio = s["seconds"] / base
+            slower = ratio > 1 + threshold and s["seconds"] - base > REGRESSION_MIN_SECONDS
+            rows.append((r["corpus"], name, base, s["seconds"], ratio, slower))
+    return rows
+
+
+def _summary(results, out):
+    for r in results["results"]:
+        print(f"{r['corpus']}: {r['points']} points, {r['ticks']} steps", file=out)
+        for name, s in r["stages"].items():
+            peak = f"{s['peak_bytes'] / 1e6:8.1f} MB" if s["peak_bytes"] is not None else ""
+            rate = f"{s['throughput']:14,.0f} {s['unit']}/s" if s["throughput"] else ""
+            print(f"  {name:12s} {s['seconds'] * 1e3:10.2f} ms {rate} {peak}", file=out)
+    jitter = results.get("jitter")
+    if jitter:
+        print(f"jitter: p50 <{jitter['p50_us']} us, p99 <{jitter['p99_us']} us, "
+              f"worst {jitter['worst_us']:.1f} us over {jitter['events']} events, "
+              f"{jitter['late_steps']} late, {jitter['dropped_steps']} dropped", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CNC plasma pipeline benchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="comma-separated segment counts")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="lines, curves, arcs")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip peak memory measurement")
+    parser.add_argument("--no-jitter", action="store_true", help="skip the real-time jitter sample")
+    parser.add_argument("-o", "--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = {
+        "format": FORMAT,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in args.kinds.split(","):
+            for size in (int(s) for s in args.sizes.split(",")):
+                file_name = os.path.join(directory, f"{kind}-{size}.svg")
+                segments = make_svg(file_name, kind, size)
+                results["results"].append(
+                    run_corpus(file_name, kind, segments, args.repeat, not args.no_memory))
+    if not args.no_jitter:
+        results["jitter"] = measure_jitter()
+
+    _summary(results, sys.stderr)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        regressions = 0
+        for corpus, name, base, now, ratio, slower in rows:
+            regressions += slower
+            flag = "  REGRESSION" if slower else ""
+            print(f"{corpus:16s} {name:12s} {base * 1e3:10.2f} -> {now * 1e3:10.2f} ms "
+                  f"x{ratio:.2f}{flag}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
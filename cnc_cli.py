@@ -0,0 +1,270 @@
+# Modo por lotes sin interfaz gráfica.
+#
+# Compila uno o varios SVG o programas G-code (o todos los de un
+# directorio) a trayectoria y flujo de pasos en paralelo, sin PyQt5 ni
+# RPi.GPIO, exporta SVG a G-code, anida varias piezas (archivo:copias) en
+# una sola chapa, o simula los trabajos con reloj virtual para conocer su
+# tiempo de ciclo y si salen de la mesa:
+#
+#     python cnc_cli.py compile trabajos/ -o salida/ -j 4
+#     python cnc_cli.py export trabajos/ -o salida/
+#     python cnc_cli.py nest brida.svg:12 escuadra.svg:30 --name chapa1 -o salida/
+#     python cnc_cli.py simulate trabajos/ --pierce-delay 0.8
+
+import argparse
+import glob
+import os
+import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from cnc_core import (FLATTEN_TOLERANCE, SIMPLIFY_TOLERANCE, JobReport, JobSettings, compile_job,
+                      compile_toolpath, export_gcode, format_duration)
+from gcode import GCODE_EXTENSIONS
+from nesting import (NEST_KERF, NEST_MARGIN, NEST_RESOLUTION, NEST_ROTATIONS, NEST_TIME_BUDGET,
+                     Part, nest)
+from simulator import PIERCE_DELAY, simulate_job
+from toolpath import ToolpathCache
+
+
+def find_svgs(paths, extensions=(".svg",)):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(f for f in glob.glob(os.path.join(path, "*"))
+                                if os.path.splitext(f)[1].lower() in extensions))
+        else:
+            files.append(path)
+    return files
+
+
+def _compile(file_name, settings, output_dir, cache_dir, job=compile_job):
+    # Se ejecuta en un proceso de trabajo; los errores vuelven en el reporte
+    try:
+        cache = ToolpathCache(cache_dir) if cache_dir else None
+        return job(file_name, settings, output_dir, cache)
+    except (OSError, ValueError, ET.ParseError) as error:
+        report = JobReport(file_name)
+        report.error = str(error)
+        return report
+
+
+def print_report(report, out=sys.stdout):
+    name = os.path.basename(report.file_name)
+    if report.error:
+        print(f"{name}: ERROR {report.error}", file=out)
+        return
+    print(f"{name}: {report.segments} segments, cut {report.cut_length:.1f} cm, "
+          f"rapid {report.rapid_length:.1f} cm, est. {format_duration(report.estimated_time)}"
+          + (f", {report.removed_points} points simplified away" if report.removed_points else "")
+          + (f", {report.out_of_bounds} points out of bounds" if report.out_of_bounds else ""),
+          file=out)
+
+
+def print_export(report, out=sys.stdout):
+    name = os.path.basename(report.file_name)
+    if report.error:
+        print(f"{name}: ERROR {report.error}", file=out)
+        return
+    print(f"{name}: {report.contours} contours, {report.points} points -> {report.gcode_file}"
+          + (f", {report.out_of_bounds} points out of bounds" if report.out_of_bounds else ""),
+          file=out)
+
+
+def print_simulation(report, out=sys.stdout):
+    name = os.path.basename(report.file_name)
+    if report.error:
+        print(f"{name}: ERROR {report.error}", file=out)
+        return
+    machine = report.simulation
+    print(f"{name}: cycle {format_duration(machine.time)} (cut {machine.cut_time:.1f} s, "
+          f"rapid {machine.rapid_time:.1f} s, {machine.pierces} pierces"
+          + (f" + {machine.pierce_time:.1f} s" if machine.pierce_time else "")
+          + f"), steps X {machine.steps_x:,} Y {machine.steps_y:,}, "
+          f"peak {machine.peak_rate_x:,.0f}/{machine.peak_rate_y:,.0f} steps/s"
+          + (f", {report.out_of_bounds} points out of bounds" if report.out_of_bounds else ""),
+          file=out)
+    if machine.violations:
+        t, x, y = machine.first_violation
+        print(f"  LIMITS: {machine.violations:,} steps outside the work area, first at "
+              f"{t:.1f} s ({x:.2f}, {y:.2f} cm)", file=out)
+
+
+def parse_part(text):
+    # "archivo.svg:copias"; sin ":copias" es una sola copia
+    name, sep, count = text.rpartition(":")
+    if sep and count.isdigit():
+        return name, int(count)
+    return text, 1
+
+
+def print_nest(result, report, out=sys.stdout):
+    print(f"{result.placed}/{result.requested} parts placed, utilization {result.utilization:.1%}, "
+          f"sheet used {result.used_length:.1f} cm, {result.candidates} layouts tried", file=out)
+    for name, count in result.unplaced.items():
+        print(f"  {count} x {name} did not fit", file=out)
+    if report.estimated_time > 0:
+        area_per_hour = result.placed_area / 1e4 / (report.estimated_time / 3600)
+        print(f"yield {area_per_hour:.2f} m²/h of parts", file=out)
+
+
+def job_settings(args):
+    return JobSettings(tolerance=args.tolerance, optimize=not args.no_optimize,
+                       simplify=args.simplify, merge_collinear=not args.keep_collinear)
+
+
+def compile_command(args):
+    files = find_svgs(args.paths, (".svg",) + GCODE_EXTENSIONS)
+    if not files:
+        print("No SVG or G-code files found.", file=sys.stderr)
+        return 2
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    settings = job_settings(args)
+    cache_dir = None if args.no_cache else (args.cache_dir or ToolpathCache().directory)
+    failed = 0
+    total_time = 0.0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        jobs = [pool.submit(_compile, f, settings, args.output, cache_dir) for f in files]
+        for job in jobs:
+            report = job.result()
+            print_report(report)
+            if report.error:
+                failed += 1
+            else:
+                total_time += report.estimated_time
+    print(f"{len(files) - failed}/{len(files)} compiled, total est. {format_duration(total_time)}")
+    return 1 if failed else 0
+
+
+def export_command(args):
+    files = find_svgs(args.paths)
+    if not files:
+        print("No SVG files found.", file=sys.stderr)
+        return 2
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    settings = job_settings(args)
+    cache_dir = None if args.no_cache else (args.cache_dir or ToolpathCache().directory)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        jobs = [pool.submit(_compile, f, settings, args.output, cache_dir, export_gcode)
+                for f in files]
+        for job in jobs:
+            report = job.result()
+            print_export(report)
+            failed += bool(report.error)
+    print(f"{len(files) - failed}/{len(files)} exported")
+    return 1 if failed else 0
+
+
+def simulate_command(args):
+    files = find_svgs(args.paths, (".svg",) + GCODE_EXTENSIONS)
+    if not files:
+        print("No SVG or G-code files found.", file=sys.stderr)
+        return 2
+    settings = job_settings(args)
+    cache_dir = None if args.no_cache else (args.cache_dir or ToolpathCache().directory)
+    job = partial(simulate_job, pierce_delay=args.pierce_delay)
+    failed = 0
+    outside = 0
+    total_time = 0.0
+    pierce_time = 0.0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        jobs = [pool.submit(_compile, f, settings, None, cache_dir, job) for f in files]
+        for job in jobs:
+            report = job.result()
+            print_simulation(report)
+            if report.error:
+                failed += 1
+            else:
+                total_time += report.simulation.time
+                pierce_time += report.simulation.pierce_time
+                outside += bool(report.simulation.violations)
+    print(f"{len(files) - failed}/{len(files)} simulated, total cycle {format_duration(total_time)}"
+          + (f" + {format_duration(pierce_time)} piercing" if pierce_time else "")
+          + (f", {outside} leave the work area" if outside else ""))
+    return 1 if failed or outside else 0
+
+
+def nest_command(args):
+    settings = job_settings(args)
+    cache = None if args.no_cache else ToolpathCache(args.cache_dir)
+    output_dir = args.output or os.getcwd()
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        parts = [Part.from_file(name, count, settings.tolerance, cache, settings.simplify,
+                                settings.merge_collinear)
+                 for name, count in map(parse_part, args.parts)]
+    except (OSError, ValueError, ET.ParseError) as error:
+        print(f"ERROR {error}", file=sys.stderr)
+        return 1
+    width, height = settings.work_area
+    result = nest(parts, width, height, rotations=args.rotations, kerf=args.kerf,
+                  margin=args.margin, cell=args.resolution, time_budget=args.time,
+                  workers=args.jobs, optimize=settings.optimize, tolerance=settings.tolerance)
+    report = compile_toolpath(result.toolpath, JobReport(args.name), settings, output_dir, args.name)
+    print_report(report)
+    print_nest(result, report)
+    return 1 if result.unplaced else 0
+
+
+def add_job_options(parser, output_help="output directory (default: next to each SVG)"):
+    parser.add_argument("-o", "--output", help=output_help)
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes")
+    parser.add_argument("--tolerance", type=float, default=FLATTEN_TOLERANCE,
+                        help="curve flattening tolerance in cm")
+    parser.add_argument("--simplify", type=float, default=SIMPLIFY_TOLERANCE,
+                        help="polyline simplification tolerance in cm (0 disables)")
+    parser.add_argument("--keep-collinear", action="store_true",
+                        help="keep points that lie exactly on a straight run")
+    parser.add_argument("--no-optimize", action="store_true", help="keep the SVG cut order")
+    parser.add_argument("--cache-dir", help="toolpath cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the toolpath cache")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cnc_cli", description="CNC plasma batch tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="compile SVG or G-code files to step files")
+    compile_parser.add_argument("paths", nargs="+", help="SVG or G-code files, or directories")
+    add_job_options(compile_parser)
+    compile_parser.set_defaults(func=compile_command)
+
+    export_parser = commands.add_parser("export", help="export SVG files as G-code")
+    export_parser.add_argument("paths", nargs="+", help="SVG files or directories")
+    add_job_options(export_parser)
+    export_parser.set_defaults(func=export_command)
+
+    simulate_parser = commands.add_parser("simulate", help="estimate cycle time on a simulated machine")
+    simulate_parser.add_argument("paths", nargs="+", help="SVG or G-code files, or directories")
+    simulate_parser.add_argument("--pierce-delay", type=float, default=PIERCE_DELAY,
+                                 help="seconds per torch ignition, reported apart from the cycle")
+    add_job_options(simulate_parser)
+    simulate_parser.set_defaults(func=simulate_command)
+
+    nest_parser = commands.add_parser("nest", help="nest several parts on one sheet")
+    nest_parser.add_argument("parts", nargs="+", help="part SVG files, optionally file.svg:copies")
+    nest_parser.add_argument("--name", default="nest", help="base name of the output files")
+    nest_parser.add_argument("--rotations", type=int, default=NEST_ROTATIONS,
+                             help="rotation steps per turn (4: every 90 degrees)")
+    nest_parser.add_argument("--kerf", type=float, default=NEST_KERF, help="gap between parts in cm")
+    nest_parser.add_argument("--margin", type=float, default=NEST_MARGIN,
+                             help="unused border of the sheet in cm")
+    nest_parser.add_argument("--resolution", type=float, default=NEST_RESOLUTION,
+                             help="collision grid cell size in cm")
+    nest_parser.add_argument("--time", type=float, default=NEST_TIME_BUDGET,
+                             help="time budget for trying layouts in seconds")
+    add_job_options(nest_parser, "output directory (default: current directory)")
+    nest_parser.set_defaults(func=nest_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+# Núcleo sin interfaz: compilación de un SVG o de un programa G-code a
+# trayectoria y flujo de pasos, y exportación a G-code.
+#
+# No importa PyQt5 ni RPi.GPIO, de modo que puede usarse desde la línea de
+# comandos, en procesos de trabajo o en una máquina sin pantalla. La GUI usa
+# estas mismas funciones para no duplicar la lógica.
+
+import math
+import os
+
+import numpy as np
+
+from gcode import MoveStream, is_gcode, iter_gcode, write_gcode
+from motion import STEPS_PER_CM
+from planner import MachineLimits, Planner
+from step_stream import StepStreamWriter, segment_records
+from toolpath import iter_points, load_toolpath
+
+FLATTEN_TOLERANCE = 0.01  # Error de cuerda máximo al aplanar curvas (cm)
+SIMPLIFY_TOLERANCE = 0.005  # Desviación máxima al simplificar polilíneas (cm), 0 desactiva
+MERGE_COLLINEAR = True  # Quitar además los puntos exactamente alineados
+
+# Dimensiones de la mesa de trabajo en cm
+WORK_AREA_WIDTH = 90
+WORK_AREA_HEIGHT = 50
+
+
+class JobSettings:
+    def __init__(self, tolerance=FLATTEN_TOLERANCE, optimize=True, limits=None,
+                 steps_per_cm=STEPS_PER_CM, work_area=(WORK_AREA_WIDTH, WORK_AREA_HEIGHT),
+                 simplify=SIMPLIFY_TOLERANCE, merge_collinear=MERGE_COLLINEAR):
+        self.tolerance = tolerance
+        self.optimize = optimize
+        self.simplify = simplify
+        self.merge_collinear = merge_collinear
+        self.limits = limits or MachineLimits()
+        self.steps_per_cm = steps_per_cm
+        self.work_area = work_area
+
+
+class JobReport:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.contours = 0
+        self.points = 0
+        self.removed_points = 0
+        self.segments = 0
+        self.ticks = 0
+        self.cut_length = 0.0  # cm
+        self.rapid_length = 0.0  # cm
+        self.estimated_time = 0.0  # s
+        self.out_of_bounds = 0
+        self.toolpath_file = None
+        self.steps_file = None
+        self.gcode_file = None
+        self.simulation = None  # SimulatedMachine, si el trabajo se simuló
+        self.error = None
+
+
+def work_area_mask(points, width=WORK_AREA_WIDTH, height=WORK_AREA_HEIGHT, bounds=None):
+    # Máscara de puntos dentro de la mesa, o None si todos caben (sin copiar nada)
+    if bounds is not None:
+        min_x, min_y, max_x, max_y = bounds
+        if min_x >= 0 and min_y >= 0 and max_x <= width and max_y <= height:
+            return None
+    inside = ((points[:, 0] >= 0) & (points[:, 0] <= width)
+              & (points[:, 1] >= 0) & (points[:, 1] <= height))
+    return None if inside.all() else inside
+
+
+def clip_to_work_area(points, width=WORK_AREA_WIDTH, height=WORK_AREA_HEIGHT, bounds=None):
+    # Devuelve (puntos dentro, puntos fuera)
+    inside = work_area_mask(points, width, height, bounds)
+    if inside is None:
+        return points, points[:0]
+    return points[inside], points[~inside]
+
+
+def clip_rapids(points, rapids, inside):
+    # (puntos, vacíos) dentro de la mesa: al primer punto que sigue a uno
+    # descartado se llega en vacío, como al empezar un contorno
+    after_gap = np.concatenate(([False], ~inside[:-1]))
+    return points[inside], (rapids | after_gap)[inside]
+
+
+def rapid_starts(offsets):
+    # Puntos que empiezan un contorno: se llega a ellos en vacío
+    starts = np.zeros(int(offsets[-1]), dtype=bool)
+    starts[np.asarray(offsets[:-1])[np.diff(offsets) > 0]] = True
+    return starts
+
+
+def compile_job(file_name, settings=None, output_dir=None, cache=None):
+    # Carga, valida, planifica y escribe la trayectoria (.ctp) y los pasos (.steps)
+    settings = settings or JobSettings()
+    report = JobReport(file_name)
+    if is_gcode(file_name):
+        return compile_gcode(file_name, settings, output_dir, report)
+    toolpath = load_toolpath(file_name, settings.tolerance, cache, settings.optimize,
+                             settings.simplify, settings.merge_collinear)
+    base = os.path.splitext(os.path.basename(file_name))[0]
+    output_dir = output_dir or os.path.dirname(os.path.abspath(file_name))
+    return compile_toolpath(toolpath, report, settings, output_dir, base)
+
+
+def compile_toolpath(toolpath, report, settings, output_dir, base):
+    # Valida, planifica y escribe base.ctp y base.steps de una trayectoria ya
+    # cargada (de un SVG o de varias piezas anidadas)
+    report.toolpath_file = os.path.join(output_dir, base + ".ctp")
+    report.steps_file = os.path.join(output_dir, base + ".steps")
+    toolpath.save(report.toolpath_file)
+    with StepStreamWriter(report.steps_file, settings.steps_per_cm) as writer:
+        for segment, records in plan_toolpath(toolpath, settings, report):
+            writer.write(records, segment)
+        report.ticks = writer.ticks
+    return report
+
+
+def compile_gcode(file_name, settings, output_dir, report):
+    # Programa G-code -> .steps en una sola pasada, sin cargarlo entero
+    base = os.path.splitext(os.path.basename(file_name))[0]
+    output_dir = output_dir or os.path.dirname(os.path.abspath(file_name))
+    report.steps_file = os.path.join(output_dir, base + ".steps")
+    with StepStreamWriter(report.steps_file, settings.steps_per_cm) as writer:
+        for segment, records in plan_gcode(file_name, settings, report):
+            writer.write(records, segment)
+        report.ticks = writer.ticks
+    return report
+
+
+def _tally(report, segment, torch):
+    report.segments += 1
+    report.estimated_time += segment.duration()
+    if torch:
+        report.cut_length += segment.length
+    else:
+        report.rapid_length += segment.length
+
+
+def plan_toolpath(toolpath, settings, report, start=(0, 0)):
+    # (segmento, registros) de una trayectoria cargada, en orden de corte,
+    # desde `start` (pasos); los puntos fuera de la mesa se descartan y los
+    # totales del reporte se completan a medida que se recorre
+    report.contours = len(toolpath)
+    report.removed_points = toolpath.removed_points
+    width, height = settings.work_area
+    points = toolpath.points
+    rapids = rapid_starts(toolpath.offsets)
+    inside = work_area_mask(points, width, height, toolpath.bounds)
+    if inside is not None:
+        report.out_of_bounds = int(len(points) - np.count_nonzero(inside))
+        points, rapids = clip_rapids(points, rapids, inside)
+    report.points = len(points)
+    planner = Planner(settings.limits, settings.steps_per_cm)
+    for segment in planner.iter_plan(iter_points(points), start, rapids):
+        torch = not rapids[segment.index]
+        _tally(report, segment, torch)
+        yield segment, segment_records(segment, torch=torch)
+
+
+def plan_gcode(file_name, settings, report):
+    # Lo mismo para un programa G-code leído en flujo: el avance F de cada
+    # movimiento limita la velocidad planificada
+    planner = Planner(settings.limits, settings.steps_per_cm)
+    with open(file_name, "rb") as f:
+        moves = MoveStream(iter_gcode(f, settings.tolerance, arcs=True), settings.work_area)
+        for segment in planner.iter_plan(moves, breaks=moves):
+            torch = moves.torch(segment.index)
+            _tally(report, segment, torch)
+            yield segment, segment_records(segment, torch=torch)
+    report.contours = moves.pierces
+    report.points = moves.points
+    report.out_of_bounds = moves.out_of_bounds
+
+
+def iter_resume(records, index, segment, planner, points, rapids, start):
+    # (registros, (dx, dy), punto) para reanudar un flujo indexado en
+    # `segment` con la máquina en `start` (pasos): un tramo en vacío hasta
+    # el inicio del segmento y después los registros guardados. Solo los
+    # primeros segmentos se vuelven a planificar, desde el reposo, hasta que
+    # su velocidad de salida coincide con la del plan guardado; lo anterior
+    # no se recorre ni se planifica
+    if segment >= len(index):
+        return
+    tags = index.rows["tag"]
+    first = int(tags[segment - 1]) if segment else -1  # Punto donde empieza el segmento
+    lead = None if first < 0 else first
+    x, y = index.start(segment)
+    spc = planner.steps_per_cm
+    for seg in planner.iter_plan([(x / spc, y / spc)], start):
+        yield segment_records(seg), (seg.dx, seg.dy), lead
+    base = first + 1
+    v_exit = index.rows["v_exit"]
+    for seg in planner.iter_plan(iter_points(points, base), (x, y), rapids[base:]):
+        tag = base + seg.index
+        yield segment_records(seg, torch=not rapids[tag]), (seg.dx, seg.dy), tag
+        stored = index.find(tag)
+        if stored is not None and math.isclose(seg.v_exit, float(v_exit[stored]),
+                                               rel_tol=1e-9, abs_tol=1e-9):
+            break
+    else:
+        return  # Sin coincidencia: se replanificó hasta el final
+    for s in range(stored + 1, len(index)):
+        begin, end = index.span(s)
+        yield records[begin:end], index.delta(s), int(tags[s])
+
+
+def export_gcode(file_name, settings=None, output_dir=None, cache=None):
+    # Trayectoria compilada de un SVG escrita como G-code, al avance máximo de la máquina
+    settings = settings or JobSettings()
+    report = JobReport(file_name)
+    toolpath = load_toolpath(file_name, settings.tolerance, cache, settings.optimize,
+                             settings.simplify, settings.merge_collinear)
+    report.contours = len(toolpath)
+    report.points = len(toolpath.points)
+    report.removed_points = toolpath.removed_points
+    width, height = settings.work_area
+    inside = work_area_mask(toolpath.points, width, height, toolpath.bounds)
+    if inside is not None:
+        report.out_of_bounds = int(len(inside) - np.count_nonzero(inside))
+    base = os.path.splitext(os.path.basename(file_name))[0]
+    output_dir = output_dir or os.path.dirname(os.path.abspath(file_name))
+    report.gcode_file = os.path.join(output_dir, base + ".gcode")
+    with open(report.gcode_file, "w") as out:
+        write_gcode(toolpath, out, min(settings.limits.max_velocity))
+    return report
+
+
+def format_duration(seconds):
+    if not math.isfinite(seconds):
+        return "-"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,93 @@
+# Manejo directo de las bobinas de un motor paso a paso por tabla de fases.
+#
+# Para las mesas antiguas sin driver STEP/DIR: cada fase es una fila de la
+# tabla (A1, A2, B1, B2) que se escribe con una sola llamada a GPIO.output
+# sobre la lista de pines. Los instantes de cada fase se calculan de
+# antemano como plazos absolutos del reloj monotónico, con rampas de
+# aceleración y frenado, de modo que ni la sobrecarga de Python ni el
+# retraso de sleep se acumulan de una fase a la siguiente.
+
+import math
+import time
+
+from step_scheduler import SPIN_THRESHOLD, wait_until
+
+# Filas (A1, A2, B1, B2) de cada modo, en el sentido de avance
+PHASE_TABLES = {
+    "full": ((1, 0, 1, 0), (0, 1, 1, 0), (0, 1, 0, 1), (1, 0, 0, 1)),
+    "half": ((1, 0, 1, 0), (0, 0, 1, 0), (0, 1, 1, 0), (0, 1, 0, 0),
+             (0, 1, 0, 1), (0, 0, 0, 1), (1, 0, 0, 1), (1, 0, 0, 0)),
+    "wave": ((1, 0, 0, 0), (0, 0, 1, 0), (0, 1, 0, 0), (0, 0, 0, 1)),
+}
+
+START_RATE = 100.0  # Fases/s desde las que se puede arrancar sin perder pasos
+
+
+def phase_times(phases, rate, accel=None, start_rate=START_RATE):
+    # Instante (s, desde el inicio) de cada fase y duración total del movimiento.
+    # Perfil trapezoidal entre start_rate y rate con aceleración `accel` (fases/s²)
+    if phases <= 0:
+        return [], 0.0
+    if not accel or rate <= start_rate:
+        return [i / rate for i in range(phases)], phases / rate
+    ramp = (rate * rate - start_rate * start_rate) / (2 * accel)
+    if 2 * ramp > phases:
+        ramp = phases / 2  # No alcanza la velocidad máxima: perfil triangular
+    peak = math.sqrt(start_rate * start_rate + 2 * accel * ramp)
+    t_ramp = (peak - start_rate) / accel
+    total = 2 * t_ramp + (phases - 2 * ramp) / peak
+
+    def ramp_time(distance):
+        return (math.sqrt(start_rate * start_rate + 2 * accel * distance) - start_rate) / accel
+
+    times = []
+    for i in range(phases):
+        if i <= ramp:
+            times.append(ramp_time(i))
+        elif i < phases - ramp:
+            times.append(t_ramp + (i - ramp) / peak)
+        else:
+            times.append(total - ramp_time(phases - i))
+    return times, total
+
+
+class CoilStepper:
+    def __init__(self, gpio, pins, mode="full", spin=SPIN_THRESHOLD, clock=time.monotonic):
+        if mode not in PHASE_TABLES:
+            raise ValueError(f"Modo de pasos desconocido: {mode}")
+        self.gpio = gpio
+        self.pins = list(pins)  # (A1, A2, B1, B2)
+        self.table = [list(row) for row in PHASE_TABLES[mode]]
+        self.spin = spin
+        self.clock = clock
+        self.phase = 0  # Fila de la tabla aplicada por última vez
+        self.position = 0  # Fases recorridas (con signo)
+        self._next_start = None
+
+    def move(self, phases, rate, accel=None, start_rate=START_RATE):
+        # Avanza `phases` filas de la tabla (negativo: hacia atrás) a `rate` fases/s
+        direction = 1 if phases >= 0 else -1
+        times, total = phase_times(abs(phases), rate, accel, start_rate)
+        now = self.clock()
+        start = self._next_start
+        if start is None or start < now:
+            start = now
+        output = self.gpio.output
+        pins = self.pins
+        table = self.table
+        size = len(table)
+        phase = self.phase
+        for t in times:
+            phase = (phase + direction) % size
+            wait_until(start + t, self.spin, self.clock)
+            output(pins, table[phase])
+        self.phase = phase
+        self.position += phases
+        # La última fase se mantiene su intervalo completo antes del siguiente movimiento
+        self._next_start = start + total
+        wait_until(self._next_start, self.spin, self.clock)
+
+    def release(self):
+        # Bobinas sin corriente
+        self.gpio.output(self.pins, [0] * len(self.pins))
+        self._next_start = None
@@ -0,0 +1,2 @@
+# Los módulos están en la raíz del repositorio: pytest la añade a sys.path
+# al encontrar este archivo.
@@ -0,0 +1,350 @@
+# Orden de corte: minimiza el recorrido en vacío (antorcha apagada).
+#
+# Los contornos se reordenan con vecino más cercano sobre una rejilla
+# espacial de puntos de entrada y después con 2-opt acotado en tiempo. Cada
+# contorno cerrado puede empezar en cualquiera de sus vértices y los
+# abiertos pueden recorrerse en cualquier sentido. Se respeta la regla del
+# plasma: un contorno contenido en otro (agujero) se corta antes que la
+# pieza que lo contiene.
+
+import math
+import time
+
+import numpy as np
+
+ORDER_TIME_BUDGET = 1.0  # s
+ENTRY_SAMPLES = 16  # Vértices por contorno que se indexan en la rejilla
+NEIGHBORS = 8  # Vecinos por contorno en el 2-opt
+CLOSED_EPSILON = 1e-6  # cm
+CONTAINMENT_MAX_CELLS = 256  # Celdas por caja en el índice; las mayores se prueban siempre
+
+
+class CutOrder:
+    def __init__(self, sequence, rapid_before, rapid_after):
+        self.sequence = sequence  # (índice de contorno, vértice inicial, invertido)
+        self.rapid_before = rapid_before  # cm
+        self.rapid_after = rapid_after
+
+    def apply(self, contours):
+        # Contornos en el nuevo orden, rotados y orientados para empezar en su entrada
+        result = []
+        for index, vertex, reverse in self.sequence:
+            contour = contours[index]
+            result.append(orient(contour, vertex, reverse, is_closed(contour)))
+        return result
+
+
+def is_closed(contour):
+    if len(contour) <= 2:
+        return False
+    (x0, y0), (x1, y1) = contour[0].tolist(), contour[-1].tolist()
+    return abs(x0 - x1) <= CLOSED_EPSILON and abs(y0 - y1) <= CLOSED_EPSILON
+
+
+def orient(contour, vertex, reverse, closed):
+    if closed:
+        ring = np.roll(contour[:-1], -vertex, axis=0)
+        return np.concatenate((ring, ring[:1]))
+    return contour[::-1] if reverse else contour
+
+
+def rapid_length(contours, start=(0.0, 0.0)):
+    # Recorrido en vacío de un orden dado, desde `start`
+    total = 0.0
+    x, y = start
+    for contour in contours:
+        if len(contour) == 0:
+            continue
+        total += math.hypot(float(contour[0][0]) - x, float(contour[0][1]) - y)
+        x, y = float(contour[-1][0]), float(contour[-1][1])
+    return total
+
+
+def _point_in_polygon(x, y, polygon):
+    # Regla par-impar, vectorizada sobre las aristas
+    x0, y0 = polygon[:-1, 0], polygon[:-1, 1]
+    x1, y1 = polygon[1:, 0], polygon[1:, 1]
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return bool(np.count_nonzero(crosses & (x < at)) % 2)
+
+
+def containment(contours, closed):
+    # Contorno cerrado más pequeño que contiene a cada contorno, o -1
+    count = len(contours)
+    parent = np.full(count, -1, dtype=np.int64)
+    if count == 0:
+        return parent
+    boxes = np.array([np.concatenate((c.min(axis=0), c.max(axis=0))) for c in contours])
+    areas = ((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])).tolist()
+    closed_ids = np.flatnonzero(closed).tolist()
+    if not closed_ids:
+        return parent
+    # Índice espacial: cada caja cerrada se registra en las celdas que toca;
+    # la celda sale de la extensión completa de las cajas
+    span = float((boxes[:, 2:].max(axis=0) - boxes[:, :2].min(axis=0)).max())
+    cell = max(span / math.sqrt(len(closed_ids)), 1e-3)
+    cells = {}
+    large = []  # Cajas que tocarían demasiadas celdas
+    box_list = boxes.tolist()
+    for j in closed_ids:
+        x0, y0, x1, y1 = box_list[j]
+        gx0, gx1 = int(x0 // cell), int(x1 // cell)
+        gy0, gy1 = int(y0 // cell), int(y1 // cell)
+        if (gx1 - gx0 + 1) * (gy1 - gy0 + 1) > CONTAINMENT_MAX_CELLS:
+            large.append(j)
+            continue
+        for gx in range(gx0, gx1 + 1):
+            for gy in range(gy0, gy1 + 1):
+                cells.setdefault((gx, gy), []).append(j)
+    for i in range(count):
+        x0, y0, x1, y1 = box_list[i]
+        x, y = contours[i][0].tolist()
+        # Solo contiene un contorno de área mayor, o igual y de índice menor:
+        # dos contornos idénticos no pueden ser padre el uno del otro
+        candidates = [
+            j for j in cells.get((int(x // cell), int(y // cell)), []) + large
+            if (areas[j] > areas[i] or (areas[j] == areas[i] and j < i))
+            and box_list[j][0] <= x0 and box_list[j][1] <= y0
+            and box_list[j][2] >= x1 and box_list[j][3] >= y1
+        ]
+        for j in sorted(candidates, key=lambda j: (areas[j], -j)):
+            if _point_in_polygon(x, y, contours[j]):
+                parent[i] = j
+                break
+    return parent
+
+
+class _Grid:
+    # Rejilla uniforme de puntos candidatos a entrada (contorno, vértice)
+    def __init__(self, points, owners, vertices, cell):
+        self.cell = cell
+        self.cells = {}
+        for (x, y), owner, vertex in zip(points.tolist(), owners.tolist(), vertices.tolist()):
+            key = (int(x // cell), int(y // cell))
+            self.cells.setdefault(key, []).append((x, y, owner, vertex))
+        keys = np.array(list(self.cells)) if self.cells else np.zeros((1, 2), dtype=int)
+        self.low = keys.min(axis=0)
+        self.high = keys.max(axis=0)
+
+    def nearest(self, x, y, accept):
+        # Punto aceptado más cercano, buscando por anillos de celdas
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        best = None
+        best_d = math.inf
+        limit = int(max(abs(cx - self.low[0]), abs(cx - self.high[0]),
+                        abs(cy - self.low[1]), abs(cy - self.high[1])))
+        for ring in range(limit + 1):
+            if best is not None and best_d <= (ring - 1) * self.cell:
+                break
+            for key in _ring(cx, cy, ring):
+                bucket = self.cells.get(key)
+                if not bucket:
+                    continue
+                alive = []
+                for entry in bucket:
+                    state = accept(entry[2])
+                    if state is None:
+                        continue  # Contorno ya cortado: se descarta de la rejilla
+                    alive.append(entry)
+                    if state:
+                        d = math.hypot(entry[0] - x, entry[1] - y)
+                        if d < best_d:
+                            best, best_d = entry, d
+                if len(alive) != len(bucket):
+                    self.cells[key] = alive
+        return best
+
+    def k_nearest(self, x, y, k):
+        # Dueños de los k puntos más cercanos (sin filtrar)
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        found = []
+        limit = int(max(abs(cx - self.low[0]), abs(cx - self.high[0]),
+                        abs(cy - self.low[1]), abs(cy - self.high[1])))
+        for ring in range(limit + 1):
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= (ring - 1) * self.cell:
+                    break
+            for key in _ring(cx, cy, ring):
+                for entry in self.cells.get(key, ()):
+                    found.append((math.hypot(entry[0] - x, entry[1] - y), entry[2]))
+        found.sort()
+        return [owner for _, owner in found[:k]]
+
+
+def _ring(cx, cy, ring):
+    if ring == 0:
+        yield (cx, cy)
+        return
+    for dx in range(-ring, ring + 1):
+        yield (cx + dx, cy - ring)
+        yield (cx + dx, cy + ring)
+    for dy in range(-ring + 1, ring):
+        yield (cx - ring, cy + dy)
+        yield (cx + ring, cy + dy)
+
+
+def _entry_samples(contour, closed):
+    if not closed:
+        return [0, len(contour) - 1]
+    n = len(contour) - 1
+    if n <= ENTRY_SAMPLES:
+        return list(range(n))
+    return np.linspace(0, n, ENTRY_SAMPLES, endpoint=False).astype(int).tolist()
+
+
+def _ends(contour, vertex, reverse, closed):
+    # Puntos de entrada y salida de un contorno orientado
+    if closed:
+        point = tuple(contour[vertex].tolist())
+        return point, point
+    first, last = tuple(contour[0].tolist()), tuple(contour[-1].tolist())
+    return (last, first) if reverse else (first, last)
+
+
+def _nearest_vertex(contour, x, y):
+    ring = contour[:-1]
+    d = (ring[:, 0] - x) ** 2 + (ring[:, 1] - y) ** 2
+    return int(np.argmin(d))
+
+
+def order_contours(contours, start=(0.0, 0.0), time_budget=ORDER_TIME_BUDGET):
+    deadline = time.perf_counter() + time_budget
+    contours = [np.asarray(c, dtype=float) for c in contours]
+    count = len(contours)
+    rapid_before = rapid_length(contours, start)
+    if count == 0:
+        return CutOrder([], 0.0, 0.0)
+    closed = np.array([is_closed(c) for c in contours])
+    parent = containment(contours, closed)
+    waiting = np.bincount(parent[parent >= 0], minlength=count)  # Hijos pendientes
+
+    # Rejilla de puntos de entrada
+    points, owners, vertices = [], [], []
+    for i, contour in enumerate(contours):
+        for v in _entry_samples(contour, closed[i]):
+            points.append(contour[v])
+            owners.append(i)
+            vertices.append(v)
+    points = np.array(points)
+    span = np.ptp(points, axis=0).max() if len(points) > 1 else 1.0
+    cell = max(span / max(math.sqrt(len(points)), 1.0), 1e-3)
+    grid = _Grid(points, np.array(owners), np.array(vertices), cell)
+
+    done = np.zeros(count, dtype=bool)
+
+    def accept(owner):
+        if done[owner]:
+            return None
+        return waiting[owner] == 0
+
+    # Vecino más cercano respetando agujeros antes que piezas
+    route, entry, reverse = [], [0] * count, [False] * count
+    x, y = start
+    while len(route) < count:
+        found = grid.nearest(x, y, accept)
+        if found is None:
+            # Sin candidatos en la rejilla: primer contorno disponible, o el
+            # primero pendiente si ninguno lo está
+            ready = np.flatnonzero(~done & (waiting == 0))
+            owner = int(ready[0]) if len(ready) else int(np.flatnonzero(~done)[0])
+            vertex = 0
+        else:
+            owner, vertex = found[2], found[3]
+        contour = contours[owner]
+        if closed[owner]:
+            vertex = _nearest_vertex(contour, x, y)
+        else:
+            reverse[owner] = vertex != 0
+            vertex = 0
+        entry[owner] = vertex
+        route.append(owner)
+        done[owner] = True
+        if parent[owner] >= 0:
+            waiting[parent[owner]] -= 1
+        x, y = _ends(contour, vertex, reverse[owner], closed[owner])[1]
+
+    route = _two_opt(route, contours, closed, parent, entry, reverse, start, deadline)
+    sequence = [(i, entry[i], reverse[i]) for i in route]
+    result = CutOrder(sequence, rapid_before, 0.0)
+    result.rapid_after = rapid_length(result.apply(contours), start)
+    return result
+
+
+def _two_opt(route, contours, closed, parent, entry, reverse, start, deadline):
+    # 2-opt con listas de vecinos; invertir un tramo invierte también el
+    # sentido de los contornos abiertos que contiene
+    count = len(route)
+    if count < 3:
+        return route
+    sx, sy, ex, ey = [0.0] * count, [0.0] * count, [0.0] * count, [0.0] * count
+    for i in range(count):
+        (sx[i], sy[i]), (ex[i], ey[i]) = _ends(contours[i], entry[i], reverse[i], closed[i])
+    starts = np.column_stack((sx, sy))
+    span = float(np.ptp(starts, axis=0).max())
+    grid = _Grid(starts, np.arange(count), np.zeros(count, dtype=int),
+                 max(span / math.sqrt(count), 1e-3))
+    neighbors = {}  # Se calculan solo cuando el 2-opt los necesita
+
+    def near(c):
+        if c not in neighbors:
+            neighbors[c] = grid.k_nearest(sx[c], sy[c], NEIGHBORS + 1)
+        return neighbors[c]
+
+    route = list(route)
+    position = [0] * count
+    for p, c in enumerate(route):
+        position[c] = p
+    parent = parent.tolist()
+
+    def exit_of(p):
+        if p < 0:
+            return start
+        c = route[p]
+        return ex[c], ey[c]
+
+    def valid(lo, hi):
+        # Un agujero y su pieza no pueden quedar ambos dentro del tramo invertido
+        for p in range(lo, hi + 1):
+            q = parent[route[p]]
+            if q >= 0 and lo <= position[q] <= hi:
+                return False
+        return True
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(-1, count - 1):
+            if time.perf_counter() >= deadline:
+                break
+            ax, ay = exit_of(i)
+            a_next = route[i + 1]
+            old_first = math.hypot(sx[a_next] - ax, sy[a_next] - ay)
+            source = route[i] if i >= 0 else a_next
+            for c in near(source):
+                j = position[c]
+                if j <= i + 1:
+                    continue
+                new_first = math.hypot(ex[c] - ax, ey[c] - ay)
+                if new_first >= old_first:
+                    continue
+                if j + 1 < count:
+                    d = route[j + 1]
+                    old_second = math.hypot(sx[d] - ex[c], sy[d] - ey[c])
+                    new_second = math.hypot(sx[d] - sx[a_next], sy[d] - sy[a_next])
+                else:
+                    old_second = new_second = 0.0
+                if new_first + new_second < old_first + old_second - 1e-9 and valid(i + 1, j):
+                    route[i + 1:j + 1] = route[i + 1:j + 1][::-1]
+                    for p in range(i + 1, j + 1):
+                        c2 = route[p]
+                        position[c2] = p
+                        if not closed[c2]:
+                            reverse[c2] = not reverse[c2]
+                            sx[c2], ex[c2] = ex[c2], sx[c2]
+                            sy[c2], ey[c2] = ey[c2], sy[c2]
+                    improved = True
+                    break
+    return route
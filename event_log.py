@@ -0,0 +1,90 @@
+# Registro de mensajes acotado, con niveles y sin repetir líneas.
+#
+# Los mensajes van a un búfer circular de tamaño fijo; un mensaje igual al
+# anterior que todavía no se ha mostrado solo incrementa su contador. La
+# interfaz vacía los mensajes nuevos con un temporizador de frecuencia fija
+# en lugar de escribir en pantalla desde los caminos críticos.
+
+import threading
+import time
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+LOG_CAPACITY = 1000  # Entradas que se conservan
+
+
+class LogEntry:
+    __slots__ = ("sequence", "time", "level", "message", "count")
+
+    def __init__(self, sequence, time, level, message):
+        self.sequence = sequence
+        self.time = time
+        self.level = level
+        self.message = message
+        self.count = 1
+
+    def text(self):
+        prefix = "" if self.level == INFO else LEVEL_NAMES.get(self.level, str(self.level)) + ": "
+        suffix = f" (x{self.count:,})" if self.count > 1 else ""
+        return prefix + self.message + suffix
+
+
+class EventLog:
+    def __init__(self, capacity=LOG_CAPACITY, level=INFO, clock=time.monotonic, echo=None):
+        self.entries = deque(maxlen=capacity)
+        self.level = level  # Nivel mínimo que se guarda
+        self.clock = clock
+        self.echo = echo  # Flujo opcional (p. ej. sys.stderr) para copiar cada mensaje nuevo
+        self.dropped = 0  # Entradas que salieron del búfer sin mostrarse
+        self._sequence = 0
+        self._flushed = 0  # Última secuencia entregada por drain()
+        self._lock = threading.Lock()
+
+    def log(self, level, message):
+        if level < self.level:
+            return
+        with self._lock:
+            last = self.entries[-1] if self.entries else None
+            if (last is not None and last.sequence > self._flushed
+                    and last.level == level and last.message == message):
+                last.count += 1
+                last.time = self.clock()
+                return
+            if len(self.entries) == self.entries.maxlen and self.entries[0].sequence > self._flushed:
+                self.dropped += 1
+            self._sequence += 1
+            entry = LogEntry(self._sequence, self.clock(), level, message)
+            self.entries.append(entry)
+        if self.echo is not None:
+            print(entry.text(), file=self.echo)
+
+    def debug(self, message):
+        self.log(DEBUG, message)
+
+    def info(self, message):
+        self.log(INFO, message)
+
+    def warning(self, message):
+        self.log(WARNING, message)
+
+    def error(self, message):
+        self.log(ERROR, message)
+
+    def drain(self):
+        # Entradas nuevas desde la última llamada, en orden
+        with self._lock:
+            new = [e for e in self.entries if e.sequence > self._flushed]
+            self._flushed = self._sequence
+            dropped, self.dropped = self.dropped, 0
+        return new, dropped
+
+    def tail(self, count=None):
+        with self._lock:
+            entries = list(self.entries)
+        return entries if count is None else entries[-count:]
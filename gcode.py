@@ -0,0 +1,294 @@
+# Lectura y escritura de programas G-code.
+#
+# El lector recorre el programa línea a línea con el estado modal (G0/G1/
+# G2/G3, G90/G91, G20/G21, F, M3/M5) y entrega cada movimiento en cm
+# absolutos, con su avance y el estado de la antorcha, sin guardar el
+# programa: la memoria no depende del tamaño del archivo y el planificador
+# puede empezar a cortar con las primeras líneas. Los arcos G2/G3 llegan al
+# planificador como arcos nativos, o se aplanan con la misma tolerancia que
+# las curvas del SVG para la vista previa. Las coordenadas son las de la
+# máquina, sin invertir ningún eje.
+#
+# El escritor vuelca una trayectoria compilada (por ejemplo, la de un SVG)
+# como G-code absoluto en milímetros, con G2/G3 donde los puntos forman arcos.
+
+import math
+import os
+import re
+from collections import deque
+
+import numpy as np
+
+from arcs import ARC_TOLERANCE, arc_bounds, arc_sweep, fit_arcs
+from svg_path import FLATTEN_TOLERANCE
+from toolpath import Toolpath
+
+GCODE_EXTENSIONS = (".gcode", ".nc", ".ngc", ".tap", ".cnc")
+
+# Centímetros por unidad del programa
+UNITS = {"mm": 0.1, "in": 2.54}
+
+# Movimientos por lote al cargar la vista previa; el primero es pequeño
+FIRST_BATCH_MOVES = 256
+BATCH_MOVES = 8192
+
+_COMMENT = re.compile(r"\([^)]*\)|;.*")
+_WORD = re.compile(r"([A-Z])\s*([+-]?(?:\d+\.?\d*|\.\d+))")
+
+
+class GcodeMove:
+    __slots__ = ("x", "y", "feed", "torch", "line", "arc")
+
+    def __init__(self, x, y, feed, torch, line, arc=None):
+        self.x = x  # cm, absoluto
+        self.y = y
+        self.feed = feed  # cm/s, None para la velocidad máxima (G0)
+        self.torch = torch
+        self.line = line  # Línea del programa, desde 1
+        self.arc = arc  # (cx, cy, horario) en cm si el movimiento es un arco
+
+
+def is_gcode(file_name):
+    return os.path.splitext(file_name)[1].lower() in GCODE_EXTENSIONS
+
+
+def _arc_points(x, y, nx, ny, cx, cy, clockwise, tolerance):
+    # Puntos intermedios y final de un arco de (x, y) a (nx, ny) alrededor de
+    # (cx, cy); si los radios inicial y final difieren se interpola entre ambos
+    r0 = math.hypot(x - cx, y - cy)
+    r1 = math.hypot(nx - cx, ny - cy)
+    a0 = math.atan2(y - cy, x - cx)
+    sweep = arc_sweep(cx - x, cy - y, nx - x, ny - y, clockwise)
+    radius = max(r0, r1)
+    if radius > tolerance:
+        step = 2 * math.acos(max(-1.0, 1 - tolerance / radius))
+        count = max(1, math.ceil(sweep / step))
+    else:
+        count = 1
+    direction = -1 if clockwise else 1
+    for k in range(1, count):
+        t = k / count
+        angle = a0 + direction * sweep * t
+        r = r0 + (r1 - r0) * t
+        yield cx + r * math.cos(angle), cy + r * math.sin(angle)
+    yield nx, ny
+
+
+def iter_gcode(lines, tolerance=FLATTEN_TOLERANCE, arcs=False):
+    # Movimientos (GcodeMove) de un programa; `lines` puede ser un archivo
+    # abierto en modo texto o binario. M2/M30 terminan el programa. Con
+    # `arcs`, cada G2/G3 es un solo movimiento con su centro (salvo las
+    # espirales, cuyo radio cambia más que la tolerancia, que se aplanan)
+    unit = UNITS["mm"]
+    absolute = True
+    arc_absolute = False  # G90.1: I/J absolutos
+    motion = 0
+    feed = None
+    torch = False
+    x = y = 0.0
+    for number, text in enumerate(lines, 1):
+        if isinstance(text, bytes):
+            text = text.decode("ascii", "replace")
+        words = _WORD.findall(_COMMENT.sub("", text).upper())
+        if not words:
+            continue
+        params = {}
+        skip = False  # G4, G10, G28, G53, G92...: la línea no mueve los ejes
+        for letter, value in words:
+            if letter == "G":
+                code = float(value)
+                if code in (0, 1, 2, 3):
+                    motion = int(code)
+                elif code == 20:
+                    unit = UNITS["in"]
+                elif code == 21:
+                    unit = UNITS["mm"]
+                elif code == 90:
+                    absolute = True
+                elif code == 91:
+                    absolute = False
+                elif code == 90.1:
+                    arc_absolute = True
+                elif code == 91.1:
+                    arc_absolute = False
+                elif code in (4, 10, 28, 30, 53, 92):
+                    skip = True
+            elif letter == "M":
+                code = int(float(value))
+                if code in (3, 4):
+                    torch = True
+                elif code == 5:
+                    torch = False
+                elif code in (2, 30):
+                    return
+            else:
+                params[letter] = float(value)
+        if "F" in params:
+            feed = params["F"] * unit / 60  # unidades/min -> cm/s
+        arc = motion in (2, 3)
+        if skip or not ("X" in params or "Y" in params
+                        or (arc and ("I" in params or "J" in params))):
+            continue
+        if absolute:
+            nx = params["X"] * unit if "X" in params else x
+            ny = params["Y"] * unit if "Y" in params else y
+        else:
+            nx = x + params.get("X", 0.0) * unit
+            ny = y + params.get("Y", 0.0) * unit
+        if motion == 0:
+            yield GcodeMove(nx, ny, None, False, number)
+        elif not arc:
+            yield GcodeMove(nx, ny, feed, torch, number)
+        else:
+            if "R" in params:
+                # Centro a partir del radio; radio negativo: el arco largo
+                r = params["R"] * unit
+                dx, dy = nx - x, ny - y
+                chord = math.hypot(dx, dy)
+                if chord == 0:
+                    raise ValueError(f"Arco R sin desplazamiento en la línea {number}: {text.strip()}")
+                h = -math.sqrt(max(4 * r * r - chord * chord, 0.0)) / chord
+                if motion == 3:
+                    h = -h
+                if r < 0:
+                    h = -h
+                cx, cy = x + (dx - dy * h) / 2, y + (dy + dx * h) / 2
+            elif "I" in params or "J" in params:
+                i, j = params.get("I", 0.0) * unit, params.get("J", 0.0) * unit
+                cx, cy = (i, j) if arc_absolute else (x + i, y + j)
+            else:
+                raise ValueError(f"Arco sin centro en la línea {number}: {text.strip()}")
+            if arcs and abs(math.hypot(x - cx, y - cy) - math.hypot(nx - cx, ny - cy)) <= tolerance:
+                yield GcodeMove(nx, ny, feed, torch, number, (cx, cy, motion == 2))
+            else:
+                for px, py in _arc_points(x, y, nx, ny, cx, cy, motion == 2, tolerance):
+                    yield GcodeMove(px, py, feed, torch, number)
+        x, y = nx, ny
+
+
+class MoveStream:
+    # Puntos (x, y, avance, arco) para el planificador a partir de
+    # movimientos G-code. Guarda la antorcha solo de los puntos que siguen en
+    # la ventana de anticipación, de modo que la memoria no crece con el
+    # programa. stream[i] es verdadero si al punto i se llega sin antorcha,
+    # como los cortes de `breaks` del planificador.
+    def __init__(self, moves, work_area=None, skip=0):
+        self.moves = moves
+        self.work_area = work_area  # (ancho, alto) en cm: se descartan los puntos fuera
+        self.skip = skip  # Puntos válidos que se saltan (para continuar un trabajo)
+        self.points = 0
+        self.out_of_bounds = 0
+        self.pierces = 0  # Encendidos de la antorcha
+        self._torch = deque()
+        self._base = 0
+
+    def __iter__(self):
+        width, height = self.work_area or (math.inf, math.inf)
+        skip = self.skip
+        torch = False
+        dropped = False  # Al punto que sigue a uno descartado se llega en vacío
+        px, py = 0.0, 0.0
+        for move in self.moves:
+            x, y = move.x, move.y
+            if move.arc is not None:
+                # Un arco puede salir del área aunque sus extremos estén dentro;
+                # se admite lo que sobresale un arco tangente al borde
+                left, bottom, right, top = arc_bounds(px, py, x, y, *move.arc)
+                left, bottom = left + ARC_TOLERANCE, bottom + ARC_TOLERANCE
+                right, top = right - ARC_TOLERANCE, top - ARC_TOLERANCE
+            else:
+                left, bottom, right, top = x, y, x, y
+            px, py = x, y
+            if not (0 <= left and right <= width and 0 <= bottom and top <= height):
+                self.out_of_bounds += 1
+                dropped = True
+                continue
+            if skip:
+                skip -= 1
+                continue
+            arc = None if dropped else move.arc
+            if move.torch and not dropped and not torch:
+                self.pierces += 1
+            torch = move.torch and not dropped
+            dropped = False
+            self.points += 1
+            self._torch.append(torch)
+            yield x, y, move.feed, arc
+
+    def __getitem__(self, index):
+        return not self._torch[index - self._base]
+
+    def torch(self, index):
+        # Antorcha del punto `index` (en orden creciente); libera los anteriores
+        while self._base < index:
+            self._torch.popleft()
+            self._base += 1
+        return self._torch[0]
+
+
+def iter_load_gcode(file_name, tolerance=FLATTEN_TOLERANCE):
+    # Igual que iter_load_toolpath para un programa G-code: un punto por
+    # movimiento; cada movimiento sin antorcha empieza un contorno nuevo y
+    # los recorridos en vacío seguidos se unen en uno solo, sin dejar
+    # contornos de un punto
+    contours = []
+    current = []
+    sent = 0
+    batch = FIRST_BATCH_MOVES
+    pending = 0
+    with open(file_name, "rb") as f:
+        size = os.fstat(f.fileno()).st_size or 1
+        for move in iter_gcode(f, tolerance):
+            if not move.torch:
+                if len(current) > 1:
+                    contours.append(np.array(current, dtype=np.float32))
+                current = []
+            current.append((move.x, move.y))
+            pending += 1
+            if pending >= batch and len(contours) > sent:
+                yield "contours", contours[sent:], f.tell() / size
+                sent = len(contours)
+                pending = 0
+                batch = min(batch * 2, BATCH_MOVES)
+    if len(current) > 1:
+        contours.append(np.array(current, dtype=np.float32))
+    if len(contours) > sent:
+        yield "contours", contours[sent:], 1.0
+    yield "toolpath", Toolpath.from_contours(contours, tolerance), 1.0
+
+
+def write_gcode(toolpath, out, feed, units="mm", arc_tolerance=ARC_TOLERANCE):
+    # G-code absoluto: G0 al inicio de cada contorno, M3, G1 (o G2/G3 en los
+    # tramos que forman arcos, con I/J relativos) a lo largo del contorno y
+    # M5 al terminarlo. feed en cm/s; arc_tolerance None escribe solo G1
+    scale = 1 / UNITS[units]
+    out.write("G90\n" + ("G21\n" if units == "mm" else "G20\n") + "M5\n")
+    rate = f" F{feed * 60 * scale:.1f}"
+    for i in range(len(toolpath)):
+        contour = toolpath.contour(i).astype(np.float64).tolist()
+        if not contour:
+            continue
+        x, y = contour[0]
+        out.write(f"G0 X{x * scale:.3f} Y{y * scale:.3f}\n")
+        if len(contour) < 2:
+            continue
+        moves = fit_arcs(contour, arc_tolerance) if arc_tolerance else enumerate(contour)
+        lines = ["M3"]
+        motion = None
+        for index, point in moves:
+            if index == 0:
+                continue  # El inicio, ya alcanzado con G0
+            nx, ny = point[0], point[1]
+            arc = point[3] if len(point) > 3 else None
+            if arc is None:
+                word, center = "G1", ""
+            else:
+                word = "G2" if arc[2] else "G3"
+                center = f" I{(arc[0] - x) * scale:.3f} J{(arc[1] - y) * scale:.3f}"
+            prefix = "" if word == motion == "G1" else word + " "
+            lines.append(f"{prefix}X{nx * scale:.3f} Y{ny * scale:.3f}{center}{rate if motion is None else ''}")
+            motion = word
+            x, y = nx, ny
+        lines.append("M5\n")
+        out.write("\n".join(lines))
+    out.write("M2\n")
@@ -0,0 +1,90 @@
+# Backends de GPIO intercambiables.
+#
+# En la Raspberry Pi se usa RPi.GPIO directamente. En cualquier otra máquina
+# se usa RecordingGPIO, que imita la misma interfaz y guarda cada cambio de
+# pin con su marca de tiempo, para poder medir el generador de pasos sin
+# hardware.
+
+import os
+import time
+from collections import deque
+
+# Mismos valores que RPi.GPIO
+HIGH = 1
+LOW = 0
+OUT = 0
+IN = 1
+BOARD = 10
+BCM = 11
+
+# Variable de entorno para forzar un backend: "rpi" o "recorder"
+BACKEND_ENV = "CNC_GPIO_BACKEND"
+
+
+class RecordingGPIO:
+    HIGH = HIGH
+    LOW = LOW
+    OUT = OUT
+    IN = IN
+    BOARD = BOARD
+    BCM = BCM
+
+    def __init__(self, clock=time.monotonic, max_events=1 << 20):
+        self.clock = clock
+        self.mode = None
+        self.directions = {}
+        self.levels = {}
+        # Lista acotada de (tiempo, pin, nivel)
+        self.events = deque(maxlen=max_events)
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, channel, direction, initial=None):
+        for pin in _as_list(channel):
+            self.directions[pin] = direction
+            self.levels[pin] = LOW if initial is None else initial
+
+    def output(self, channel, value):
+        now = self.clock()
+        pins = _as_list(channel)
+        values = _as_list(value) if isinstance(value, (list, tuple)) else [value] * len(pins)
+        for pin, level in zip(pins, values):
+            level = HIGH if level else LOW
+            self.levels[pin] = level
+            self.events.append((now, pin, level))
+
+    def input(self, channel):
+        return self.levels.get(channel, LOW)
+
+    def cleanup(self, channel=None):
+        if channel is None:
+            self.directions.clear()
+            self.levels.clear()
+        else:
+            for pin in _as_list(channel):
+                self.directions.pop(pin, None)
+                self.levels.pop(pin, None)
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def get_backend(name=None):
+    # Devuelve el módulo RPi.GPIO si está disponible, si no la grabadora
+    name = name or os.environ.get(BACKEND_ENV, "")
+    if name == "recorder":
+        return RecordingGPIO()
+    try:
+        import RPi.GPIO as GPIO
+    except (ImportError, RuntimeError):
+        if name == "rpi":
+            raise
+        return RecordingGPIO()
+    return GPIO
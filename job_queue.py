@@ -0,0 +1,264 @@
+# Cola de trabajos con preparación anticipada.
+#
+# Mientras se corta una chapa, los trabajos siguientes de la cola se leen,
+# ordenan y planifican en un grupo de procesos de trabajo: cada uno entrega
+# un PreparedJob con la trayectoria y todos los registros de pasos ya
+# calculados e indexados, de modo que empezar la chapa siguiente no espera a
+# nada. El plan empieza en el primer punto del trabajo; al ejecutarlo solo
+# falta el tramo en vacío desde donde esté la máquina. El mismo grupo
+# planifica también el trabajo cargado en la GUI, para poder reanudarlo.
+#
+# Los procesos de trabajo se lanzan con spawn (no heredan Qt) y corren con
+# la prioridad más baja del sistema (SCHED_IDLE, o nice si no existe), de
+# modo que el proceso de movimiento y la GUI tienen siempre la CPU primero.
+# Solo se prepara una ventana corta de la cola, y los trabajos preparados se
+# guardan en memoria hasta un tamaño máximo.
+#
+# No importa PyQt5: la GUI consulta la cola con un temporizador.
+
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from cnc_core import JobReport, JobSettings, plan_toolpath, work_area_mask
+from step_stream import RECORD, StepIndexBuilder
+from toolpath import ToolpathCache, load_toolpath
+
+PREPARE_AHEAD = 2  # Trabajos distintos de la cola que se preparan por adelantado
+PREPARED_MAX_BYTES = 256 * 1024 * 1024  # Memoria para los trabajos preparados
+WORKER_NICE = 19  # Si SCHED_IDLE no está disponible
+
+
+def prepare_workers():
+    # Deja un núcleo al proceso de movimiento y otro a la GUI
+    return max(1, (os.cpu_count() or 1) - 2)
+
+
+class PreparedJob:
+    def __init__(self, file_name, toolpath, report):
+        self.file_name = file_name
+        self.toolpath = toolpath
+        self.report = report
+        self.start = None  # Primer punto (pasos) donde empieza el plan, None sin plan
+        self.records = np.zeros(0, dtype=RECORD)
+        self.index = StepIndexBuilder().build(0)
+
+    @property
+    def planned(self):
+        return self.start is not None
+
+    @property
+    def nbytes(self):
+        return (self.toolpath.points.nbytes + self.toolpath.offsets.nbytes + self.records.nbytes
+                + self.index.nbytes)
+
+    def plan(self, settings):
+        # Mismo plan que haría la GUI, empezando en el primer punto dentro de la mesa
+        points = self.toolpath.points
+        inside = work_area_mask(points, *settings.work_area, bounds=self.toolpath.bounds)
+        if inside is not None:
+            if not inside.any():
+                return
+            points = points[inside]
+        spc = settings.steps_per_cm
+        start = (round(float(points[0, 0]) * spc), round(float(points[0, 1]) * spc))
+        blocks = []
+        index = StepIndexBuilder(start)
+        ticks = 0
+        for segment, records in plan_toolpath(self.toolpath, settings, self.report, start):
+            index.add(segment, records, ticks)
+            blocks.append(records)
+            ticks += len(records)
+        if blocks:
+            self.records = np.concatenate(blocks)
+        self.index = index.build(ticks)
+        self.report.ticks = ticks
+        self.start = start
+
+
+def prepare_job(file_name, settings, cache_dir=None):
+    # Se ejecuta en un proceso de trabajo: lectura (o caché), orden y plan
+    cache = ToolpathCache(cache_dir) if cache_dir else None
+    toolpath = load_toolpath(file_name, settings.tolerance, cache, settings.optimize,
+                             settings.simplify, settings.merge_collinear)
+    # Copia en memoria: la entrada de la caché puede expulsarse mientras espera
+    toolpath.points = np.array(toolpath.points)
+    toolpath.offsets = np.array(toolpath.offsets)
+    return prepare_toolpath(file_name, toolpath, settings)
+
+
+def prepare_toolpath(file_name, toolpath, settings):
+    # Plan de una trayectoria ya cargada (anidada, recolocada...)
+    job = PreparedJob(file_name, toolpath, JobReport(file_name))
+    if toolpath.fits(*settings.work_area):
+        job.plan(settings)
+    return job
+
+
+def _idle_priority():
+    # Inicializador de los procesos de trabajo: solo usan la CPU que sobra
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError):
+        try:
+            os.nice(WORKER_NICE)
+        except (AttributeError, OSError):
+            pass
+
+
+class JobQueue:
+    def __init__(self, settings=None, cache_dir=None, workers=None, ahead=PREPARE_AHEAD,
+                 max_bytes=PREPARED_MAX_BYTES):
+        self.settings = settings or JobSettings()
+        self.cache_dir = cache_dir
+        self.workers = workers or prepare_workers()
+        self.ahead = ahead
+        self.max_bytes = max_bytes
+        self.files = []  # Trabajos pendientes, en orden (se admiten repetidos)
+        self.errors = {}  # archivo -> mensaje de la preparación fallida
+        self._pool = None
+        self._pending = OrderedDict()  # archivo -> Future
+        self._ready = OrderedDict()  # archivo -> PreparedJob
+        self._evicted = set()  # Se vuelven a preparar al llegar al frente
+
+    def __len__(self):
+        return len(self.files)
+
+    def add(self, files):
+        self.files.extend(files)
+        self._schedule()
+
+    def state(self, file_name):
+        if file_name in self._ready:
+            return "ready"
+        if file_name in self._pending:
+            return "preparing"
+        if file_name in self.errors:
+            return "failed"
+        return "queued"
+
+    @property
+    def ready_bytes(self):
+        return sum(job.nbytes for job in self._ready.values())
+
+    def set_settings(self, settings):
+        # Otros parámetros de carga o de la máquina: lo preparado ya no vale
+        self.settings = settings
+        self._discard()
+        self._schedule()
+
+    def prepare(self, file_name, toolpath):
+        # Planifica en el mismo grupo el trabajo cargado en la GUI; devuelve el Future
+        return self._submit(prepare_toolpath, file_name, toolpath, self.settings)
+
+    def poll(self):
+        # Recoge las preparaciones terminadas: [(archivo, PreparedJob o None, error)]
+        done = []
+        for file_name, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[file_name]
+            try:
+                job = future.result()
+            except CancelledError:
+                continue
+            except BrokenProcessPool as error:
+                # Un proceso de trabajo murió (p. ej. sin memoria): se crea otro grupo
+                self._pool = None
+                self.errors[file_name] = str(error) or "worker process died"
+                done.append((file_name, None, self.errors[file_name]))
+                continue
+            except Exception as error:
+                # Cualquier fallo de la preparación se informa; no llega al bucle de Qt
+                self.errors[file_name] = str(error) or type(error).__name__
+                done.append((file_name, None, self.errors[file_name]))
+                continue
+            if file_name in self.files:
+                self._ready[file_name] = job
+                done.append((file_name, job, None))
+        self._evict()
+        self._schedule()
+        return done
+
+    def pop(self):
+        # Siguiente trabajo: (archivo, PreparedJob), o (archivo, None) si
+        # todavía no está listo y hay que cargarlo como siempre
+        file_name = self.files.pop(0)
+        job = self._ready.get(file_name)
+        if file_name not in self.files:
+            # Un trabajo repetido conserva lo preparado para la siguiente vez
+            self._ready.pop(file_name, None)
+            future = self._pending.pop(file_name, None)
+            if future is not None:
+                future.cancel()
+            self.errors.pop(file_name, None)
+        self._evicted.discard(file_name)
+        self._schedule()
+        return file_name, job
+
+    def clear(self):
+        self.files = []
+        self.errors = {}
+        self._discard()
+
+    def shutdown(self):
+        self.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _discard(self):
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._ready.clear()
+        self._evicted.clear()
+
+    def _window(self):
+        # Primeros `ahead` trabajos distintos de la cola
+        window = []
+        for file_name in self.files:
+            if file_name not in window:
+                window.append(file_name)
+                if len(window) == self.ahead:
+                    break
+        return window
+
+    def _schedule(self):
+        for position, file_name in enumerate(self._window()):
+            if file_name in self._ready or file_name in self._pending or file_name in self.errors:
+                continue
+            if position and (file_name in self._evicted or self.ready_bytes >= self.max_bytes):
+                continue
+            self._pending[file_name] = self._submit(prepare_job, file_name, self.settings,
+                                                    self.cache_dir)
+
+    def _submit(self, function, *args):
+        for _ in range(2):
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, multiprocessing.get_context("spawn"),
+                                                 initializer=_idle_priority)
+            try:
+                return self._pool.submit(function, *args)
+            except BrokenProcessPool:
+                # Un proceso de trabajo murió antes: se crea otro grupo
+                self._pool = None
+        raise BrokenProcessPool("No se pudo crear el grupo de procesos de trabajo")
+
+    def _evict(self):
+        # Por encima del máximo se descartan los más lejanos en la cola (nunca el primero)
+        total = self.ready_bytes
+        if total <= self.max_bytes:
+            return
+        order = {}
+        for position, file_name in enumerate(self.files):
+            order.setdefault(file_name, position)
+        for file_name in sorted(self._ready, key=order.get, reverse=True):
+            if total <= self.max_bytes or order[file_name] == 0:
+                break
+            total -= self._ready.pop(file_name).nbytes
+            self._evicted.add(file_name)
@@ -6,26 +6,62 @@ from PyQt5.QtWidgets import (
     QMainWindow, QLabel, QVBoxLayout, QWidget, QPushButton, QHBoxLayout, 
     QTextEdit, QGroupBox, QGridLayout, QGraphicsView, QGraphicsScene, 
     QFileDialog, QAction, QApplication, QMessageBox, QDialog, 
-    QFormLayout, QLineEdit, QDialogButtonBox
+    QFormLayout, QLineEdit, QDialogButtonBox, QGraphicsEllipseItem,
+    QGraphicsItem, QInputDialog, QProgressBar, QCheckBox
 )
 
 # Importa clases de PyQt5 para manejar eventos y tiempo
-from PyQt5.QtCore import Qt, QTimer, QPointF
+from PyQt5.QtCore import Qt, QTimer, QPointF, QRectF
 
-# Importa clase de PyQt5 para trabajar con gráficos SVG
-from PyQt5.QtSvg import QGraphicsSvgItem
+# Importa clases de PyQt5 para dibujar la vista previa
+from PyQt5.QtGui import QPen
 
-# Importa minidom para trabajar con XML
-from xml.dom import minidom
+# Hilo que planifica y alimenta al proceso de movimiento
+import os
+import threading
 
-# Importa re para trabajar con expresiones regulares
-import re
+# Niveles lógicos de los pines
+from gpio_backend import HIGH, LOW
 
-# Importa RPi.GPIO para manejar los pines GPIO de la Raspberry Pi
-import RPi.GPIO as GPIO
+# Ejecución de los pasos en un proceso aparte, alimentado por memoria compartida
+from motion_process import EMERGENCY, IDLE, PAUSED, MotionProcess
 
-# Importa threading para manejar hilos de ejecución en paralelo
-import threading
+# Resolución de la máquina y registros de pasos que consume el proceso de movimiento
+from motion import STEPS_PER_CM
+from step_stream import move_records, segment_records
+
+# Planificador de velocidad con rampas y look-ahead
+from planner import MachineLimits, Planner
+
+# Trayectoria compilada con caché en disco (lectura del SVG en una sola pasada)
+from toolpath import ToolpathCache, iter_load_toolpath, iter_points
+
+# Escala, desplazamiento, giro y espejo de la trayectoria cargada
+import affine
+
+# Núcleo sin interfaz: tolerancia de aplanado, área de trabajo y recorte
+from cnc_core import (FLATTEN_TOLERANCE, MERGE_COLLINEAR, SIMPLIFY_TOLERANCE, WORK_AREA_HEIGHT,
+                      WORK_AREA_WIDTH, JobReport, JobSettings, clip_rapids, format_duration,
+                      iter_resume, rapid_starts, work_area_mask)
+
+# Máquina simulada con reloj virtual para estimar el tiempo de ciclo
+from simulator import simulate_gcode, simulate_toolpath
+
+# Cola de trabajos preparados en procesos de trabajo mientras se corta
+from job_queue import JobQueue
+
+# Registro de mensajes acotado que la interfaz vacía periódicamente
+from event_log import EventLog
+
+# Anidado de varias piezas en una chapa
+from nesting import Part, iter_nest
+
+# Programas G-code: lectura en flujo y exportación
+from gcode import MoveStream, iter_gcode, iter_load_gcode, write_gcode
+
+# Conversión de arreglos de puntos a QPainterPath para la vista previa
+# y carga en segundo plano con dibujo progresivo; trazo del corte en marcha
+from preview import CutProgress, ProgressiveLoader, TraceReplay, painter_path, refresh_interval
 
 
 # Configuración de los pines GPIO para el eje X
@@ -41,11 +77,25 @@ YEnable = 21
 # Configuración del pin GPIO para el relé
 RelayPin = 27
 
-STEP_DELAY = 0.001  # Constantes de tiempo para el paso del motor
+STEP_DELAY = 0.001  # Constantes de tiempo para el paso del motor (movimiento manual)
+
+# Límites de la máquina para el planificador (ejes X, Y)
+MAX_VELOCITY = (8.0, 8.0)  # cm/s
+ACCELERATION = (40.0, 40.0)  # cm/s²
+JERK = None  # cm/s³, None para rampas trapezoidales
+LOOKAHEAD = 16  # Segmentos de anticipación
 
-# Dimensiones de la mesa de trabajo en cm
-WORK_AREA_WIDTH = 90
-WORK_AREA_HEIGHT = 50
+OPTIMIZE_CUT_ORDER = True  # Reordenar contornos para reducir el recorrido en vacío
+
+QUEUE_POLL_INTERVAL = 500  # ms entre consultas de la cola de trabajos
+
+REPLAY_SPEED = 10.0  # Múltiplo del tiempo real al reproducir una simulación
+
+LOG_FLUSH_INTERVAL = 250  # ms entre actualizaciones del panel de mensajes
+MESSAGE_LINES = 500  # Líneas que conserva el panel de mensajes
+
+STEP_TIMING_STATS = False  # Medir el retraso real de cada pulso del generador
+STATS_DUMP_INTERVAL = 5000  # ms entre resúmenes de temporización en los mensajes
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -53,15 +103,14 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("CNC- Interface")
         self.setGeometry(100, 100, 1000, 800)
         
-        # Inicializar GPIO
-        GPIO.setwarnings(False)
-        GPIO.setmode(GPIO.BCM)
-        self.motor_initialize(XDir, XStepPin, XEnable)
-        self.motor_initialize(YDir, YStepPin, YEnable)
-        
-        # Configurar el pin del relé
-        GPIO.setup(RelayPin, GPIO.OUT)
-        GPIO.output(RelayPin, GPIO.LOW)  # Inicialmente apagado
+        # Proceso de movimiento: configura los pines (motores, habilitación y
+        # relé) y genera los pulsos fuera del proceso de la interfaz
+        self.motion = MotionProcess((XDir, XStepPin), (YDir, YStepPin), RelayPin, (XEnable, YEnable),
+                                    stats=STEP_TIMING_STATS,
+                                    acceleration=min(ACCELERATION) * STEPS_PER_CM)
+        self.motion.start()
+        self.planner = Planner(MachineLimits(MAX_VELOCITY, ACCELERATION, JERK, lookahead=LOOKAHEAD))
+        self.feeder = None  # Hilo que planifica el trabajo y lo escribe en el búfer
         
         # Crear widgets principales
         self.status_label = QLabel("estado : listo")
@@ -76,6 +125,10 @@ class MainWindow(QMainWindow):
         self.control_button_pause = QPushButton("Pause")
         self.control_button_pause.clicked.connect(self.on_pause_button_clicked)
         
+        self.control_button_emergency = QPushButton("Emergency stop")
+        self.control_button_emergency.setStyleSheet("background-color: red; color: white;")
+        self.control_button_emergency.clicked.connect(self.on_emergency_button_clicked)
+        
         self.coordinates_display = QTextEdit()
         self.coordinates_display.setReadOnly(True)
         self.coordinates_display.setText("Coordinates:\nX: 0.0\nY: 0.0\nZ: 0.0")
@@ -83,10 +136,26 @@ class MainWindow(QMainWindow):
         self.message_display = QTextEdit()
         self.message_display.setReadOnly(True)
         self.message_display.setText("Messages:\nSystem ready.")
-        
-        # Simulación de coordenadas
+        self.message_display.document().setMaximumBlockCount(MESSAGE_LINES)
+        
+        # Los mensajes se guardan en un búfer y se muestran a frecuencia fija
+        self.log = EventLog()
+        self.log_timer = QTimer()
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start(LOG_FLUSH_INTERVAL)
+        
+        # Resumen periódico de la temporización de pasos, si se mide
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.dump_step_stats)
+        if STEP_TIMING_STATS:
+            self.stats_timer.start(STATS_DUMP_INTERVAL)
+        
+        # Un cuadro por refresco de la pantalla durante el corte: posición y
+        # trazo cortado, sin importar cuántos pasos haya dado la máquina
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_coordinates)
+        self.frame_interval = refresh_interval()
+        self.progress = None  # Trazo de lo ya cortado del trabajo en marcha
         
         # Placeholder para visualización gráfica
         self.graphics_view = QGraphicsView()
@@ -97,16 +166,36 @@ class MainWindow(QMainWindow):
         # Puntero que se mueve
         self.pointer = QGraphicsEllipseItem(-5, -5, 10, 10)
         self.pointer.setBrush(Qt.red)
+        self.pointer.setFlag(QGraphicsItem.ItemIgnoresTransformations)  # Tamaño fijo en pantalla
         self.scene.addItem(self.pointer)
         self.pointer.setZValue(1)  
-        self.path_points = []  # Lista de puntos del camino
+        self.path_points = []  # Puntos del camino (arreglo n×2 en cm)
+        self.path_rapids = []  # True en los puntos a los que se llega en vacío
+        self.gcode_file = None  # Programa G-code que se corta leyéndolo en flujo
+        self.toolpath = None  # Trayectoria cargada, para exportarla
+        self.source_toolpath = None  # La misma tal como se leyó, antes de editar su colocación
+        self.placement = {}  # Última colocación pedida (ancho, alto, inicio, giro, espejo)
+        self.replay = None  # Reproducción de la última simulación en la vista previa
+        self.replay_speed = REPLAY_SPEED
+        self.toolpath_cache = ToolpathCache()
         self.current_point_index = 0
+        self.simplify_tolerance = SIMPLIFY_TOLERANCE  # cm, 0 para no simplificar
+        
+        # Los trabajos en cola se preparan (lectura, orden y plan) mientras se
+        # corta; el trabajo cargado desde la cola trae ya sus pasos
+        self.job_queue = JobQueue(self.job_settings(), self.toolpath_cache.directory)
+        self.prepared = None  # Plan indexado del trabajo cargado, si ya está listo
+        self.preparing = None  # Future del plan del trabajo cargado
+        self.resume_segment = None  # Segmento elegido para el siguiente inicio
+        self.queue_timer = QTimer()
+        self.queue_timer.timeout.connect(self.poll_queue)
         
         # Layout de control
         control_layout = QHBoxLayout()
         control_layout.addWidget(self.control_button_start)
         control_layout.addWidget(self.control_button_pause)
         control_layout.addWidget(self.control_button_stop)
+        control_layout.addWidget(self.control_button_emergency)
         
         # Grupo de control
         control_group = QGroupBox("Control")
@@ -141,200 +230,630 @@ class MainWindow(QMainWindow):
         open_svg_action.triggered.connect(self.load_svg)
         self.menuBar().addAction(open_svg_action)
         
-        # Añadir acción para editar SVG
-        edit_svg_action = QAction('Edit SVG', self)
-        edit_svg_action.triggered.connect(self.edit_svg)
+        # Añadir acciones para cargar y exportar G-code
+        open_gcode_action = QAction('Load G-code', self)
+        open_gcode_action.triggered.connect(self.load_gcode)
+        self.menuBar().addAction(open_gcode_action)
+        export_gcode_action = QAction('Export G-code', self)
+        export_gcode_action.triggered.connect(self.export_gcode)
+        self.menuBar().addAction(export_gcode_action)
+        
+        # Añadir acción para anidar varias piezas en la chapa
+        nest_action = QAction('Nest parts', self)
+        nest_action.triggered.connect(self.nest_parts)
+        self.menuBar().addAction(nest_action)
+        
+        # Añadir acciones para encolar trabajos y cargar el siguiente
+        queue_action = QAction('Queue jobs', self)
+        queue_action.triggered.connect(self.queue_jobs)
+        self.menuBar().addAction(queue_action)
+        next_job_action = QAction('Next job', self)
+        next_job_action.triggered.connect(self.next_job)
+        self.menuBar().addAction(next_job_action)
+        
+        # Añadir acción para elegir dónde reanudar tras un paro
+        resume_action = QAction('Resume from...', self)
+        resume_action.triggered.connect(self.choose_resume)
+        self.menuBar().addAction(resume_action)
+        
+        # Añadir acción para simular el trabajo cargado y estimar su tiempo
+        simulate_action = QAction('Simulate', self)
+        simulate_action.triggered.connect(self.simulate_job)
+        self.menuBar().addAction(simulate_action)
+        
+        # Añadir acción para escalar, mover, girar o reflejar el trabajo cargado
+        edit_svg_action = QAction('Edit placement', self)
+        edit_svg_action.triggered.connect(self.edit_placement)
         self.menuBar().addAction(edit_svg_action)
         
+        # Añadir acción para ajustar la simplificación de trayectorias
+        simplify_action = QAction('Simplify', self)
+        simplify_action.triggered.connect(self.edit_simplify_tolerance)
+        self.menuBar().addAction(simplify_action)
+        
+        # Avance de la carga de archivos, con opción de cancelar
+        self.loader = None
+        self.loading_items = []  # Lotes dibujados mientras se lee el archivo
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.cancel_load_button = QPushButton("Cancel")
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_load_button)
+        self.progress_bar.hide()
+        self.cancel_load_button.hide()
+        
         # Evento de teclado
         self.setFocusPolicy(Qt.StrongFocus)
         
-    def motor_initialize(self, dir_pin, step_pin, en_pin):
-        GPIO.setup(dir_pin, GPIO.OUT)
-        GPIO.setup(step_pin, GPIO.OUT)
-        GPIO.setup(en_pin, GPIO.OUT)
-        GPIO.output(en_pin, GPIO.LOW)  # Activa el plasma
-
-    def pulse_motor(self, dir_pin, step_pin, direction, steps, delay):
-        GPIO.output(dir_pin, direction)
-        
-        def send_pulse(step_pin, delay, steps_left):
-            if steps_left > 0:
-                GPIO.output(step_pin, GPIO.HIGH)
-                threading.Timer(delay, GPIO.output, [step_pin, GPIO.LOW]).start()
-                threading.Timer(delay * 2, send_pulse, [step_pin, delay, steps_left - 1]).start()
-        
-        send_pulse(step_pin, delay, steps)
-    
     def on_start_button_clicked(self):
+        state = self.motion.state()
+        if state == EMERGENCY:
+            self.motion.reset()
+            self.log.warning("Emergency stop cleared.")
+        if state == PAUSED:
+            self.motion.run()  # Continúa en el tic donde se pausó, acelerando desde el reposo
+        elif self.feeder is not None and self.feeder.is_alive():
+            return
+        else:
+            self.start_path()
         self.status_label.setText("Status: Running")
-        self.message_display.append("System started.")
-        self.timer.start(100)
-        GPIO.output(RelayPin, GPIO.HIGH)  # Encender el relé
+        self.log.info("System started.")
+        self.timer.start(self.frame_interval)
         
     def on_stop_button_clicked(self):
         self.status_label.setText("Status: Stopped")
-        self.message_display.append("System stopped.")
+        self.log.info("System stopped.")
         self.timer.stop()
-        GPIO.output(RelayPin, GPIO.LOW)  # Apagar el relé
+        self.halt_motion()
         
     def on_pause_button_clicked(self):
+        # Frena hasta el reposo, la antorcha se apaga y lo pendiente queda en el
+        # búfer para continuar
+        self.motion.pause()
         self.status_label.setText("Status: Paused")
-        self.message_display.append("System paused.")
+        self.log.info("System paused.")
         self.timer.stop()
-        GPIO.output(RelayPin, GPIO.LOW)  # Apagar el relé
-        
+        self.update_coordinates()
+
+    def on_emergency_button_clicked(self):
+        # Primero la orden al proceso de movimiento; lo demás puede esperar
+        self.motion.emergency_stop()
+        self.timer.stop()
+        self.stop_feeder()
+        if self.motion.wait_state((EMERGENCY,), 0.5):
+            self.motion.drop_discarded()
+        self.status_label.setText("Status: EMERGENCY STOP")
+        self.log.error("Emergency stop! Press start to re-enable the drivers.")
+        self.update_coordinates()
+        
+    def start_path(self):
+        # Planifica desde el punto actual hasta el final en un hilo aparte; el
+        # búfer circular limita cuánto se adelanta al proceso de movimiento
+        self.stop_replay()
+        segment = None
+        if self.prepared is not None and not self.gcode_file:
+            # Con el plan indexado se sigue en el segmento elegido o en el que
+            # estaba en curso, sin planificar ni recorrer lo anterior
+            index = self.prepared.index
+            segment = self.resume_segment
+            if segment is None:
+                segment = index.segment_after(self.current_point_index - 1)
+                if segment >= len(index):
+                    segment = 0  # Trabajo terminado: se corta otra vez
+            self.current_point_index = int(index.rows["tag"][segment - 1]) if segment else 0
+        self.resume_segment = None
+        if self.progress is None or self.current_point_index == 0:
+            # Los puntos del G-code en flujo no coinciden con los de la vista
+            # previa (arcos nativos): se dibuja la posición muestreada
+            self.clear_progress()
+            if self.gcode_file:
+                self.progress = CutProgress(self.scene)
+            else:
+                self.progress = CutProgress(self.scene, self.path_points, self.path_rapids)
+        self.motion.begin()
+        self.motion.run()
+        if self.gcode_file:
+            target, first = self.feed_gcode, self.current_point_index
+        elif segment is not None:
+            target, first = self.feed_prepared, segment
+        else:
+            target, first = self.feed_path, self.current_point_index
+        self.feeder = threading.Thread(target=target, args=(first,), name="path-feeder", daemon=True)
+        self.feeder.start()
+
+    def feed_path(self, first):
+        points = iter_points(self.path_points, first)
+        breaks = self.path_rapids[first:]
+        for segment in self.planner.iter_plan(points, self.motion.tail, breaks):
+            index = first + segment.index
+            records = segment_records(segment, torch=not self.path_rapids[index])
+            if not self.motion.write(records, (segment.dx, segment.dy), index):
+                return  # Cancelado
+        self.motion.finish()
+
+    def feed_prepared(self, segment):
+        # Plan indexado (de la cola o preparado en segundo plano): tramo en
+        # vacío hasta el inicio del segmento y después sus registros
+        job = self.prepared
+        for records, delta, index in iter_resume(job.records, job.index, segment, self.planner,
+                                                 self.path_points, self.path_rapids, self.motion.tail):
+            if not self.motion.write(records, delta, index):
+                return  # Cancelado
+        self.motion.finish()
+
+    def feed_gcode(self, first):
+        # El programa se lee de nuevo en flujo, con su avance F y su antorcha:
+        # memoria constante y el corte empieza sin esperar a la vista previa
+        with open(self.gcode_file, "rb") as f:
+            moves = MoveStream(iter_gcode(f, FLATTEN_TOLERANCE, arcs=True),
+                               (WORK_AREA_WIDTH, WORK_AREA_HEIGHT), first)
+            for segment in self.planner.iter_plan(moves, self.motion.tail, moves):
+                records = segment_records(segment, torch=moves.torch(segment.index))
+                if not self.motion.write(records, (segment.dx, segment.dy), first + segment.index):
+                    return  # Cancelado
+        self.motion.finish()
+
+    def stop_feeder(self):
+        self.motion.cancel()
+        if self.feeder is not None:
+            self.feeder.join()
+            self.feeder = None
+
+    def halt_motion(self):
+        # Detiene los pulsos en el siguiente tic y descarta lo pendiente
+        self.stop_feeder()
+        self.motion.stop()
+        self.update_coordinates()
+
     def update_coordinates(self):
-        if self.current_point_index < len(self.path_points):
-            point = self.path_points[self.current_point_index]
-            x, y = point.x(), point.y()
+        # Un cuadro: el avance y la posición que informa el proceso de
+        # movimiento se leen una vez y solo se redibuja lo que cambió
+        index = self.motion.completed_tag()
+        if index is not None and index >= self.current_point_index:
+            self.current_point_index = index + 1
+        x_steps, y_steps = self.motion.position()
+        x, y = x_steps / STEPS_PER_CM, y_steps / STEPS_PER_CM
+        if self.progress is not None:
+            self.progress.update(index, x, y, self.motion.torch())
+        if self.pointer.pos() != QPointF(x, y):
             self.coordinates_display.setText(f"Coordinates:\nX: {x}\nY: {y}\nZ: 0.0")
-            self.message_display.append(f"Coordinates updated: X={x}, Y={y}, Z=0.0")
-            print(f"Moving pointer to: X={x}, Y={y}")  # Debug: imprimir la posición del puntero
-            self.pointer.setPos(point)
-
-            # Controlar los motores según las coordenadas
-            steps_x = int(x * 100)  # Convertir cm a pasos (ajustar según la resolución de tu sistema)
-            direction_x = GPIO.HIGH if steps_x > 0 else GPIO.LOW
-            self.pulse_motor(XDir, XStepPin, direction_x, abs(steps_x), STEP_DELAY)
-            
-            steps_y = int(y * 100)  # Convertir cm a pasos (ajustar según la resolución de tu sistema)
-            direction_y = GPIO.HIGH if steps_y > 0 else GPIO.LOW
-            self.pulse_motor(YDir, YStepPin, direction_y, abs(steps_y), STEP_DELAY)
-            
-            self.current_point_index += 1
-        else:
+            self.pointer.setPos(QPointF(x, y))
+        feeding = self.feeder is not None and self.feeder.is_alive()
+        if (self.timer.isActive() and not feeding and not self.motion.pending()
+                and self.motion.state() == IDLE):
+            self.current_point_index = len(self.path_points)
             self.timer.stop()
-            GPIO.output(RelayPin, GPIO.LOW)  # Apagar el relé al terminar
+            self.status_label.setText("Status: Done")
+            if len(self.job_queue):
+                # La chapa siguiente queda lista: basta con cambiarla y pulsar iniciar
+                self.next_job()
     
+    def clear_progress(self):
+        if self.progress is not None:
+            self.progress.clear()
+            self.progress = None
+
+    def dump_step_stats(self):
+        timing = self.motion.timing()
+        if timing["steps"]:
+            level = self.log.warning if timing["late_steps"] or timing["underruns"] else self.log.info
+            level(self.motion.summary())
+
+    def flush_log(self):
+        # Vuelca de una vez los mensajes acumulados desde el último ciclo
+        entries, dropped = self.log.drain()
+        lines = [entry.text() for entry in entries]
+        if dropped:
+            lines.insert(0, f"... {dropped:,} messages skipped")
+        if lines:
+            self.message_display.append("\n".join(lines))
+
     def load_svg(self):
         options = QFileDialog.Options()
         file_name, _ = QFileDialog.getOpenFileName(self, "Load SVG", "", "SVG Files (*.svg);;All Files (*)", options=options)
         if file_name:
-            # Verificar dimensiones del SVG antes de cargarlo
-            if not self.check_svg_dimensions(file_name):
-                QMessageBox.warning(self, "Error", "SVG file exceeds work area dimensions (90 cm x 50 cm).")
-                return
+            self.start_loading(file_name)
 
-            if self.svg_item:
-                self.scene.removeItem(self.svg_item)
-            self.svg_item = QGraphicsSvgItem(file_name)
-            self.scene.addItem(self.svg_item)
-            self.svg_item.setZValue(0) 
-            self.message_display.append(f"SVG loaded: {file_name}")
-            self.extract_path_points(file_name)
-    
-    def check_svg_dimensions(self, file_name):
-        doc = minidom.parse(file_name)
-        svg_element = doc.getElementsByTagName('svg')[0]
-        width = svg_element.getAttribute('width')
-        height = svg_element.getAttribute('height')
-        width = float(width.replace('cm', ''))
-        height = float(height.replace('cm', ''))
-        doc.unlink()
-        return width <= WORK_AREA_WIDTH and height <= WORK_AREA_HEIGHT
-
-    def extract_path_points(self, file_name):
-        doc = minidom.parse(file_name)
-        path_strings = [path.getAttribute('d') for path in doc.getElementsByTagName('path')]
-        for path_string in path_strings:
-            print(f"Path string: {path_string}")  # Debug: imprimir el string del camino
-            self.parse_path(path_string)
-        doc.unlink()
-        self.message_display.append(f"Extracted {len(self.path_points)} points from the SVG.")
-    
-    def parse_path(self, path_string):
-        path_commands = re.findall(r'[MmLlHhVvCcSsQqTtAaZz]|-?\d*\.?\d+|-?\d+', path_string)
-        current_pos = QPointF(0, 0)
-        start_pos = QPointF(0, 0)
-        index = 0
-        while index < len(path_commands):
-            command = path_commands[index]
-            if command in 'Mm':
-                x = float(path_commands[index + 1])
-                y = float(path_commands[index + 2])
-                if command == 'm':
-                    x += current_pos.x()
-                    y += current_pos.y()
-                if self.is_within_work_area(x, y):
-                    current_pos = QPointF(x, y)
-                    start_pos = current_pos
-                    self.path_points.append(current_pos)
-                index += 3
-            elif command in 'Ll':
-                x = float(path_commands[index + 1])
-                y = float(path_commands[index + 2])
-                if command == 'l':
-                    x += current_pos.x()
-                    y += current_pos.y()
-                if self.is_within_work_area(x, y):
-                    current_pos = QPointF(x, y)
-                    self.path_points.append(current_pos)
-                index += 3
-            elif command in 'Hh':
-                x = float(path_commands[index + 1])
-                if command == 'h':
-                    x += current_pos.x()
-                if self.is_within_work_area(x, current_pos.y()):
-                    current_pos.setX(x)
-                    self.path_points.append(QPointF(current_pos.x(), current_pos.y()))
-                index += 2
-            elif command in 'Vv':
-                y = float(path_commands[index + 1])
-                if command == 'v':
-                    y += current_pos.y()
-                if self.is_within_work_area(current_pos.x(), y):
-                    current_pos.setY(y)
-                    self.path_points.append(QPointF(current_pos.x(), current_pos.y()))
-                index += 2
-            elif command in 'Cc':
-                index += 7
-            elif command in 'Ss':
-                index += 5
-            elif command in 'Qq':
-                index += 5
-            elif command in 'Tt':
-                index += 3
-            elif command in 'Aa':
-                index += 8
-            elif command in 'Zz':
-                current_pos = start_pos
-                if self.is_within_work_area(current_pos.x(), current_pos.y()):
-                    self.path_points.append(current_pos)
-                index += 1
-            else:
-                index += 1
+    def clear_job(self):
+        # Olvida el trabajo cargado: vista previa, puntos, colocación y plan
+        self.cancel_loading()
+        self.stop_replay()
+        self.clear_progress()
+        if self.svg_item:
+            self.scene.removeItem(self.svg_item)
+            self.svg_item = None
+        self.path_points = []
+        self.path_rapids = []
+        self.gcode_file = None
+        self.toolpath = None
+        self.source_toolpath = None
+        self.placement = {}
+        self.prepared = None
+        self.resume_segment = None
+        self.cancel_preparing()
+        self.current_point_index = 0
 
-    def is_within_work_area(self, x, y):
-        if x < 0 or x > WORK_AREA_WIDTH or y < 0 or y > WORK_AREA_HEIGHT:
-            self.message_display.append(f"Point ({x}, {y}) is out of work area bounds.")
-            return False
-        return True
+    def start_loading(self, file_name, events=None, on_finished=None):
+        # Una sola lectura del archivo (o ninguna, si ya está en la caché) en
+        # un hilo; los contornos se dibujan por lotes a medida que llegan y la
+        # ventana sigue respondiendo (zoom, paro de emergencia, cancelar)
+        self.clear_job()
+        self.loading_file = file_name
+        if events is None:
+            events = iter_load_toolpath(file_name, FLATTEN_TOLERANCE, self.toolpath_cache,
+                                        OPTIMIZE_CUT_ORDER, self.simplify_tolerance, MERGE_COLLINEAR)
+        self.loader = ProgressiveLoader(events, self)
+        self.loader.batch.connect(self.on_load_batch)
+        self.loader.status.connect(self.on_load_status)
+        self.loader.finished.connect(on_finished or self.on_load_finished)
+        self.loader.failed.connect(self.on_load_failed)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_load_button.show()
+        self.control_button_start.setEnabled(False)
+        self.statusBar().showMessage(f"Loading {file_name}")
+        self.loader.start()
 
-    def edit_svg(self):
-        options = QFileDialog.Options()
-        file_name, _ = QFileDialog.getOpenFileName(self, "Edit SVG", "", "SVG Files (*.svg);;All Files (*)", options=options)
+    def on_load_batch(self, kind, paths, fraction):
+        if not self.loading_items:
+            self.graphics_view.fitInView(QRectF(0, 0, WORK_AREA_WIDTH, WORK_AREA_HEIGHT),
+                                         Qt.KeepAspectRatio)
+        contours = [contour for path in paths for contour in path]
+        self.loading_items.append(self.scene.addPath(painter_path(contours), QPen(Qt.gray, 0)))
+        self.progress_bar.setValue(int(fraction * 100))
+
+    def on_load_status(self, message, fraction):
+        self.statusBar().showMessage(f"{message}...")
+        self.progress_bar.setValue(int(fraction * 100))
+
+    def on_load_failed(self, error):
+        self.end_loading()
+        QMessageBox.warning(self, "Error", f"Could not read SVG file: {error}")
+
+    def on_load_finished(self, toolpath):
+        file_name = self.loading_file
+        self.end_loading()
+        # Se conserva aunque no quepa: se puede escalar o mover con Edit placement
+        self.source_toolpath = toolpath
+
+        # Verificar dimensiones del SVG antes de cargarlo
+        if not self.check_svg_dimensions(toolpath):
+            QMessageBox.warning(self, "Error", "SVG file exceeds work area dimensions (90 cm x 50 cm). "
+                                               "Use Edit placement to scale or move it.")
+            return
+
+        self.show_preview(toolpath)
+        self.toolpath = toolpath
+        self.log.info(f"{'G-code' if self.gcode_file else 'SVG'} loaded: {file_name}")
+        if toolpath.rapid_before is not None:
+            self.log.info(
+                f"Rapid travel: {toolpath.rapid_before:.1f} cm -> {toolpath.rapid_after:.1f} cm "
+                f"({len(toolpath)} contours, holes first)")
+        if toolpath.removed_points:
+            self.log.info(f"Simplified path: {toolpath.removed_points:,} points removed "
+                          f"(tolerance {self.simplify_tolerance} cm)")
+        self.extract_path_points(toolpath)
+        self.prepare_loaded()
+
+    def load_gcode(self):
+        file_name, _ = QFileDialog.getOpenFileName(
+            self, "Load G-code", "", "G-code Files (*.gcode *.nc *.ngc *.tap *.cnc);;All Files (*)")
         if file_name:
-            self.edit_svg_dialog(file_name)
+            self.start_loading(file_name, iter_load_gcode(file_name, FLATTEN_TOLERANCE),
+                               self.on_gcode_loaded)
+            # Se puede empezar a cortar mientras se dibuja la vista previa
+            self.gcode_file = file_name
+            self.control_button_start.setEnabled(True)
+
+    def on_gcode_loaded(self, toolpath):
+        # La vista previa termina quizá con el corte ya en marcha: se conserva el avance
+        index = self.current_point_index
+        self.on_load_finished(toolpath)
+        self.current_point_index = index
+
+    def export_gcode(self):
+        if self.toolpath is None:
+            QMessageBox.warning(self, "Error", "Load a job before exporting it.")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export G-code", "", "G-code Files (*.gcode)")
+        if file_name:
+            with open(file_name, "w") as out:
+                write_gcode(self.toolpath, out, min(MAX_VELOCITY))
+            self.log.info(f"G-code exported: {file_name}")
+
+    def job_settings(self):
+        return JobSettings(FLATTEN_TOLERANCE, OPTIMIZE_CUT_ORDER, self.planner.limits,
+                           simplify=self.simplify_tolerance, merge_collinear=MERGE_COLLINEAR)
+
+    def queue_jobs(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Queue jobs", "", "SVG Files (*.svg);;All Files (*)")
+        if not files:
+            return
+        self.job_queue.add(files)
+        self.queue_timer.start(QUEUE_POLL_INTERVAL)
+        self.log.info(f"Queued {len(files)} jobs ({len(self.job_queue)} waiting).")
+        idle = self.loader is None and not (self.feeder is not None and self.feeder.is_alive())
+        if idle and self.toolpath is None and not self.gcode_file:
+            self.next_job()
+
+    def prepare_loaded(self):
+        # El trabajo cargado también se planifica en segundo plano: con el
+        # índice se empieza al instante y se reanuda desde cualquier segmento
+        self.cancel_preparing()
+        if self.toolpath is None or self.gcode_file or self.prepared is not None:
+            return
+        self.preparing = self.job_queue.prepare(self.loading_file, self.toolpath)
+        self.queue_timer.start(QUEUE_POLL_INTERVAL)
+
+    def cancel_preparing(self):
+        if self.preparing is not None:
+            self.preparing.cancel()
+            self.preparing = None
+
+    def poll_queue(self):
+        for file_name, job, error in self.job_queue.poll():
+            name = os.path.basename(file_name)
+            if error:
+                self.log.warning(f"Could not prepare {name}: {error}")
+            elif not job.planned:
+                self.log.warning(f"Prepared {name}, but it exceeds the work area: it will load unplanned.")
+            else:
+                self.log.info(f"Prepared {name}: {job.report.segments:,} segments, "
+                              f"est. {format_duration(job.report.estimated_time)}")
+        if self.preparing is not None and self.preparing.done():
+            future, self.preparing = self.preparing, None
+            error = None if future.cancelled() else future.exception()
+            if error is not None:
+                self.log.warning(f"Could not plan the job in the background: {error}")
+            elif not future.cancelled() and future.result().planned:
+                self.prepared = future.result()
+                self.log.info(f"Job planned: {len(self.prepared.index):,} segments, "
+                              f"est. {format_duration(self.prepared.report.estimated_time)}; "
+                              "it can resume from any segment.")
+        if not len(self.job_queue) and self.preparing is None:
+            self.queue_timer.stop()
+
+    def next_job(self):
+        # Carga el primer trabajo de la cola: al instante si ya está preparado
+        if self.feeder is not None and self.feeder.is_alive():
+            QMessageBox.warning(self, "Error", "Stop the job before loading the next one.")
+            return
+        if not len(self.job_queue):
+            QMessageBox.warning(self, "Error", "The job queue is empty.")
+            return
+        self.poll_queue()
+        file_name, job = self.job_queue.pop()
+        if job is None:
+            self.log.info(f"{os.path.basename(file_name)} is not prepared yet; loading it now.")
+            self.start_loading(file_name)
+            return
+        self.clear_job()
+        self.loading_file = file_name
+        self.on_load_finished(job.toolpath)
+        if self.toolpath is job.toolpath and job.planned:
+            self.cancel_preparing()
+            self.prepared = job
+        self.log.info(f"Next job: {os.path.basename(file_name)} ({len(self.job_queue)} left in queue).")
+
+    def nest_parts(self):
+        # Varias piezas con su número de copias, anidadas en una sola chapa
+        files, _ = QFileDialog.getOpenFileNames(self, "Nest parts", "", "SVG Files (*.svg);;All Files (*)")
+        parts = []
+        for file_name in files:
+            count, ok = QInputDialog.getInt(self, "Nest parts", f"Copies of {os.path.basename(file_name)}:",
+                                            1, 0, 1000)
+            if not ok:
+                return
+            if count:
+                parts.append((file_name, count))
+        if parts:
+            copies = sum(count for _, count in parts)
+            self.start_loading(f"nested sheet ({copies} parts)", self.iter_nest_job(parts),
+                               self.on_nest_finished)
+
+    def iter_nest_job(self, parts):
+        # Se ejecuta en el hilo de carga: lee las piezas y prueba las disposiciones
+        loaded = []
+        for i, (file_name, count) in enumerate(parts):
+            yield "status", f"Loading {os.path.basename(file_name)}", i / len(parts)
+            loaded.append(Part.from_file(file_name, count, FLATTEN_TOLERANCE, self.toolpath_cache,
+                                         self.simplify_tolerance, MERGE_COLLINEAR))
+        yield from iter_nest(loaded, WORK_AREA_WIDTH, WORK_AREA_HEIGHT, optimize=OPTIMIZE_CUT_ORDER)
+
+    def on_nest_finished(self, result):
+        self.log.info(f"Nested {result.placed}/{result.requested} parts, "
+                      f"utilization {result.utilization:.1%}, sheet used {result.used_length:.1f} cm")
+        for name, count in result.unplaced.items():
+            self.log.warning(f"{count} x {name} did not fit on the sheet")
+        self.on_load_finished(result.toolpath)
+
+    def simulate_job(self):
+        # El trabajo completo (orden, planificación y pasos) en una máquina
+        # virtual, en un hilo y sin esperar los tiempos reales; luego se
+        # reproduce en la vista previa al múltiplo de tiempo elegido
+        if self.toolpath is None and not self.gcode_file:
+            QMessageBox.warning(self, "Error", "Load a job before simulating it.")
+            return
+        if self.loader is not None:
+            QMessageBox.warning(self, "Error", "Wait for the current load to finish.")
+            return
+        speed, ok = QInputDialog.getDouble(self, "Simulate", "Replay speed (x real time):",
+                                           self.replay_speed, 0.1, 100000.0, 1)
+        if not ok:
+            return
+        self.replay_speed = speed
+        self.stop_replay()
+        settings = self.job_settings()
+        report = JobReport(self.gcode_file)
+        if self.gcode_file:
+            events = simulate_gcode(self.gcode_file, settings, report)
+        else:
+            events = simulate_toolpath(self.toolpath, settings, report)
+        self.loading_file = "simulation"
+        self.loader = ProgressiveLoader(events, self)
+        self.loader.status.connect(self.on_load_status)
+        self.loader.finished.connect(lambda machine: self.on_simulation_finished(machine, report))
+        self.loader.failed.connect(self.on_simulation_failed)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_load_button.show()
+        self.control_button_start.setEnabled(False)
+        self.statusBar().showMessage("Simulating...")
+        self.loader.start()
+
+    def on_simulation_failed(self, error):
+        self.end_loading()
+        QMessageBox.warning(self, "Error", f"Simulation failed: {error}")
+
+    def on_simulation_finished(self, machine, report):
+        self.end_loading()
+        self.log.info(f"Simulated cycle {format_duration(machine.time)}: cut {machine.cut_time:.1f} s, "
+                      f"rapid {machine.rapid_time:.1f} s, {machine.pierces} pierces")
+        self.log.info(f"Steps X {machine.steps_x:,} Y {machine.steps_y:,}, peak "
+                      f"{machine.peak_rate_x:,.0f}/{machine.peak_rate_y:,.0f} steps/s")
+        if report.out_of_bounds:
+            self.log.warning(f"{report.out_of_bounds:,} points out of work area bounds were skipped.")
+        if machine.violations:
+            t, x, y = machine.first_violation
+            self.log.warning(f"{machine.violations:,} steps outside the work area, first at "
+                             f"{t:.1f} s ({x:.2f}, {y:.2f} cm)")
+        self.replay = TraceReplay(self.scene, machine.trace, self.replay_speed, parent=self)
+        self.replay.finished.connect(lambda: self.log.info("Simulation replay finished."))
+        self.replay.start()
+
+    def stop_replay(self):
+        if self.replay is not None:
+            self.replay.clear()
+            self.replay = None
+
+    def cancel_loading(self):
+        if self.loader is not None and self.loader.is_running():
+            self.loader.cancel()
+            self.log.info(f"Loading cancelled: {self.loading_file}")
+        self.end_loading()
+
+    def end_loading(self):
+        # Quita los lotes provisionales; la vista previa final es un solo elemento
+        for item in self.loading_items:
+            self.scene.removeItem(item)
+        self.loading_items = []
+        self.loader = None
+        self.progress_bar.hide()
+        self.cancel_load_button.hide()
+        self.control_button_start.setEnabled(True)
+        self.statusBar().clearMessage()
     
-    def edit_svg_dialog(self, file_name):
+    def check_svg_dimensions(self, toolpath):
+        return toolpath.fits(WORK_AREA_WIDTH, WORK_AREA_HEIGHT)
+
+    def show_preview(self, toolpath):
+        # Vista previa dibujada con los mismos contornos que se van a cortar
+        if self.svg_item:
+            self.scene.removeItem(self.svg_item)
+        self.svg_item = self.scene.addPath(painter_path(toolpath.contours), QPen(Qt.black, 0))
+        self.svg_item.setZValue(0)
+        self.graphics_view.fitInView(self.svg_item, Qt.KeepAspectRatio)
+
+    def extract_path_points(self, toolpath):
+        # Se usan directamente los arreglos mapeados; solo se copian si hay
+        # puntos fuera del área de trabajo que descartar
+        self.current_point_index = 0
+        points = toolpath.points
+        rapids = rapid_starts(toolpath.offsets)
+        inside = work_area_mask(points, WORK_AREA_WIDTH, WORK_AREA_HEIGHT, toolpath.bounds)
+        if inside is not None:
+            # Un solo mensaje con el total en lugar de una línea por punto
+            self.log.warning(f"{len(points) - int(inside.sum()):,} points out of work area bounds.")
+            points, rapids = clip_rapids(points, rapids, inside)
+        self.path_points = points
+        self.path_rapids = rapids
+        self.log.info(f"Extracted {len(self.path_points)} points from the SVG.")
+
+    def choose_resume(self):
+        # Tras un paro o una llama apagada: seguir en el segmento en curso,
+        # volver a perforar su contorno o elegir cualquier segmento
+        if self.prepared is None or self.gcode_file:
+            QMessageBox.warning(self, "Error", "The job has no indexed plan yet; "
+                                               "Start resumes from the last point reached.")
+            return
+        if (self.feeder is not None and self.feeder.is_alive()) or self.motion.state() == PAUSED:
+            QMessageBox.warning(self, "Error", "Stop the job before choosing where to resume.")
+            return
+        index = self.prepared.index
+        current = min(index.segment_after(self.current_point_index - 1), len(index) - 1)
+        pierce = index.pierce_before(current)
+        items = [f"Where it stopped (segment {current + 1} of {len(index)})",
+                 f"Re-pierce the contour (segment {pierce + 1})",
+                 "Choose a segment..."]
+        item, ok = QInputDialog.getItem(self, "Resume from", "Resume the job from:", items, 0, False)
+        if not ok:
+            return
+        segment = (current, pierce, None)[items.index(item)]
+        if segment is None:
+            number, ok = QInputDialog.getInt(self, "Resume from", f"Segment (1-{len(index)}):",
+                                             current + 1, 1, len(index))
+            if not ok:
+                return
+            segment = number - 1
+        self.resume_segment = segment
+        self.log.info(f"Start resumes at segment {segment + 1} of {len(index)}.")
+
+    def edit_simplify_tolerance(self):
+        tolerance, ok = QInputDialog.getDouble(
+            self, "Simplify", "Tolerance (cm, 0 = off):", self.simplify_tolerance, 0.0, 1.0, 4)
+        if ok:
+            self.simplify_tolerance = tolerance
+            self.job_queue.set_settings(self.job_settings())
+            self.log.info(f"Simplify tolerance set to {tolerance} cm (applies to the next load).")
+
+    def edit_placement(self):
+        # Ancho, alto, inicio, giro y espejo del trabajo cargado, aplicados en
+        # memoria sobre los contornos ya leídos: el archivo no se modifica
+        if self.source_toolpath is None:
+            QMessageBox.warning(self, "Error", "Load an SVG or nest parts before editing the placement.")
+            return
+        if self.gcode_file:
+            QMessageBox.warning(self, "Error", "G-code programs run as programmed; edit the placement "
+                                               "of SVG or nested jobs.")
+            return
+        placement = self.placement
         dialog = QDialog(self)
-        dialog.setWindowTitle("Edit SVG")
+        dialog.setWindowTitle("Edit placement")
         
         layout = QFormLayout(dialog)
         
-        width_edit = QLineEdit(dialog)
-        height_edit = QLineEdit(dialog)
-        x_edit = QLineEdit(dialog)
-        y_edit = QLineEdit(dialog)
+        def field(key):
+            value = placement.get(key)
+            return QLineEdit("" if value is None else f"{value:g}", dialog)
+
+        width_edit = field("width")
+        height_edit = field("height")
+        x_edit = field("x")
+        y_edit = field("y")
+        rotation_edit = field("rotation")
+        mirror_x_check = QCheckBox(dialog)
+        mirror_x_check.setChecked(placement.get("mirror_x", False))
+        mirror_y_check = QCheckBox(dialog)
+        mirror_y_check.setChecked(placement.get("mirror_y", False))
         
         layout.addRow("Width (cm):", width_edit)
         layout.addRow("Height (cm):", height_edit)
         layout.addRow("Start X (cm):", x_edit)
         layout.addRow("Start Y (cm):", y_edit)
-        
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, Qt.Horizontal, dialog)
-        buttons.accepted.connect(lambda: self.apply_svg_edits(file_name, width_edit.text(), height_edit.text(), x_edit.text(), y_edit.text()))
+        layout.addRow("Rotation (deg):", rotation_edit)
+        layout.addRow("Mirror X:", mirror_x_check)
+        layout.addRow("Mirror Y:", mirror_y_check)
+        
+        def apply():
+            return self.apply_placement(width_edit.text(), height_edit.text(), x_edit.text(),
+                                        y_edit.text(), rotation_edit.text(),
+                                        mirror_x_check.isChecked(), mirror_y_check.isChecked())
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Apply | QDialogButtonBox.Cancel,
+                                   Qt.Horizontal, dialog)
+        buttons.accepted.connect(lambda: apply() and dialog.accept())
+        buttons.button(QDialogButtonBox.Apply).clicked.connect(apply)
         buttons.rejected.connect(dialog.reject)
         
         layout.addWidget(buttons)
@@ -342,41 +861,75 @@ class MainWindow(QMainWindow):
         dialog.setLayout(layout)
         dialog.exec_()
 
-    def apply_svg_edits(self, file_name, width, height, start_x, start_y):
-        doc = minidom.parse(file_name)
-        svg_element = doc.getElementsByTagName('svg')[0]
-        
-        # Ajustar dimensiones del SVG
-        if width:
-            svg_element.setAttribute('width', f"{width}cm")
-        if height:
-            svg_element.setAttribute('height', f"{height}cm")
-        
-        # Ajustar punto de inicio
-        for path in svg_element.getElementsByTagName('path'):
-            path.setAttribute('transform', f"translate({start_x},{start_y})")
-        
-        with open(file_name, 'w') as f:
-            doc.writexml(f)
-        
-        doc.unlink()
-        
-        self.message_display.append(f"SVG edited and saved: {file_name}")
-        self.load_svg()
+    def apply_placement(self, width, height, start_x, start_y, rotation, mirror_x, mirror_y):
+        # Campos vacíos: sin cambio respecto al trabajo tal como se cargó
+        if self.feeder is not None and self.feeder.is_alive():
+            QMessageBox.warning(self, "Error", "Stop the job before editing its placement.")
+            return False
+        try:
+            values = [float(v) if v.strip() else None
+                      for v in (width, height, start_x, start_y, rotation)]
+        except ValueError:
+            QMessageBox.warning(self, "Error", "Width, height, start and rotation must be numbers.")
+            return False
+        width, height, start_x, start_y, rotation = values
+        if (width is not None and width <= 0) or (height is not None and height <= 0):
+            QMessageBox.warning(self, "Error", "Width and height must be positive.")
+            return False
+        m = affine.placement(self.source_toolpath.points, width, height, start_x, start_y,
+                             rotation or 0.0, mirror_x, mirror_y)
+        toolpath = self.source_toolpath.transformed(m)
+        if not self.check_svg_dimensions(toolpath):
+            QMessageBox.warning(self, "Error", "The edited job exceeds the work area dimensions "
+                                               f"({WORK_AREA_WIDTH} cm x {WORK_AREA_HEIGHT} cm).")
+            return False
+        self.placement = dict(width=width, height=height, x=start_x, y=start_y, rotation=rotation,
+                              mirror_x=mirror_x, mirror_y=mirror_y)
+        self.toolpath = toolpath
+        self.prepared = None  # El plan de la cola era para la colocación original
+        self.clear_progress()
+        self.show_preview(toolpath)
+        self.extract_path_points(toolpath)
+        self.prepare_loaded()
+        if toolpath.bounds is not None:
+            min_x, min_y, max_x, max_y = toolpath.bounds
+            self.log.info(f"Placement: {max_x - min_x:.2f} x {max_y - min_y:.2f} cm "
+                          f"at ({min_x:.2f}, {min_y:.2f})")
+        return True
 
     def keyPressEvent(self, event):
-        if event.key() == Qt.Key_Left:
-            self.move_motor(XDir, XStepPin, GPIO.LOW, 1)
+        if event.key() == Qt.Key_Escape:
+            self.on_emergency_button_clicked()
+        elif event.key() == Qt.Key_Left:
+            self.move_motor(XDir, XStepPin, LOW, 1)
         elif event.key() == Qt.Key_Right:
-            self.move_motor(XDir, XStepPin, GPIO.HIGH, 1)
+            self.move_motor(XDir, XStepPin, HIGH, 1)
         elif event.key() == Qt.Key_Up:
-            self.move_motor(YDir, YStepPin, GPIO.HIGH, 1)
+            self.move_motor(YDir, YStepPin, HIGH, 1)
         elif event.key() == Qt.Key_Down:
-            self.move_motor(YDir, YStepPin, GPIO.LOW, 1)
+            self.move_motor(YDir, YStepPin, LOW, 1)
         event.accept()
     
     def move_motor(self, dir_pin, step_pin, direction, steps):
-        self.pulse_motor(dir_pin, step_pin, direction, steps, STEP_DELAY)
+        # Movimiento manual: solo con la máquina detenida
+        if self.feeder is not None and self.feeder.is_alive():
+            return
+        if self.motion.state() in (PAUSED, EMERGENCY):
+            return
+        steps = steps if direction == HIGH else -steps
+        dx, dy = (steps, 0) if step_pin == XStepPin else (0, steps)
+        self.motion.run()
+        # Cerrado como un trabajo: al vaciarse no cuenta como falta de datos
+        self.motion.write(move_records(dx, dy, STEP_DELAY), (dx, dy))
+        self.motion.finish()
+
+    def closeEvent(self, event):
+        self.cancel_loading()
+        self.stop_replay()
+        self.stop_feeder()
+        self.job_queue.shutdown()
+        self.motion.shutdown()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
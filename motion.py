@@ -0,0 +1,13 @@
+# Núcleo de movimiento: interpolación lineal coordinada X/Y.
+#
+# La posición de la máquina se lleva en pasos enteros. Cada movimiento se
+# calcula como la diferencia desde la posición actual y se convierte en un
+# único flujo de pasos X/Y intercalados (Bresenham, en
+# step_stream.bresenham_bits), de modo que ambos ejes llegan juntos y las
+# diagonales no salen en escalera; los registros los ejecuta motion_process.
+
+STEPS_PER_CM = 100  # Resolución de la máquina (ajustar según el sistema)
+
+# Bits de cada tic del flujo de pasos
+STEP_X = 1
+STEP_Y = 2
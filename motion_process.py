@@ -0,0 +1,564 @@
+# Ejecución del movimiento en un proceso aparte.
+#
+# La GUI solo produce y vigila: escribe registros de pasos (step_stream) en
+# un búfer circular en memoria compartida, y un proceso dedicado, sin PyQt5,
+# los ejecuta contra plazos absolutos. Un encabezado de enteros en la misma
+# memoria hace de canal de control (marcha, pausa, paro, emergencia) y de
+# realimentación (registros consumidos, posición en pasos, antorcha, estado
+# y estadísticas de temporización, con el peor retraso de cada segmento
+# reciente). El proceso revisa el comando antes de
+# cada tic y durante las esperas largas, de modo que el paro de emergencia
+# actúa dentro de un periodo de paso aunque la interfaz esté ocupada.
+#
+# Con una aceleración configurada, la pausa y el paro no cortan en el tic:
+# el ejecutor frena siguiendo los registros del búfer hasta el reposo, y al
+# arrancar desde el reposo (reanudar, empezar o tras quedarse sin registros)
+# alarga los periodos hasta alcanzar los del plan guardado.
+#
+# El proceso se lanza como un intérprete nuevo sobre este mismo archivo
+# (no con fork), para que no herede nada de Qt:
+#
+#     python motion_process.py <memoria compartida> <capacidad> <configuración JSON>
+
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from bisect import bisect_right
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from gpio_backend import HIGH, LOW, get_backend
+from step_scheduler import (HISTOGRAM_BUCKETS, LATE_THRESHOLD, MIN_PULSE_WIDTH, SEGMENT_HISTORY,
+                            SPIN_THRESHOLD, format_timing, histogram_percentile)
+from step_stream import DIR_X, DIR_Y, END_OF_JOB, RECORD, TORCH, end_record
+
+RING_CAPACITY = 1 << 18  # Registros (tics) en el búfer circular
+CHUNK = 256  # Registros que el ejecutor copia de una vez
+IDLE_POLL = 0.002  # Espera del ejecutor sin trabajo (s)
+COMMAND_POLL = 0.001  # Intervalo máximo sin revisar el comando durante una espera (s)
+START_TIMEOUT = 10.0
+MARK_SLOTS = 1024  # Fines de segmento escritos y aún no alcanzados por el ejecutor
+
+# Palabras del encabezado (int64)
+WRITE, READ, COMMAND, STATE, POS_X, POS_Y, UNDERRUNS, LATE, WORST_NS, STEPS, TORCH_ON, HALT_READ = range(12)
+DROPPED, MARK_WRITE, MARK_READ, SEGMENT_WRITE = range(12, 16)
+HISTOGRAM = 16
+MARKS = HISTOGRAM + HISTOGRAM_BUCKETS  # Anillo de (fin en registros, marca) que escribe la GUI
+SEGMENTS = MARKS + 2 * MARK_SLOTS  # Anillo de (marca, peor retraso en ns) que escribe el ejecutor
+HEADER_WORDS = SEGMENTS + 2 * SEGMENT_HISTORY
+HEADER_BYTES = (HEADER_WORDS * 8 + 511) // 512 * 512
+
+# Comandos (los escribe la GUI)
+RUN, PAUSE, STOP, ESTOP, RESET, QUIT = range(1, 7)
+
+# Estados (los escribe el ejecutor)
+STARTING, IDLE, RUNNING, PAUSED, STOPPED, EMERGENCY, EXITED = range(7)
+STATE_NAMES = ("starting", "idle", "running", "paused", "stopped", "emergency stop", "exited")
+
+
+def _views(buffer, capacity):
+    header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=buffer)
+    ring = np.ndarray((capacity,), dtype=RECORD, buffer=buffer, offset=HEADER_BYTES)
+    return header, ring
+
+
+class MotionProcess:
+    # Lado de la GUI: productor de registros y monitor del ejecutor
+    def __init__(self, x_axis, y_axis, relay_pin=None, enable_pins=(), start=(0, 0),
+                 capacity=RING_CAPACITY, backend=None, stats=False, acceleration=None):
+        self.capacity = capacity
+        self.config = {
+            "x_axis": list(x_axis),
+            "y_axis": list(y_axis),
+            "relay_pin": relay_pin,
+            "enable_pins": list(enable_pins),
+            "start": list(start),
+            "backend": backend,
+            "stats": bool(stats),
+            "acceleration": acceleration,  # tics/s² al frenar y arrancar; None: sin rampa
+        }
+        self.tail = tuple(start)  # Posición (pasos) al final de lo ya escrito
+        self.process = None
+        self._memory = None
+        self.header = None
+        self.ring = None
+        self._cancel = False
+        self._ends = []  # Índice de fin (registros escritos) de cada bloque marcado
+        self._tags = []
+
+    def start(self):
+        size = HEADER_BYTES + self.capacity * RECORD.itemsize
+        self._memory = shared_memory.SharedMemory(create=True, size=size)
+        self.header, self.ring = _views(self._memory.buf, self.capacity)
+        self.header[:] = 0
+        self.header[COMMAND] = STOP
+        self.header[POS_X], self.header[POS_Y] = self.tail
+        self.process = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), self._memory.name, str(self.capacity),
+            json.dumps(self.config),
+        ])
+        if not self.wait_state((STOPPED,), START_TIMEOUT):
+            self.shutdown()
+            raise RuntimeError("Motion process did not start")
+
+    def state(self):
+        if self.process is None or self.process.poll() is not None:
+            return EXITED
+        return int(self.header[STATE])
+
+    def state_name(self):
+        return STATE_NAMES[self.state()]
+
+    def wait_state(self, states, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.state() not in states:
+            if self.state() == EXITED or (deadline is not None and time.monotonic() > deadline):
+                return False
+            time.sleep(IDLE_POLL)
+        return True
+
+    def position(self):
+        return int(self.header[POS_X]), int(self.header[POS_Y])
+
+    def torch(self):
+        return bool(self.header[TORCH_ON])
+
+    def written(self):
+        return int(self.header[WRITE])
+
+    def consumed(self):
+        return int(self.header[READ])
+
+    def pending(self):
+        return int(self.header[WRITE] - self.header[READ])
+
+    # Productor
+
+    def write(self, records, delta=(0, 0), tag=None):
+        # Copia los registros al búfer esperando hueco; False si se canceló
+        header, ring, capacity = self.header, self.ring, self.capacity
+        done = 0
+        total = len(records)
+        if tag is not None and self.config["stats"] and not self._mark(tag, total):
+            return False
+        while done < total:
+            if self._cancel:
+                return False
+            write = int(header[WRITE])
+            free = capacity - (write - int(header[READ]))
+            if free <= 0:
+                time.sleep(IDLE_POLL)
+                continue
+            position = write % capacity
+            count = min(total - done, free, capacity - position)
+            ring[position:position + count] = records[done:done + count]
+            header[WRITE] = write + count  # Se publica después de copiar
+            done += count
+        self.tail = (self.tail[0] + delta[0], self.tail[1] + delta[1])
+        if tag is not None:
+            self._ends.append(int(header[WRITE]))
+            self._tags.append(tag)
+        return True
+
+    def _mark(self, tag, total):
+        # Publica el fin del bloque antes que sus registros, para que el
+        # ejecutor mida su peor retraso; espera hueco en el anillo de marcas
+        header = self.header
+        while header[MARK_WRITE] - header[MARK_READ] >= MARK_SLOTS:
+            if self._cancel:
+                return False
+            time.sleep(IDLE_POLL)
+        slot = MARKS + 2 * (int(header[MARK_WRITE]) % MARK_SLOTS)
+        header[slot] = int(header[WRITE]) + total
+        header[slot + 1] = tag
+        header[MARK_WRITE] += 1
+        return True
+
+    def finish(self):
+        # Cierra el trabajo: la antorcha se apaga al llegar aquí
+        return self.write(end_record())
+
+    def completed_tag(self):
+        # Marca del último bloque ejecutado completo, o None
+        done = bisect_right(self._ends, int(self.header[READ]))
+        return self._tags[done - 1] if done else None
+
+    def drop_discarded(self):
+        # Tras un paro, olvida las marcas de los bloques descartados sin
+        # ejecutar: completed_tag() vuelve a ser el último punto alcanzado
+        done = bisect_right(self._ends, int(self.header[HALT_READ]))
+        del self._ends[done:]
+        del self._tags[done:]
+
+    # Control
+
+    def begin(self):
+        # Nuevo trabajo: olvida las marcas del anterior
+        self._ends = []
+        self._tags = []
+
+    def run(self):
+        self._cancel = False
+        self.header[COMMAND] = RUN
+
+    def pause(self, timeout=1.0):
+        # Frena hasta el reposo; lo pendiente queda en el búfer
+        self.header[COMMAND] = PAUSE
+        return self.wait_state((PAUSED, EMERGENCY), timeout)
+
+    def cancel(self):
+        # Hace que write() deje de esperar; la GUI une después su hilo productor
+        self._cancel = True
+
+    def stop(self, timeout=1.0):
+        # Descarta lo pendiente; la posición queda en la del último tic ejecutado.
+        # El productor debe haber terminado (cancel() y join) antes de llamar
+        self._cancel = True
+        self.header[COMMAND] = STOP
+        stopped = self.wait_state((STOPPED, EMERGENCY), timeout)
+        if stopped:
+            self.drop_discarded()
+        self.tail = self.position()
+        return stopped
+
+    def emergency_stop(self):
+        # No espera a nada: el ejecutor lo ve en el siguiente tic
+        self._cancel = True
+        self.header[COMMAND] = ESTOP
+
+    def reset(self, timeout=1.0):
+        # Sale del paro de emergencia (vuelve a habilitar los drivers)
+        self.header[COMMAND] = RESET
+        reset = self.wait_state((STOPPED,), timeout)
+        self.tail = self.position()
+        return reset
+
+    def timing(self):
+        header = self.header
+        histogram = [int(v) for v in header[HISTOGRAM:HISTOGRAM + HISTOGRAM_BUCKETS]]
+        return {
+            "events": int(header[STEPS]),
+            "steps": int(header[STEPS]),
+            "late_steps": int(header[LATE]),
+            "dropped_steps": int(header[DROPPED]),
+            "underruns": int(header[UNDERRUNS]),
+            "worst_us": int(header[WORST_NS]) / 1000,
+            "p50_us": histogram_percentile(histogram, 0.5),
+            "p99_us": histogram_percentile(histogram, 0.99),
+            "histogram": histogram,
+            "segments": self.segment_timing(),
+        }
+
+    def segment_timing(self):
+        # [(marca, peor retraso en µs)] de los últimos segmentos ejecutados, en orden
+        header = self.header
+        count = int(header[SEGMENT_WRITE])
+        result = []
+        for k in range(max(0, count - SEGMENT_HISTORY), count):
+            slot = SEGMENTS + 2 * (k % SEGMENT_HISTORY)
+            result.append((int(header[slot]), int(header[slot + 1]) / 1000))
+        return result
+
+    def summary(self):
+        return format_timing(self.timing())
+
+    def shutdown(self, timeout=2.0):
+        if self.header is not None:
+            self.header[COMMAND] = QUIT
+        if self.process is not None:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.header = self.ring = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+class _Executor:
+    # Lado del proceso de movimiento
+    def __init__(self, header, ring, config):
+        self.header = header
+        self.ring = ring
+        self.capacity = len(ring)
+        self.high, self.low = HIGH, LOW
+        self.gpio = get_backend(config["backend"])
+        self.x_dir, self.x_step = config["x_axis"]
+        self.y_dir, self.y_step = config["y_axis"]
+        self.relay_pin = config["relay_pin"]
+        self.enable_pins = config["enable_pins"]
+        self.stats = config["stats"]
+        self.acceleration = config.get("acceleration")
+        # Comandos que no cortan un tic: con rampa, la pausa y el paro frenan
+        self.soft = (RUN, PAUSE, STOP) if self.acceleration else (RUN,)
+        self.speed = 0.0  # tics/s al terminar el último tic
+        self.mark_end = None  # Fin (registros) del segmento marcado en curso
+        self.segment_worst = 0  # Peor retraso (ns) del segmento en curso
+        self.starting = False  # Arrancando desde el reposo, por debajo del plan
+        self.parent = os.getppid()
+        gpio = self.gpio
+        gpio.setwarnings(False)
+        gpio.setmode(gpio.BCM)
+        pins = [self.x_dir, self.x_step, self.y_dir, self.y_step] + self.enable_pins
+        if self.relay_pin is not None:
+            pins.append(self.relay_pin)
+        for pin in pins:
+            gpio.setup(pin, gpio.OUT)
+        self._enable(True)
+        self._torch(False)
+        self.directions = None
+        self.deadline = None
+
+    def _enable(self, on):
+        for pin in self.enable_pins:
+            self.gpio.output(pin, self.low if on else self.high)  # Habilitado en bajo
+
+    def _torch(self, on):
+        self.torch = on
+        self.header[TORCH_ON] = on
+        if self.relay_pin is not None:
+            self.gpio.output(self.relay_pin, self.high if on else self.low)
+
+    def _halt(self, state):
+        # Deja los pines de paso en bajo y la antorcha apagada
+        self.gpio.output([self.x_step, self.y_step], [self.low, self.low])
+        self._torch(False)
+        self.directions = None
+        self.deadline = None
+        self.speed = 0.0
+        self.header[STATE] = state
+
+    def _wait(self, deadline):
+        # Espera hasta el plazo revisando el comando; False si llegó uno que corta el tic
+        header = self.header
+        soft = self.soft
+        clock = time.monotonic
+        while True:
+            remaining = deadline - clock()
+            if header[COMMAND] not in soft:
+                return False
+            if remaining <= SPIN_THRESHOLD:
+                break
+            time.sleep(min(remaining - SPIN_THRESHOLD, COMMAND_POLL))
+        while clock() < deadline:
+            pass
+        return True
+
+    def run(self):
+        header = self.header
+        header[STATE] = STOPPED
+        while True:
+            command = header[COMMAND]
+            if command == QUIT or os.getppid() != self.parent:
+                self._halt(EXITED)
+                return
+            if command == ESTOP:
+                if header[STATE] != EMERGENCY:
+                    self._halt(EMERGENCY)
+                    self._enable(False)
+                    header[HALT_READ] = header[READ]
+                    self._discard()
+                time.sleep(IDLE_POLL)
+                continue
+            if header[STATE] == EMERGENCY and command != RESET:
+                time.sleep(IDLE_POLL)
+                continue
+            if command == RESET:
+                if header[STATE] != STOPPED:
+                    self._discard()
+                    self._enable(True)
+                    self._halt(STOPPED)
+                time.sleep(IDLE_POLL)
+                continue
+            if command == STOP:
+                if header[STATE] != STOPPED:
+                    header[HALT_READ] = header[READ]
+                    self._discard()
+                    self._halt(STOPPED)
+                time.sleep(IDLE_POLL)
+                continue
+            if command == PAUSE:
+                if header[STATE] != PAUSED:
+                    self._halt(PAUSED)
+                time.sleep(IDLE_POLL)
+                continue
+            available = int(header[WRITE] - header[READ])
+            if not available:
+                if self.deadline is not None:
+                    header[UNDERRUNS] += 1  # El productor no llegó a tiempo
+                    self.deadline = None
+                header[STATE] = IDLE
+                time.sleep(IDLE_POLL)
+                continue
+            header[STATE] = RUNNING
+            self._run_chunk(available)
+
+    def _discard(self):
+        # Descarta lo pendiente del búfer y las marcas de sus segmentos
+        header = self.header
+        header[READ] = header[WRITE]
+        header[MARK_READ] = header[MARK_WRITE]
+        self.mark_end = None
+        self.segment_worst = 0
+
+    def _close_segments(self, read):
+        # Segmentos marcados que terminan en `read`: se publica su peor retraso
+        header = self.header
+        while True:
+            if self.mark_end is None:
+                if header[MARK_READ] >= header[MARK_WRITE]:
+                    return
+                self.mark_end = int(header[MARKS + 2 * (int(header[MARK_READ]) % MARK_SLOTS)])
+            if read < self.mark_end:
+                return
+            mark = MARKS + 2 * (int(header[MARK_READ]) % MARK_SLOTS)
+            slot = SEGMENTS + 2 * (int(header[SEGMENT_WRITE]) % SEGMENT_HISTORY)
+            header[slot] = header[mark + 1]
+            header[slot + 1] = self.segment_worst
+            header[SEGMENT_WRITE] += 1
+            header[MARK_READ] += 1
+            self.mark_end = None
+            self.segment_worst = 0
+
+    def _run_chunk(self, available):
+        header = self.header
+        gpio = self.gpio
+        high, low = self.high, self.low
+        read = int(header[READ])
+        position = read % self.capacity
+        count = min(available, CHUNK, self.capacity - position)
+        block = self.ring[position:position + count]
+        intervals = block["interval"].tolist()
+        flags = block["flags"].tolist()
+        step_pins = [self.x_step, self.y_step]
+        x, y = int(header[POS_X]), int(header[POS_Y])
+        clock = time.monotonic
+        for interval, bits in zip(intervals, flags):
+            command = header[COMMAND]
+            if command != RUN and (command not in self.soft or self.deadline is None):
+                return
+            braking = command != RUN
+            if bits & END_OF_JOB:
+                self._torch(False)
+                self.deadline = None
+                read += 1
+                header[READ] = read
+                if self.stats:
+                    self._close_segments(read)
+                continue
+            directions = bits & (DIR_X | DIR_Y)
+            if directions != self.directions:
+                gpio.output([self.x_dir, self.y_dir],
+                            [high if bits & DIR_X else low, high if bits & DIR_Y else low])
+                self.directions = directions
+            torch = bool(bits & TORCH)
+            if torch != self.torch:
+                self._torch(torch)
+            if self.deadline is None:
+                self.deadline = clock()
+                self.speed = 0.0
+                self.starting = self.acceleration is not None
+            deadline = self.deadline
+            if not self._wait(deadline):
+                return
+            levels = [high if bits & 1 else low, high if bits & 2 else low]
+            gpio.output(step_pins, levels)
+            if self.stats:
+                raised = clock()
+                late = raised - deadline
+                bucket = min(int(late * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+                header[HISTOGRAM + bucket] += 1
+                if late > LATE_THRESHOLD:
+                    header[LATE] += 1
+                late_ns = int(late * 1e9)
+                if late_ns > header[WORST_NS]:
+                    header[WORST_NS] = late_ns
+                if late_ns > self.segment_worst:
+                    self.segment_worst = late_ns
+            period = interval / 1e6
+            if self.acceleration:
+                period = self._limit(period, braking)
+            if not self._wait(deadline + period / 2):
+                gpio.output(step_pins, [low, low])
+                if self.stats:
+                    self._pulse(bits, raised, clock())
+                self._count(bits, read)
+                return
+            gpio.output(step_pins, [low, low])
+            if self.stats:
+                self._pulse(bits, raised, clock())
+            self.deadline = deadline + period
+            # Posición y avance se publican al terminar cada tic
+            if bits & 1:
+                x += 1 if bits & DIR_X else -1
+            if bits & 2:
+                y += 1 if bits & DIR_Y else -1
+            header[POS_X] = x
+            header[POS_Y] = y
+            header[STEPS] += 1
+            read += 1
+            header[READ] = read
+            if self.stats:
+                self._close_segments(read)
+            if braking and not self.speed:
+                # En reposo: el bucle principal atiende la pausa o el paro
+                self.deadline = None
+                return
+
+    def _limit(self, period, braking):
+        # Periodo del tic sin pasar de la aceleración: frenando hasta el
+        # reposo, o arrancando desde él hasta alcanzar el plan guardado
+        v = self.speed
+        if braking:
+            v1 = math.sqrt(max(v * v - 2 * self.acceleration, 0.0))
+        elif self.starting:
+            v1 = math.sqrt(v * v + 2 * self.acceleration)
+        else:
+            self.speed = 1 / period
+            return period
+        limit = 2 / (v + v1) if v + v1 > 0 else period
+        if limit > period:
+            self.speed = v1
+            return limit
+        self.starting = False
+        self.speed = 1 / period
+        return period
+
+    def _pulse(self, bits, raised, lowered):
+        # Un pulso más corto de lo que el driver registra cuenta como paso perdido
+        if bits & 3 and lowered - raised < MIN_PULSE_WIDTH:
+            self.header[DROPPED] += 1
+
+    def _count(self, bits, read):
+        # Tic cortado a mitad del pulso: el paso ya se dio
+        header = self.header
+        if bits & 1:
+            header[POS_X] += 1 if bits & DIR_X else -1
+        if bits & 2:
+            header[POS_Y] += 1 if bits & DIR_Y else -1
+        header[STEPS] += 1
+        header[READ] = read + 1
+
+
+def main(argv):
+    name, capacity, config = argv[0], int(argv[1]), json.loads(argv[2])
+    memory = shared_memory.SharedMemory(name=name)
+    # La memoria la crea y la libera la GUI, no este proceso
+    resource_tracker.unregister(memory._name, "shared_memory")
+    header, ring = _views(memory.buf, capacity)
+    try:
+        _Executor(header, ring, config).run()
+    finally:
+        del header, ring
+        memory.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
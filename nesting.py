@@ -0,0 +1,333 @@
+# Anidado de varias piezas en la chapa (nesting).
+#
+# Cada pieza se rasteriza en una rejilla de NEST_RESOLUTION cm por celda,
+# una vez por paso de giro, y se dilata con la separación entre piezas
+# (kerf). Las piezas se colocan una a una en la posición libre que deja el
+# borde derecho más a la izquierda (y más abajo), para que el sobrante de
+# chapa quede en una sola tira. La prueba de colisión en todas las
+# posiciones a la vez es una correlación por FFT entre la ocupación de la
+# chapa y la pieza dilatada. Varias secuencias de colocación (por área, por
+# tamaño y variaciones aleatorias) se prueban en un grupo de procesos hasta
+# agotar el tiempo, y se queda la que coloca más superficie con menos largo
+# de chapa. El resultado es una sola trayectoria con todas las piezas.
+
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+import affine
+from cnc_core import FLATTEN_TOLERANCE, WORK_AREA_HEIGHT, WORK_AREA_WIDTH
+from cut_order import containment, is_closed, order_contours
+from toolpath import Toolpath, load_toolpath
+
+NEST_RESOLUTION = 0.2  # cm por celda de la rejilla de colisión
+NEST_KERF = 0.3  # Separación mínima entre piezas (cm)
+NEST_MARGIN = 0.5  # Borde de la chapa sin piezas (cm)
+NEST_ROTATIONS = 4  # Pasos de giro por vuelta (4: cada 90°)
+NEST_TIME_BUDGET = 10.0  # s
+NEST_MAX_CANDIDATES = 64  # Secuencias de colocación que se prueban como máximo
+
+
+class Part:
+    def __init__(self, name, contours, quantity=1):
+        contours = [np.asarray(c, dtype=np.float64) for c in contours if len(c)]
+        if not contours:
+            raise ValueError(f"La pieza no tiene contornos: {name}")
+        # Esquina inferior izquierda de la pieza en el origen
+        low = np.concatenate(contours).min(axis=0)
+        self.name = name
+        self.quantity = quantity
+        self.contours = [c - low for c in contours]
+        self.width, self.height = np.concatenate(self.contours).max(axis=0).tolist()
+        self.area = contour_area(self.contours)  # cm², sin los agujeros
+
+    @classmethod
+    def from_file(cls, file_name, quantity=1, tolerance=FLATTEN_TOLERANCE, cache=None,
+                  simplify=0.0, merge_collinear=False):
+        toolpath = load_toolpath(file_name, tolerance, cache, False, simplify, merge_collinear)
+        return cls(os.path.basename(file_name), toolpath.contours, quantity)
+
+
+class Shape:
+    # Una pieza en un paso de giro
+    def __init__(self, part, degrees, contours, cell, radius):
+        self.part = part
+        self.degrees = degrees
+        self.contours = contours
+        self.mask = rasterize(contours, cell)
+        self.halo = dilate(self.mask, radius)
+
+
+class NestResult:
+    def __init__(self, parts, placements, width, height, candidates):
+        self.placements = placements  # (índice de pieza, giro en grados, x, y) en cm
+        self.requested = sum(p.quantity for p in parts)
+        self.placed = len(placements)
+        self.placed_area = sum(parts[p].area for p, _, _, _ in placements)  # cm²
+        self.utilization = self.placed_area / (width * height)
+        self.used_length = 0.0  # Largo de chapa usado en X (cm)
+        self.unplaced = {}  # Nombre de pieza -> copias que no cupieron
+        placed = [0] * len(parts)
+        for p, _, _, _ in placements:
+            placed[p] += 1
+        for part, count in zip(parts, placed):
+            if count < part.quantity:
+                self.unplaced[part.name] = part.quantity - count
+        self.candidates = candidates  # Secuencias evaluadas
+        self.toolpath = None
+
+
+def contour_area(contours):
+    # Superficie con agujeros: los contornos cerrados a profundidad par suman
+    # y los de profundidad impar restan
+    closed = np.array([is_closed(c) for c in contours], dtype=bool)
+    parent = containment(contours, closed).tolist()
+    total = 0.0
+    for i, contour in enumerate(contours):
+        if not closed[i]:
+            continue
+        depth = 0
+        j = parent[i]
+        while j >= 0:
+            depth += 1
+            j = parent[j]
+        x, y = contour[:, 0], contour[:, 1]
+        area = abs(float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))) / 2
+        total += -area if depth % 2 else area
+    return total
+
+
+def rotated(contours, degrees):
+    # Contornos girados, otra vez con la esquina inferior izquierda en el origen
+    m = affine.rotate(degrees)
+    turned = [affine.apply(m, c) for c in contours]
+    low = np.concatenate(turned).min(axis=0)
+    return [c - low for c in turned]
+
+
+def rasterize(contours, cell):
+    # Celdas ocupadas (fila = y, columna = x): el interior por la regla
+    # par-impar en los centros de celda, más toda celda que toque un borde
+    points = np.concatenate(contours)
+    rows = max(1, int(math.ceil(points[:, 1].max() / cell)))
+    cols = max(1, int(math.ceil(points[:, 0].max() / cell)))
+    toggles = np.zeros((rows, cols + 1), dtype=np.int32)
+    for contour in contours:
+        if not is_closed(contour):
+            continue
+        x0, y0 = contour[:-1, 0], contour[:-1, 1]
+        x1, y1 = contour[1:, 0], contour[1:, 1]
+        # Filas cuyo centro cruza cada arista
+        low = np.ceil(np.minimum(y0, y1) / cell - 0.5).astype(np.int64)
+        high = np.ceil(np.maximum(y0, y1) / cell - 0.5).astype(np.int64)
+        counts = np.maximum(high - low, 0)
+        edge = np.repeat(np.arange(len(x0)), counts)
+        row = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + low[edge]
+        y = (row + 0.5) * cell
+        x = x0[edge] + (y - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+        col = np.clip(np.ceil(x / cell - 0.5).astype(np.int64), 0, cols)
+        np.add.at(toggles, (row, col), 1)
+    mask = (np.cumsum(toggles, axis=1)[:, :cols] % 2).astype(bool)
+    # Bordes y contornos abiertos: muestras cada media celda
+    starts = np.concatenate([c[:-1] for c in contours] + [points])
+    ends = np.concatenate([c[1:] for c in contours] + [points])
+    counts = np.ceil(np.hypot(*(ends - starts).T) / (cell / 2)).astype(np.int64) + 1
+    edge = np.repeat(np.arange(len(starts)), counts)
+    t = (np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)) / np.maximum(
+        counts[edge] - 1, 1)
+    samples = starts[edge] + (ends - starts)[edge] * t[:, None]
+    col = np.clip((samples[:, 0] / cell).astype(np.int64), 0, cols - 1)
+    row = np.clip((samples[:, 1] / cell).astype(np.int64), 0, rows - 1)
+    mask[row, col] = True
+    return mask
+
+
+def dilate(mask, radius):
+    # Agranda la máscara `radius` celdas en todas direcciones (disco)
+    rows, cols = mask.shape
+    out = np.zeros((rows + 2 * radius, cols + 2 * radius), dtype=bool)
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if dx * dx + dy * dy <= radius * radius:
+                out[radius + dy:radius + dy + rows, radius + dx:radius + dx + cols] |= mask
+    return out
+
+
+def part_shapes(parts, rotations=NEST_ROTATIONS, cell=NEST_RESOLUTION, kerf=NEST_KERF):
+    radius = int(math.ceil(kerf / cell)) if kerf > 0 else 0
+    steps = max(1, rotations)
+    return [[Shape(i, 360.0 * k / steps, rotated(part.contours, 360.0 * k / steps), cell, radius)
+             for k in range(steps)] for i, part in enumerate(parts)], radius
+
+
+def candidate_sequences(parts, seed=0):
+    # Orden en que se colocan las copias: primero los criterios clásicos
+    # (área, lado mayor, alto, ancho, de mayor a menor) y después el orden
+    # por área con perturbaciones aleatorias
+    def expand(order):
+        return tuple(i for i in order for _ in range(parts[i].quantity))
+
+    keys = (lambda p: p.width * p.height, lambda p: max(p.width, p.height),
+            lambda p: p.height, lambda p: p.width)
+    seen = set()
+    for key in keys:
+        sequence = expand(sorted(range(len(parts)), key=lambda i: -key(parts[i])))
+        if sequence not in seen:
+            seen.add(sequence)
+            yield sequence
+    rng = random.Random(seed)
+    copies = expand(range(len(parts)))
+    for _ in range(100 * NEST_MAX_CANDIDATES):
+        sequence = tuple(sorted(copies, key=lambda i: -parts[i].width * parts[i].height
+                                * rng.uniform(0.7, 1.3)))
+        if sequence not in seen:
+            seen.add(sequence)
+            yield sequence
+
+
+class _Sheet:
+    # Estado de un proceso de trabajo: tamaño de la rejilla y el espectro de
+    # cada pieza dilatada, calculado una sola vez
+    def __init__(self, masks, rows, cols, radius):
+        self.rows = rows
+        self.cols = cols
+        self.radius = radius
+        self.size = (rows + 2 * radius, cols + 2 * radius)
+        self.shapes = [[(mask, np.conj(np.fft.rfft2(halo, s=self.size))) for mask, halo in part]
+                       for part in masks]
+
+    def place(self, sequence, deadline=None):
+        # Lista de (pieza, giro, fila, columna), o None si se acabó el tiempo
+        occupied = np.zeros(self.size)
+        placements = []
+        full = set()  # Piezas que ya no caben en ninguna posición
+        r = self.radius
+        for part in sequence:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            if part in full:
+                continue
+            spectrum = np.fft.rfft2(occupied)
+            best = None
+            for rotation, (mask, kernel) in enumerate(self.shapes[part]):
+                h, w = mask.shape
+                if h > self.rows or w > self.cols:
+                    continue
+                overlap = np.fft.irfft2(spectrum * kernel, s=self.size)
+                rows, cols = np.nonzero(overlap[:self.rows - h + 1, :self.cols - w + 1] < 0.5)
+                if not len(rows):
+                    continue
+                score = (cols + w) * (self.rows + 1) + rows
+                k = int(np.argmin(score))
+                if best is None or score[k] < best[0]:
+                    best = (int(score[k]), rotation, int(rows[k]), int(cols[k]))
+            if best is None:
+                full.add(part)
+                continue
+            _, rotation, row, col = best
+            mask = self.shapes[part][rotation][0]
+            h, w = mask.shape
+            occupied[row + r:row + r + h, col + r:col + r + w] += mask
+            placements.append((part, rotation, row, col))
+        return placements
+
+
+_sheet = None
+
+
+def _init_worker(masks, rows, cols, radius):
+    global _sheet
+    _sheet = _Sheet(masks, rows, cols, radius)
+
+
+def _place(sequence, deadline):
+    return _sheet.place(sequence, deadline)
+
+
+def iter_nest(parts, width=WORK_AREA_WIDTH, height=WORK_AREA_HEIGHT, rotations=NEST_ROTATIONS,
+              kerf=NEST_KERF, margin=NEST_MARGIN, cell=NEST_RESOLUTION,
+              time_budget=NEST_TIME_BUDGET, workers=None, optimize=True,
+              tolerance=FLATTEN_TOLERANCE):
+    # Entrega el avance mientras prueba secuencias:
+    #   ("status", descripción, fracción del tiempo)
+    #   ("nest", NestResult con la trayectoria combinada, 1.0)
+    # Cerrar el generador cancela las secuencias pendientes.
+    parts = list(parts)
+    shapes, radius = part_shapes(parts, rotations, cell, kerf)
+    rows = int((height - 2 * margin) // cell)
+    cols = int((width - 2 * margin) // cell)
+    masks = [[(shape.mask, shape.halo) for shape in part] for part in shapes]
+    workers = workers or os.cpu_count() or 1
+    start = time.monotonic()
+    deadline = start + time_budget
+    sequences = candidate_sequences(parts)
+    best, best_key, evaluated, submitted = None, None, 0, 0
+    pending = set()
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(masks, rows, cols, radius))
+    try:
+        while True:
+            while (len(pending) < workers and submitted < NEST_MAX_CANDIDATES
+                   and (submitted == 0 or time.monotonic() < deadline)):
+                sequence = next(sequences, None)
+                if sequence is None:
+                    break
+                # La primera secuencia siempre termina: garantiza un resultado
+                pending.add(pool.submit(_place, sequence, None if submitted == 0 else deadline))
+                submitted += 1
+            if not pending:
+                break
+            timeout = None if best is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                placements = future.result()
+                if placements is None:
+                    continue
+                evaluated += 1
+                used = max((col + shapes[p][k].mask.shape[1] for p, k, _, col in placements),
+                           default=0)
+                key = (sum(parts[p].area for p, _, _, _ in placements), len(placements), -used)
+                if best_key is None or key > best_key:
+                    best, best_key = placements, key
+            if best is None:
+                # Solo terminaron secuencias cortadas por el plazo: la primera sigue
+                continue
+            fraction = min(1.0, (time.monotonic() - start) / time_budget) if time_budget > 0 else 1.0
+            yield ("status", f"Nesting: {len(best)}/{sum(p.quantity for p in parts)} parts, "
+                             f"{evaluated} layouts", fraction)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if best is None:
+        best = []
+
+    contours = []
+    placements = []
+    for p, k, row, col in best:
+        shape = shapes[p][k]
+        x, y = margin + col * cell, margin + row * cell
+        contours.extend(c + (x, y) for c in shape.contours)
+        placements.append((p, shape.degrees, x, y))
+    result = NestResult(parts, placements, width, height, evaluated)
+    if contours:
+        result.used_length = float(max(c[:, 0].max() for c in contours)) + margin
+    order = None
+    if optimize and contours:
+        yield "status", "Optimizing cut order", 1.0
+        order = order_contours(contours)
+        contours = order.apply(contours)
+    result.toolpath = Toolpath.from_contours(contours, tolerance, width, height)
+    if order is not None:
+        result.toolpath.rapid_before = order.rapid_before
+        result.toolpath.rapid_after = order.rapid_after
+    yield "nest", result, 1.0
+
+
+def nest(parts, width=WORK_AREA_WIDTH, height=WORK_AREA_HEIGHT, **options):
+    for kind, value, _ in iter_nest(parts, width, height, **options):
+        if kind == "nest":
+            return value
@@ -0,0 +1,326 @@
+# Planificador de velocidad con anticipación (look-ahead).
+#
+# Se coloca entre los puntos del camino y el generador de pasos. Para cada
+# segmento calcula la velocidad de unión con el anterior según el ángulo de
+# la esquina (desviación de unión), recorre una ventana de N segmentos hacia
+# atrás y hacia adelante para que siempre se pueda frenar a tiempo, y
+# entrega perfiles trapezoidales (o curva S si se da un jerk) convertidos en
+# una tabla de tiempos por paso.
+#
+# Los arcos (explícitos o reconocidos en los puntos) son un solo segmento de
+# curvatura constante: su velocidad se limita por la aceleración centrípeta
+# y la esquina con el segmento vecino se mide entre las tangentes.
+
+import math
+
+import numpy as np
+
+from arcs import ARC_MIN_RADIUS, ARC_TOLERANCE, arc_steps, arc_sweep, arc_tangents, fit_arcs
+from motion import STEPS_PER_CM
+
+# Muestras por rampa al convertir el perfil de velocidad en tiempos por paso
+RAMP_SAMPLES = 64
+
+
+class MachineLimits:
+    def __init__(self, max_velocity=(8.0, 8.0), acceleration=(40.0, 40.0), jerk=None,
+                 junction_deviation=0.005, lookahead=16):
+        self.max_velocity = max_velocity  # cm/s por eje
+        self.acceleration = acceleration  # cm/s² por eje
+        self.jerk = jerk  # cm/s³ por eje, None para perfil trapezoidal
+        self.junction_deviation = junction_deviation  # cm
+        self.lookahead = lookahead  # segmentos
+
+
+def _axis_limit(limits, ux, uy):
+    # Límite sobre la trayectoria a partir de los límites de cada eje
+    if limits is None:
+        return None
+    value = math.inf
+    if ux:
+        value = min(value, limits[0] / abs(ux))
+    if uy:
+        value = min(value, limits[1] / abs(uy))
+    return value
+
+
+def _ramp_time(dv, accel, jerk):
+    if dv <= 0:
+        return 0.0
+    if not jerk:
+        return dv / accel
+    if dv >= accel * accel / jerk:
+        return dv / accel + accel / jerk
+    return 2 * math.sqrt(dv / jerk)
+
+
+def _ramp_distance(v0, v1, accel, jerk):
+    return (v0 + v1) / 2 * _ramp_time(abs(v1 - v0), accel, jerk)
+
+
+def reachable_speed(v0, distance, accel, jerk=None):
+    # Velocidad máxima alcanzable partiendo de v0 tras recorrer `distance`
+    if distance <= 0:
+        return v0
+    if not jerk:
+        return math.sqrt(v0 * v0 + 2 * accel * distance)
+    # Rampa sin fase de aceleración constante: s³ + 2·v0·s - d·√j = 0, dv = s²
+    p = 2 * v0
+    q = -distance * math.sqrt(jerk)
+    root = math.sqrt((q / 2) ** 2 + (p / 3) ** 3)
+    s = math.copysign(abs(-q / 2 + root) ** (1 / 3), -q / 2 + root)
+    s += math.copysign(abs(-q / 2 - root) ** (1 / 3), -q / 2 - root)
+    dv = s * s
+    if dv < accel * accel / jerk:
+        return v0 + dv
+    # Rampa con fase constante: dv²/(2a) + dv·(v0/a + a/(2j)) + v0·a/j - d = 0
+    b = v0 / accel + accel / (2 * jerk)
+    c = v0 * accel / jerk - distance
+    dv = (-b + math.sqrt(b * b - 2 * c / accel)) * accel
+    return v0 + dv
+
+
+class PlannedSegment:
+    __slots__ = ("index", "dx", "dy", "length", "v_max", "accel", "jerk",
+                 "v_entry", "v_cruise", "v_exit", "arc", "_steps")
+
+    def __init__(self, index, dx, dy, length, v_max, accel, jerk, arc=None):
+        self.index = index  # Índice del punto destino en el camino
+        self.dx = dx  # pasos
+        self.dy = dy
+        self.length = length  # cm
+        self.v_max = v_max  # cm/s
+        self.accel = accel
+        self.jerk = jerk
+        self.v_entry = 0.0
+        self.v_cruise = 0.0
+        self.v_exit = 0.0
+        self.arc = arc  # (i, j, horario): centro en pasos respecto al inicio, o None
+        self._steps = None
+
+    @property
+    def steps(self):
+        # Arcos: pasos por tic (sx, sy) y posición a lo largo del arco de cada tic
+        if self._steps is None:
+            self._steps = arc_steps(self.arc[0], self.arc[1], self.dx, self.dy, self.arc[2])
+        return self._steps
+
+    @property
+    def ticks(self):
+        if self.arc is not None:
+            return len(self.steps[0])
+        return max(abs(self.dx), abs(self.dy))
+
+    def tangents(self):
+        # Dirección al entrar y al salir del segmento
+        if self.arc is not None:
+            return arc_tangents(self.arc[0], self.arc[1], self.dx, self.dy, self.arc[2])
+        return (self.dx, self.dy), (self.dx, self.dy)
+
+    def _profile(self):
+        v0, v1 = self.v_entry, self.v_exit
+        vc = self.v_max
+        accel, jerk, length = self.accel, self.jerk, self.length
+        if _ramp_distance(v0, vc, accel, jerk) + _ramp_distance(vc, v1, accel, jerk) > length:
+            # Sin tramo de crucero: buscar la velocidad pico por bisección
+            low, high = max(v0, v1), vc
+            for _ in range(40):
+                mid = (low + high) / 2
+                if _ramp_distance(v0, mid, accel, jerk) + _ramp_distance(mid, v1, accel, jerk) > length:
+                    high = mid
+                else:
+                    low = mid
+            vc = low
+        self.v_cruise = vc
+        return vc
+
+    def step_times(self):
+        # Tiempo (s) en el que se alcanza cada tic, empezando en 0
+        vc = self._profile()
+        t_up, s_up = _ramp_samples(self.v_entry, vc, self.accel, self.jerk)
+        t_down, s_down = _ramp_samples(vc, self.v_exit, self.accel, self.jerk)
+        cruise = max(self.length - s_up[-1] - s_down[-1], 0.0)
+        t_cruise = cruise / vc if vc > 0 else 0.0
+        t = np.concatenate((t_up, t_up[-1] + t_cruise + t_down))
+        s = np.concatenate((s_up, s_up[-1] + cruise + s_down))
+        if self.arc is not None:
+            positions = self.steps[2]
+            positions = positions * (self.length / positions[-1])
+        else:
+            ticks = self.ticks
+            positions = np.arange(1, ticks + 1) * (self.length / ticks)
+        return np.interp(positions, s, t)
+
+    def step_delays(self):
+        # Semiperiodo (s) de cada tic: alto `delay`, bajo `delay`
+        return np.diff(self.step_times(), prepend=0.0) / 2
+
+    def step_periods_us(self):
+        # Periodo completo de cada tic en microsegundos enteros, sin acumular
+        # error de redondeo (el ejecutor reparte alto y bajo)
+        times = np.rint(self.step_times() * 1e6).astype(np.int64)
+        return np.diff(times, prepend=0).astype(np.uint32)
+
+    def duration(self):
+        times = self.step_times()
+        return float(times[-1]) if len(times) else 0.0
+
+
+def _ramp_samples(v0, v1, accel, jerk):
+    # Muestras (t, s) de una rampa de v0 a v1
+    dv = abs(v1 - v0)
+    total = _ramp_time(dv, accel, jerk)
+    if total == 0:
+        return np.zeros(1), np.zeros(1)
+    t = np.linspace(0.0, total, RAMP_SAMPLES)
+    if not jerk:
+        dv_t = accel * t
+    else:
+        t1 = min(accel / jerk, math.sqrt(dv / jerk))
+        peak = jerk * t1
+        rise = np.where(t < t1, jerk * t * t / 2, jerk * t1 * t1 / 2 + peak * (t - t1))
+        fall = dv - jerk * (total - t) ** 2 / 2
+        dv_t = np.where(t > total - t1, fall, rise)
+    v = v0 + dv_t if v1 >= v0 else v0 - _mirror(dv_t, dv)
+    s = np.concatenate(([0.0], np.cumsum((v[1:] + v[:-1]) / 2 * np.diff(t))))
+    return t, s
+
+
+def _mirror(dv_t, dv):
+    # Rampa de frenado: la misma curva recorrida al revés
+    return dv - dv_t[::-1]
+
+
+class Planner:
+    def __init__(self, limits=None, steps_per_cm=STEPS_PER_CM, arc_tolerance=ARC_TOLERANCE):
+        self.limits = limits or MachineLimits()
+        self.steps_per_cm = steps_per_cm
+        self.arc_tolerance = arc_tolerance  # cm; None para no reconocer arcos en los puntos
+
+    def segments(self, points, start=(0, 0), breaks=None):
+        # Convierte puntos en cm a segmentos en pasos desde `start` (pasos).
+        # Un tercer valor opcional por punto es el avance pedido (cm/s, p. ej.
+        # la F del G-code), que limita la velocidad del segmento, y un cuarto
+        # un arco (cx, cy, horario) en cm que termina en el punto. `breaks[i]`
+        # verdadero indica que al punto i se llega en vacío: ningún arco
+        # reconocido lo atraviesa
+        limits = self.limits
+        spc = self.steps_per_cm
+        if self.arc_tolerance:
+            moves = fit_arcs(points, self.arc_tolerance, breaks)
+        else:
+            moves = enumerate(points)
+        px, py = start
+        for index, point in moves:
+            x, y = point[0], point[1]
+            tx, ty = round(x * spc), round(y * spc)
+            dx, dy = tx - px, ty - py
+            arc = point[3] if len(point) > 3 else None
+            if arc is not None:
+                segment = self._arc_segment(index, dx, dy, round(arc[0] * spc) - px,
+                                            round(arc[1] * spc) - py, arc[2],
+                                            point[2] if len(point) > 2 else None)
+                if segment is not None:
+                    yield segment
+                    px, py = tx, ty
+                    continue
+            if dx == 0 and dy == 0:
+                continue
+            length = math.hypot(dx, dy) / spc
+            ux, uy = dx / spc / length, dy / spc / length
+            v_max = _axis_limit(limits.max_velocity, ux, uy)
+            if len(point) > 2 and point[2]:
+                v_max = min(v_max, point[2])
+            yield PlannedSegment(
+                index, dx, dy, length, v_max,
+                _axis_limit(limits.acceleration, ux, uy),
+                _axis_limit(limits.jerk, ux, uy),
+            )
+            px, py = tx, ty
+
+    def _arc_segment(self, index, dx, dy, i, j, clockwise, feed):
+        # Arco de un solo segmento, o None si es tan cerrado (o tan corto)
+        # que se recorre mejor como recta
+        spc = self.steps_per_cm
+        r = math.hypot(i, j)
+        if r < max(ARC_MIN_RADIUS * spc, 2):
+            return None
+        if r * arc_sweep(i, j, dx, dy, clockwise) < 2:
+            return None
+        limits = self.limits
+        # Los tics se cronometran por su paso real (1 o √2), así que la
+        # longitud del arco es la suma de esos pasos, y la velocidad de cada
+        # eje en un tic es v·|paso del eje|/paso: la mayor proporción de cada
+        # eje en el arco limita la velocidad como la dirección de una recta
+        steps = arc_steps(i, j, dx, dy, clockwise)
+        sx, sy, positions = steps
+        length = float(positions[-1]) / spc
+        ux = float(np.max(np.abs(sx) / np.hypot(sx, sy)))
+        uy = float(np.max(np.abs(sy) / np.hypot(sx, sy)))
+        # La aceleración centrípeta v²/r apunta en todas las direcciones del
+        # arco: vale la del eje más limitado
+        accel = min(limits.acceleration)
+        v_max = min(_axis_limit(limits.max_velocity, ux, uy), math.sqrt(accel * r / spc))
+        if feed:
+            v_max = min(v_max, feed)
+        jerk = min(limits.jerk) if limits.jerk else None
+        segment = PlannedSegment(index, dx, dy, length, v_max, accel, jerk, (i, j, clockwise))
+        segment._steps = steps
+        return segment
+
+    def _junction_speed(self, prev, seg):
+        # Velocidad máxima en la esquina según el ángulo entre las tangentes
+        (ax, ay) = prev.tangents()[1]
+        (bx, by) = seg.tangents()[0]
+        cos_theta = -(ax * bx + ay * by) / (math.hypot(ax, ay) * math.hypot(bx, by))
+        v_limit = min(prev.v_max, seg.v_max)
+        if cos_theta < -0.999999:
+            return v_limit  # Recta
+        if cos_theta > 0.999999:
+            return 0.0  # Media vuelta
+        sin_half = math.sqrt(0.5 * (1 - cos_theta))
+        accel = min(prev.accel, seg.accel)
+        v = math.sqrt(accel * self.limits.junction_deviation * sin_half / (1 - sin_half))
+        return min(v, v_limit)
+
+    def iter_plan(self, points, start=(0, 0), breaks=None):
+        # Entrega los segmentos planificados en orden a medida que su
+        # velocidad de salida queda fija (ventana de look-ahead)
+        window = []
+        junctions = []  # Velocidad máxima de entrada de cada segmento de la ventana
+        v_entry = 0.0
+        lookahead = max(self.limits.lookahead, 1)
+        prev = None
+        for seg in self.segments(points, start, breaks):
+            # Donde la antorcha se enciende o se apaga la máquina se detiene
+            if prev is None or (breaks is not None
+                                and bool(breaks[prev.index]) != bool(breaks[seg.index])):
+                junctions.append(0.0)
+            else:
+                junctions.append(self._junction_speed(prev, seg))
+            window.append(seg)
+            prev = seg
+            if len(window) > lookahead:
+                v_entry = self._emit(window, junctions, v_entry)
+                yield window.pop(0)
+                junctions.pop(0)
+        while window:
+            v_entry = self._emit(window, junctions, v_entry)
+            yield window.pop(0)
+            junctions.pop(0)
+
+    def plan(self, points, start=(0, 0), breaks=None):
+        return list(self.iter_plan(points, start, breaks))
+
+    def _emit(self, window, junctions, v_entry):
+        # Pasada hacia atrás: la ventana debe poder detenerse al final
+        exit_limit = 0.0
+        for i in range(len(window) - 1, 0, -1):
+            seg = window[i]
+            exit_limit = min(junctions[i], reachable_speed(exit_limit, seg.length, seg.accel, seg.jerk))
+        first = window[0]
+        # Pasada hacia adelante sobre el primer segmento
+        first.v_entry = v_entry
+        first.v_exit = min(exit_limit, reachable_speed(v_entry, first.length, first.accel, first.jerk),
+                           first.v_max)
+        return first.v_exit
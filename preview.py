@@ -0,0 +1,348 @@
+# Vista previa en QGraphicsScene a partir de arreglos de puntos.
+#
+# Cada contorno se copia de un arreglo n×2 a un QPolygonF directamente en
+# memoria (sin crear un QPointF por punto) y cada camino del SVG queda como
+# un único QGraphicsPathItem. SvgPreview además guarda los caminos sin
+# aplanar y los vuelve a aplanar según la escala de la vista (nivel de
+# detalle), de modo que el número de elementos de la escena depende del
+# número de caminos y no del número de muestras.
+#
+# ProgressiveLoader ejecuta un generador de carga en un hilo y entrega sus
+# resultados en el hilo de la GUI por lotes, a frecuencia fija, para dibujar
+# mientras se lee sin congelar la ventana.
+#
+# PathOverlay dibuja un trazo que crece (el recorrido de la antorcha) por
+# tramos de tamaño acotado. TraceReplay lo alimenta con el rastro de una
+# simulación a cualquier múltiplo del tiempo real, y CutProgress con la
+# posición que informa el proceso de movimiento durante el corte, una vez
+# por cuadro de la pantalla sea cual sea la frecuencia de pasos.
+
+import os
+import threading
+from collections import deque
+
+import numpy as np
+from PyQt5.QtCore import QElapsedTimer, QLineF, QObject, QPointF, QRectF, Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QBrush, QGuiApplication, QPainterPath, QPen, QPolygonF
+from PyQt5.QtWidgets import QGraphicsItem
+
+from svg_loader import SvgDocument, flatten_paths, iter_svg_paths
+
+PIXEL_TOLERANCE = 0.25  # Error de cuerda máximo en pixeles de pantalla
+LOD_STEP = 2.0  # Cambio de escala que obliga a volver a muestrear
+LOAD_POLL_INTERVAL = 30  # ms entre entregas de lotes a la GUI
+MAX_BATCH = 2000  # Elementos entregados por ciclo, para no frenar la interfaz
+OVERLAY_CHUNK = 4096  # Puntos por elemento de la escena en un trazo que crece
+REPLAY_INTERVAL = 33  # ms entre cuadros de la reproducción
+MIN_FRAME_INTERVAL = 16  # ms: no se redibuja más rápido que ~60 Hz
+
+
+def polygon_from_array(points):
+    polygon = QPolygonF()
+    polygon.fill(QPointF(), len(points))
+    buffer = polygon.data()
+    buffer.setsize(len(points) * 2 * 8)
+    np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)[:] = points
+    return polygon
+
+
+def painter_path(contours, flip_y=False):
+    path = QPainterPath()
+    for contour in contours:
+        if flip_y:
+            contour = contour * (1.0, -1.0)
+        path.addPolygon(polygon_from_array(contour))
+    return path
+
+
+def refresh_interval():
+    # ms entre cuadros de la pantalla principal, para agrupar las actualizaciones
+    screen = QGuiApplication.primaryScreen()
+    rate = screen.refreshRate() if screen is not None else 0
+    return max(MIN_FRAME_INTERVAL, round(1000 / rate)) if rate > 0 else MIN_FRAME_INTERVAL
+
+
+def contour_rect(contours, flip_y=False):
+    # Rectángulo de escena calculado con los mismos arreglos que se dibujan
+    if not contours:
+        return QRectF()
+    points = np.concatenate(contours)
+    min_x, min_y = points.min(axis=0)
+    max_x, max_y = points.max(axis=0)
+    if flip_y:
+        min_y, max_y = -max_y, -min_y
+    return QRectF(float(min_x), float(min_y), float(max_x - min_x), float(max_y - min_y))
+
+
+class SvgPreview:
+    def __init__(self, paths, flip_y=False, pen=None):
+        self.paths = paths  # (subcaminos, transformación, estiramiento) por <path>
+        self.flip_y = flip_y
+        self.pen = pen or QPen(Qt.black, 0)
+        self.items = []
+        self.scale = None
+        self.rect = QRectF()
+
+    @classmethod
+    def load(cls, source, flip_y=False, pen=None):
+        return cls(list(iter_svg_paths(source, SvgDocument(source))), flip_y, pen)
+
+    def extend(self, scene, paths, scale):
+        # Añade caminos recién leídos con la tolerancia de la escala actual
+        if self.scale is None:
+            self.scale = scale
+        self.paths.extend(paths)
+        flattened = list(flatten_paths(paths, PIXEL_TOLERANCE / self.scale))
+        for contours in flattened:
+            self.items.append(scene.addPath(painter_path(contours, self.flip_y), self.pen))
+        rect = contour_rect([c for path in flattened for c in path], self.flip_y)
+        self.rect = rect if self.rect.isNull() else self.rect.united(rect)
+        return self.rect
+
+    def needs_update(self, scale):
+        if self.scale is None:
+            return True
+        ratio = scale / self.scale
+        return ratio >= LOD_STEP or ratio <= 1 / LOD_STEP
+
+    def render(self, scene, scale):
+        # Aplana todas las curvas de una vez con la tolerancia de esta escala
+        self.scale = scale
+        tolerance = PIXEL_TOLERANCE / scale
+        flattened = list(flatten_paths(self.paths, tolerance))
+        self.rect = contour_rect([c for path in flattened for c in path], self.flip_y)
+        if len(self.items) != len(flattened):
+            self.clear(scene)
+            self.items = [scene.addPath(QPainterPath(), self.pen) for _ in flattened]
+        for item, contours in zip(self.items, flattened):
+            item.setPath(painter_path(contours, self.flip_y))
+        return self.rect
+
+    def clear(self, scene):
+        for item in self.items:
+            scene.removeItem(item)
+        self.items = []
+        self.scale = None
+
+
+def iter_preview_paths(file_name):
+    # ("paths", (subcaminos, transformación, estiramiento), fracción leída)
+    with open(file_name, "rb") as f:
+        size = os.fstat(f.fileno()).st_size or 1
+        for path in iter_svg_paths(f, SvgDocument(file_name)):
+            yield "paths", path, f.tell() / size
+
+
+class ProgressiveLoader(QObject):
+    # Los eventos del generador son (tipo, valor, fracción). Los de tipo
+    # "contours" o "paths" se agrupan en `batch`; "status" va a `status`; un
+    # error va a `failed`, y cualquier otro tipo es el resultado final
+    # (`finished` con None si el generador termina sin resultado)
+    batch = pyqtSignal(str, list, float)
+    status = pyqtSignal(str, float)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+    def __init__(self, generator, parent=None):
+        super().__init__(parent)
+        self._generator = generator
+        self._events = deque()
+        self._cancelled = False
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._drain)
+        self._thread = threading.Thread(target=self._run, name="svg-loader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._timer.start(LOAD_POLL_INTERVAL)
+
+    def cancel(self):
+        # El hilo deja de iterar en el siguiente evento; no se emite nada más
+        self._cancelled = True
+        self._timer.stop()
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def _run(self):
+        try:
+            for event in self._generator:
+                if self._cancelled:
+                    break
+                self._events.append(event)
+        except Exception as error:  # Se entrega a la GUI, que decide cómo mostrarlo
+            self._events.append(("error", error, 1.0))
+        finally:
+            self._generator.close()
+            self._events.append(("end", None, 1.0))
+
+    def _drain(self):
+        kind, items, fraction = None, [], 0.0
+        for _ in range(MAX_BATCH):
+            if not self._events or self._cancelled:
+                break
+            event_kind, value, event_fraction = self._events.popleft()
+            if event_kind in ("contours", "paths"):
+                if kind is not None and event_kind != kind:
+                    self.batch.emit(kind, items, fraction)
+                    items = []
+                kind = event_kind
+                items.append(value)
+                fraction = event_fraction
+                continue
+            if items:
+                self.batch.emit(kind, items, fraction)
+                kind, items = None, []
+            if event_kind == "status":
+                self.status.emit(value, event_fraction)
+                continue
+            # Evento final: lo que quede en la cola (el "end") se descarta
+            self._timer.stop()
+            self._events.clear()
+            if event_kind == "error":
+                self.failed.emit(value)
+            elif event_kind == "end":
+                # Generador agotado sin resultado propio (p. ej. solo caminos)
+                self.finished.emit(None)
+            else:
+                self.finished.emit(value)
+            return
+        if items and not self._cancelled:
+            self.batch.emit(kind, items, fraction)
+
+
+class PathOverlay:
+    # Trazo que crece por tramos: solo se rehace el último QGraphicsPathItem,
+    # de modo que añadir puntos cuesta lo mismo al principio que al final de
+    # un trabajo largo
+    def __init__(self, scene, pen=None, z=1):
+        self.scene = scene
+        self.pen = pen or QPen(Qt.red, 0)
+        self.z = z
+        self.items = []
+        self.last = None  # Último punto recibido
+        self._path = None
+        self._count = 0
+
+    def extend(self, points, cut):
+        # points: n×2 en cm; cut[i] verdadero si se llega al punto i cortando
+        if not len(points):
+            return
+        points = np.asarray(points, dtype=np.float64)
+        start = points[:1] if self.last is None else self.last[None]
+        chain = np.concatenate((start, points))
+        # Tramos seguidos de segmentos cortados: un polígono abierto por tramo
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], np.asarray(cut, dtype=np.int8), [0]))))
+        if self._path is None:
+            self._path = QPainterPath()
+            item = self.scene.addPath(self._path, self.pen)
+            item.setZValue(self.z)
+            self.items.append(item)
+        for first, last in zip(edges[::2], edges[1::2]):
+            self._path.addPolygon(polygon_from_array(chain[first:last + 1]))
+        self.items[-1].setPath(self._path)
+        self.last = points[-1].copy()
+        self._count += len(points)
+        if self._count >= OVERLAY_CHUNK:
+            self._path = None
+            self._count = 0
+
+    def clear(self):
+        for item in self.items:
+            self.scene.removeItem(item)
+        self.items = []
+        self.last = None
+        self._path = None
+        self._count = 0
+
+
+class TraceReplay(QObject):
+    # Reproduce el rastro (t, x, y, antorcha) de una simulación en la escena:
+    # un marcador sigue la posición y el corte queda dibujado detrás
+    finished = pyqtSignal()
+
+    def __init__(self, scene, trace, speed=1.0, pen=None, parent=None):
+        super().__init__(parent)
+        t, x, y, torch = trace
+        self.times = t
+        self.points = np.column_stack((x, y)).astype(np.float64)
+        self.torch = torch
+        self.speed = speed  # Múltiplo del tiempo real
+        self.overlay = PathOverlay(scene, pen)
+        self.marker = scene.addEllipse(-4, -4, 8, 8, QPen(Qt.red, 0), QBrush(Qt.red))
+        self.marker.setFlag(QGraphicsItem.ItemIgnoresTransformations)
+        self.marker.setZValue(2)
+        self.index = 0
+        self._clock = QElapsedTimer()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._advance)
+
+    def start(self):
+        self._clock.start()
+        self._timer.start(REPLAY_INTERVAL)
+
+    def stop(self):
+        self._timer.stop()
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def clear(self):
+        self.stop()
+        self.overlay.clear()
+        self.overlay.scene.removeItem(self.marker)
+
+    def _advance(self):
+        now = self._clock.elapsed() / 1000 * self.speed
+        end = int(np.searchsorted(self.times, now, side="right"))
+        if end > self.index:
+            self.overlay.extend(self.points[self.index:end], self.torch[self.index:end])
+            self.marker.setPos(QPointF(*self.points[end - 1]))
+            self.index = end
+        if self.index >= len(self.times):
+            self._timer.stop()
+            self.finished.emit()
+
+
+class CutProgress:
+    # Parte ya cortada de un trabajo en marcha. Con los puntos del trabajo se
+    # dibujan exactos hasta el último que el ejecutor completó, más un tramo
+    # desde ahí hasta la posición actual; sin ellos (G-code en flujo, cuyos
+    # arcos no tienen un punto por marca) se dibujan las posiciones
+    # muestreadas. update() se llama una vez por cuadro y no hace nada si la
+    # máquina no se movió
+    def __init__(self, scene, points=None, rapids=None, pen=None, z=1):
+        # rapids[i] verdadero si al punto i se llega en vacío
+        self.points = None if points is None else np.asarray(points, dtype=np.float64)
+        self.cut = None if rapids is None else ~np.asarray(rapids, dtype=bool)
+        self.overlay = PathOverlay(scene, pen or QPen(Qt.red, 0), z)
+        self.head = scene.addLine(QLineF(), self.overlay.pen)
+        self.head.setZValue(z)
+        self.head.hide()
+        self.done = 0  # Puntos ya dibujados
+        self.position = None
+
+    def update(self, index, x, y, torch):
+        # index: último punto completado (o None); x, y en cm; torch: antorcha encendida
+        changed = self.position != (x, y)
+        self.position = (x, y)
+        if self.points is None:
+            if changed:
+                self.overlay.extend(np.array([[x, y]]), [torch])
+            return
+        end = 0 if index is None else min(index + 1, len(self.points))
+        if end > self.done:
+            self.overlay.extend(self.points[self.done:end], self.cut[self.done:end])
+            self.done = end
+            changed = True
+        if not changed:
+            return
+        if torch and self.overlay.last is not None:
+            self.head.setLine(QLineF(QPointF(*self.overlay.last), QPointF(x, y)))
+            self.head.show()
+        else:
+            self.head.hide()
+
+    def clear(self):
+        self.overlay.clear()
+        self.overlay.scene.removeItem(self.head)
@@ -0,0 +1,106 @@
+# Simplificación de polilíneas (Ramer–Douglas–Peucker) antes de planificar.
+#
+# Todos los contornos se procesan juntos: en cada pasada se calcula con
+# NumPy la distancia de cada punto interior a la cuerda de su tramo, y los
+# tramos cuyo punto más lejano supera la tolerancia se parten en ese punto.
+# El número de pasadas depende de la profundidad de la subdivisión, no del
+# número de puntos. Opcionalmente se quitan también los puntos alineados
+# exactamente con sus vecinos aunque la tolerancia sea cero.
+
+import numpy as np
+
+COLLINEAR_EPSILON = 1e-6  # cm
+
+
+def _segment_distance2(x, y, idx, rid, starts, ends):
+    # Distancia al cuadrado de cada punto interior al segmento de su tramo
+    # (al segmento y no a la recta, para los contornos cerrados)
+    ax, ay = x[starts], y[starts]
+    abx, aby = x[ends] - ax, y[ends] - ay
+    length2 = abx * abx + aby * aby
+    inv = np.divide(1.0, length2, out=np.zeros_like(length2), where=length2 > 0)
+    ax, ay, abx, aby, inv = ax[rid], ay[rid], abx[rid], aby[rid], inv[rid]
+    apx = x[idx] - ax
+    apy = y[idx] - ay
+    t = (apx * abx + apy * aby) * inv
+    np.clip(t, 0.0, 1.0, out=t)
+    apx -= abx * t
+    apy -= aby * t
+    return apx * apx + apy * apy
+
+
+def _interior(starts, ends):
+    # Índices interiores de cada tramo [start, end] concatenados, y su tramo
+    counts = ends - starts - 1
+    rid = np.repeat(np.arange(len(starts)), counts)
+    first = np.cumsum(counts) - counts
+    idx = np.arange(int(counts.sum())) - first[rid] + starts[rid] + 1
+    return idx, rid, first
+
+
+def rdp_mask(points, offsets, tolerance):
+    # Máscara de puntos que se conservan; offsets delimita los contornos
+    keep = np.zeros(len(points), dtype=bool)
+    x = np.ascontiguousarray(points[:, 0], dtype=np.float64)
+    y = np.ascontiguousarray(points[:, 1], dtype=np.float64)
+    tolerance2 = tolerance * tolerance
+    sizes = np.diff(offsets)
+    keep[offsets[:-1][sizes > 0]] = True
+    keep[offsets[1:][sizes > 0] - 1] = True
+    starts = offsets[:-1][sizes > 2].astype(np.int64)
+    ends = offsets[1:][sizes > 2].astype(np.int64) - 1
+    while len(starts):
+        idx, rid, first = _interior(starts, ends)
+        d = _segment_distance2(x, y, idx, rid, starts, ends)
+        farthest = np.maximum.reduceat(d, first)
+        # Primer punto que alcanza el máximo de cada tramo
+        hits = np.flatnonzero(d == farthest[rid])
+        ranges, pos = np.unique(rid[hits], return_index=True)
+        split = idx[hits[pos]]
+        over = farthest[ranges] > tolerance2
+        ranges, split = ranges[over], split[over]
+        keep[split] = True
+        starts = np.concatenate([starts[ranges], split])
+        ends = np.concatenate([split, ends[ranges]])
+        wide = ends - starts > 1
+        starts, ends = starts[wide], ends[wide]
+    return keep
+
+
+def collinear_mask(points, offsets, epsilon=COLLINEAR_EPSILON):
+    # Quita puntos interiores alineados con sus vecinos y en el mismo sentido
+    keep = np.ones(len(points), dtype=bool)
+    sizes = np.diff(offsets)
+    starts = offsets[:-1][sizes > 2].astype(np.int64)
+    ends = offsets[1:][sizes > 2].astype(np.int64) - 1
+    if not len(starts):
+        return keep
+    idx, _, _ = _interior(starts, ends)
+    prev, cur, nxt = points[idx - 1], points[idx], points[idx + 1]
+    u, v = cur - prev, nxt - cur
+    cross = np.abs(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0])
+    chord = np.hypot(*(nxt - prev).T)
+    straight = (cross <= epsilon * np.maximum(chord, epsilon)) & (np.einsum("ij,ij->i", u, v) >= 0)
+    keep[idx[straight]] = False
+    return keep
+
+
+def simplify_contours(contours, tolerance, merge_collinear=False):
+    # Devuelve (contornos simplificados, puntos quitados)
+    contours = list(contours)
+    if not contours:
+        return contours, 0
+    offsets = np.zeros(len(contours) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in contours], out=offsets[1:])
+    points = np.concatenate(contours).astype(np.float64, copy=False)
+    keep = rdp_mask(points, offsets, tolerance) if tolerance > 0 else np.ones(len(points), dtype=bool)
+    if merge_collinear:
+        kept = np.flatnonzero(keep)
+        kept_offsets = np.searchsorted(kept, offsets)
+        keep[kept[~collinear_mask(points[kept], kept_offsets)]] = False
+    removed = int(len(points) - np.count_nonzero(keep))
+    if not removed:
+        return contours, 0
+    kept_before = np.concatenate([[0], np.cumsum(keep)])[offsets]
+    pieces = np.split(points[keep], kept_before[1:-1])
+    return [p.astype(c.dtype, copy=False) for p, c in zip(pieces, contours)], removed
@@ -0,0 +1,191 @@
+# Máquina simulada con reloj virtual.
+#
+# Ejecuta los mismos registros de pasos que el proceso de movimiento
+# (periodo en µs y banderas por tic) pero sin esperar: el reloj es la suma de
+# los periodos, de modo que un trabajo de horas se recorre en segundos. Cada
+# bloque de registros se procesa de una vez con NumPy: posición, cambios del
+# relé de la antorcha, pasos por eje, frecuencia máxima de pasos y salidas
+# de la mesa. Se guarda además un rastro (t, x, y, antorcha) muestreado a
+# intervalos fijos del reloj virtual para reproducirlo en la vista previa a
+# cualquier velocidad.
+#
+# El ejecutor real no espera al encender la antorcha, así que el reloj
+# virtual tampoco: el tiempo de perforación (pierce_delay por encendido, 0 por
+# omisión) se reporta aparte en pierce_time para estimar la pausa del
+# operador o del CNC sin alterar el ciclo de la máquina.
+
+import math
+
+import numpy as np
+
+from cnc_core import JobReport, JobSettings, load_toolpath, plan_gcode, plan_toolpath
+from gcode import is_gcode
+from motion import STEP_X, STEP_Y
+from step_stream import DIR_X, DIR_Y, END_OF_JOB, TORCH
+
+PIERCE_DELAY = 0.0  # s de perforación por encendido; el ejecutor no espera
+TRACE_INTERVAL = 0.02  # s virtuales entre muestras del rastro
+
+
+class SimulatedMachine:
+    def __init__(self, steps_per_cm, work_area, start=(0, 0), pierce_delay=PIERCE_DELAY,
+                 trace_interval=TRACE_INTERVAL):
+        self.steps_per_cm = steps_per_cm
+        self.limits = (round(work_area[0] * steps_per_cm), round(work_area[1] * steps_per_cm))
+        self.pierce_delay = pierce_delay
+        self.trace_interval = trace_interval  # None para no guardar el rastro
+        self.x, self.y = start  # pasos
+        self.time = 0.0  # s virtuales
+        self.torch = False
+        self.ticks = 0
+        self.cut_time = 0.0
+        self.rapid_time = 0.0
+        self.pierces = 0
+        self.relay_switches = 0  # Encendidos más apagados del relé
+        self.steps_x = 0
+        self.steps_y = 0
+        self.min_period_x = math.inf  # s entre dos pasos seguidos del mismo eje
+        self.min_period_y = math.inf
+        self.violations = 0  # Tics que terminan fuera de la mesa
+        self.first_violation = None  # (t, x, y) en s y cm
+        self.bounds = (self.x, self.y, self.x, self.y)  # pasos
+        self._last_step = [None, None]
+        self._bucket = -1
+        self._trace = []
+
+    @property
+    def pierce_time(self):
+        return self.pierces * self.pierce_delay
+
+    @property
+    def peak_rate_x(self):
+        return 1 / self.min_period_x if self.min_period_x > 0 else math.inf
+
+    @property
+    def peak_rate_y(self):
+        return 1 / self.min_period_y if self.min_period_y > 0 else math.inf
+
+    def run(self, records):
+        # Ejecuta un bloque de registros con la misma semántica que el ejecutor
+        if not len(records):
+            return
+        flags = records["flags"].astype(np.int64)
+        period = records["interval"] / 1e6
+        end = (flags & END_OF_JOB) != 0
+        period[end] = 0.0
+        torch = ((flags & TORCH) != 0) & ~end
+        sx = np.where(flags & STEP_X, np.where(flags & DIR_X, 1, -1), 0)
+        sy = np.where(flags & STEP_Y, np.where(flags & DIR_Y, 1, -1), 0)
+        sx[end] = 0
+        sy[end] = 0
+        # El relé cambia antes del tic, sin pausa al encenderse
+        previous = np.concatenate(([self.torch], torch[:-1]))
+        pierce = torch & ~previous
+        ends = self.time + np.cumsum(period)
+        starts = ends - period
+        px = self.x + np.cumsum(sx)
+        py = self.y + np.cumsum(sy)
+
+        self.pierces += int(np.count_nonzero(pierce))
+        self.relay_switches += int(np.count_nonzero(torch != previous))
+        self.cut_time += float(period[torch].sum())
+        self.rapid_time += float(period[~torch].sum())
+        self.ticks += int(np.count_nonzero(~end))
+        for axis, steps in enumerate((sx, sy)):
+            times = starts[steps != 0]
+            if not len(times):
+                continue
+            if axis:
+                self.steps_y += len(times)
+            else:
+                self.steps_x += len(times)
+            last = self._last_step[axis]
+            gaps = np.diff(times if last is None else np.concatenate(([last], times)))
+            if len(gaps):
+                if axis:
+                    self.min_period_y = min(self.min_period_y, float(gaps.min()))
+                else:
+                    self.min_period_x = min(self.min_period_x, float(gaps.min()))
+            self._last_step[axis] = float(times[-1])
+        outside = (px < 0) | (px > self.limits[0]) | (py < 0) | (py > self.limits[1])
+        count = int(np.count_nonzero(outside))
+        if count:
+            if self.first_violation is None:
+                i = int(np.argmax(outside))
+                spc = self.steps_per_cm
+                self.first_violation = (float(ends[i]), px[i] / spc, py[i] / spc)
+            self.violations += count
+        min_x, min_y, max_x, max_y = self.bounds
+        self.bounds = (min(min_x, int(px.min())), min(min_y, int(py.min())),
+                       max(max_x, int(px.max())), max(max_y, int(py.max())))
+        if self.trace_interval:
+            # Una muestra por intervalo del reloj virtual y en cada cambio del relé
+            buckets = (ends // self.trace_interval).astype(np.int64)
+            take = np.diff(buckets, prepend=self._bucket) != 0
+            take |= torch != previous
+            take[-1] = True
+            self._bucket = int(buckets[-1])
+            spc = self.steps_per_cm
+            self._trace.append((ends[take], (px[take] / spc).astype(np.float32),
+                                (py[take] / spc).astype(np.float32), torch[take]))
+        self.time = float(ends[-1])
+        self.x, self.y = int(px[-1]), int(py[-1])
+        self.torch = bool(torch[-1])
+
+    @property
+    def trace(self):
+        # (t, x, y, antorcha): instante y posición (cm) al terminar cada tic muestreado
+        if not self._trace:
+            return (np.zeros(0), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32),
+                    np.zeros(0, dtype=bool))
+        if len(self._trace) > 1:
+            self._trace = [tuple(np.concatenate(column) for column in zip(*self._trace))]
+        return self._trace[0]
+
+
+def iter_simulation(segments, machine, total=None, every=256):
+    # Ejecuta (segmento, registros) en la máquina simulada entregando el avance
+    # como eventos de carga; `total` es el número de puntos, si se conoce
+    for count, (segment, records) in enumerate(segments, 1):
+        machine.run(records)
+        if count % every == 0:
+            yield "status", "Simulating", segment.index / total if total else 0.0
+    yield "simulation", machine, 1.0
+
+
+def simulate_toolpath(toolpath, settings=None, report=None, pierce_delay=PIERCE_DELAY,
+                      trace_interval=TRACE_INTERVAL):
+    # Eventos de la simulación de una trayectoria ya cargada (p. ej. la de la GUI)
+    settings = settings or JobSettings()
+    report = report or JobReport(None)
+    machine = SimulatedMachine(settings.steps_per_cm, settings.work_area, pierce_delay=pierce_delay,
+                               trace_interval=trace_interval)
+    return iter_simulation(plan_toolpath(toolpath, settings, report), machine, len(toolpath.points))
+
+
+def simulate_gcode(file_name, settings=None, report=None, pierce_delay=PIERCE_DELAY,
+                   trace_interval=TRACE_INTERVAL):
+    settings = settings or JobSettings()
+    report = report or JobReport(file_name)
+    machine = SimulatedMachine(settings.steps_per_cm, settings.work_area, pierce_delay=pierce_delay,
+                               trace_interval=trace_interval)
+    return iter_simulation(plan_gcode(file_name, settings, report), machine)
+
+
+def simulate_job(file_name, settings=None, output_dir=None, cache=None, pierce_delay=PIERCE_DELAY):
+    # Mismo recorrido que compile_job (lectura, orden, planificación y pasos)
+    # sin escribir nada ni guardar el rastro: el reporte lleva la máquina
+    # simulada en `simulation`. output_dir se acepta por simetría con compile_job
+    settings = settings or JobSettings()
+    report = JobReport(file_name)
+    if is_gcode(file_name):
+        events = simulate_gcode(file_name, settings, report, pierce_delay, None)
+    else:
+        toolpath = load_toolpath(file_name, settings.tolerance, cache, settings.optimize,
+                                 settings.simplify, settings.merge_collinear)
+        events = simulate_toolpath(toolpath, settings, report, pierce_delay, None)
+    for kind, value, _ in events:
+        if kind == "simulation":
+            report.simulation = value
+            report.ticks = value.ticks
+    return report
@@ -0,0 +1,42 @@
+# Temporización del generador de pasos.
+#
+# Espera contra plazos absolutos del reloj monotónico (durmiendo y, en el
+# último tramo, de forma activa) y resumen de las estadísticas de retraso
+# que publica el proceso de movimiento (motion_process): un histograma por
+# potencias de dos de microsegundos, pasos tardíos y faltas de datos.
+
+import time
+
+# Último tramo antes de cada plazo que se espera de forma activa (s)
+SPIN_THRESHOLD = 0.0005
+
+HISTOGRAM_BUCKETS = 24  # Cubeta k: retraso < 2**k µs (la última acumula el resto)
+LATE_THRESHOLD = 0.0001  # Retraso a partir del cual un paso cuenta como tardío (s)
+MIN_PULSE_WIDTH = 0.000002  # Pulso más corto que el driver registra (s)
+SEGMENT_HISTORY = 1024  # Segmentos recientes con su peor retraso
+
+
+def wait_until(deadline, spin=SPIN_THRESHOLD, clock=time.monotonic):
+    remaining = deadline - clock()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while clock() < deadline:
+        pass
+
+
+def histogram_percentile(histogram, fraction):
+    # Límite superior (µs) de la cubeta que contiene el percentil
+    target = fraction * sum(histogram)
+    seen = 0
+    for k, count in enumerate(histogram):
+        seen += count
+        if count and seen >= target:
+            return 2 ** k
+    return 0
+
+
+def format_timing(s):
+    return (f"Step timing: {s['steps']:,} steps, p50 <{s['p50_us']} us, p99 <{s['p99_us']} us, "
+            f"worst {s['worst_us']:.0f} us, {s['late_steps']:,} late, "
+            f"{s['dropped_steps']:,} dropped, {s['underruns']:,} underruns")
+
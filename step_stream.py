@@ -0,0 +1,253 @@
+# Flujo de pasos compilado.
+#
+# Cada tic del generador es un registro de 5 bytes: el periodo en
+# microsegundos hasta el siguiente tic y un byte de banderas (qué ejes dan
+# paso, sentido de cada eje y antorcha). Los registros se escriben por
+# bloques a medida que se planifican los segmentos, y el archivo se abre con
+# mmap para ejecutarlo o analizarlo sin cargarlo entero.
+#
+# Detrás de los registros va un índice con una fila por segmento: dónde
+# empieza en el flujo, la posición en pasos al empezar, el punto al que
+# llega y las velocidades del planificador. Con él se busca en O(log n) el
+# segmento de un registro o de un punto, o la perforación más cercana, y un
+# trabajo detenido se reanuda sin planificar ni recorrer lo anterior.
+
+import os
+import struct
+
+import numpy as np
+
+from motion import STEP_X, STEP_Y
+
+DIR_X = 4
+DIR_Y = 8
+TORCH = 16
+END_OF_JOB = 32  # Registro sin pasos que cierra un trabajo (apaga la antorcha)
+
+RECORD = np.dtype([("interval", "<u4"), ("flags", "u1")])
+
+# Una fila por segmento más una final con el total de registros y la
+# posición al terminar; velocidades en cm/s
+INDEX = np.dtype([("offset", "<u8"), ("x", "<i8"), ("y", "<i8"), ("tag", "<i8"),
+                  ("v_entry", "<f8"), ("v_exit", "<f8"), ("flags", "u1")])
+SEGMENT_CUT = 1  # Se recorre con la antorcha encendida
+SEGMENT_PIERCE = 2  # Primer segmento cortado tras un vacío: perfora al empezar
+
+MAGIC = b"CNCSTEPS"
+VERSION = 2
+
+# magic, versión, pasos por cm, x inicial, y inicial, n tics, n segmentos,
+# n filas del índice
+_HEADER = struct.Struct("<8sIdqqQQQ")
+_DATA_OFFSET = 64
+
+
+def bresenham_bits(dx, dy):
+    # Un tic por paso del eje mayor con los ejes que avanzan en él (Bresenham
+    # con el error iniciado en la mitad), calculado de una vez con NumPy
+    ax, ay = abs(dx), abs(dy)
+    if ax >= ay:
+        major, minor, major_bit, minor_bit = ax, ay, STEP_X, STEP_Y
+    else:
+        major, minor, major_bit, minor_bit = ay, ax, STEP_Y, STEP_X
+    k = np.arange(major + 1, dtype=np.int64)
+    taken = np.maximum((k * minor - major // 2 + major - 1) // major, 0)
+    bits = np.full(major, major_bit, dtype=np.uint8)
+    bits[np.diff(taken) > 0] |= minor_bit
+    return bits
+
+
+def _direction_bits(steps, bit):
+    # Bit de sentido de cada tic de un arco: el del último paso dado en ese
+    # eje (antes del primero, el del primero), para no mover el pin de balde
+    moved = np.flatnonzero(steps)
+    if not len(moved):
+        return np.uint8(0)
+    last = np.maximum.accumulate(np.where(steps != 0, np.arange(len(steps)), moved[0]))
+    return np.where(steps[last] > 0, bit, 0).astype(np.uint8)
+
+
+def segment_records(segment, torch=False):
+    # Registros de un segmento planificado; en los arcos el sentido de cada
+    # eje cambia dentro del segmento
+    if segment.arc is not None:
+        sx, sy, _ = segment.steps
+        flags = np.where(sx != 0, STEP_X, 0).astype(np.uint8)
+        flags |= np.where(sy != 0, STEP_Y, 0).astype(np.uint8)
+        flags |= _direction_bits(sx, DIR_X) | _direction_bits(sy, DIR_Y)
+    else:
+        flags = bresenham_bits(segment.dx, segment.dy)
+        flags |= (DIR_X if segment.dx > 0 else 0) | (DIR_Y if segment.dy > 0 else 0)
+    if torch:
+        flags |= TORCH
+    records = np.empty(len(flags), dtype=RECORD)
+    records["flags"] = flags
+    records["interval"] = segment.step_periods_us()
+    return records
+
+
+def move_records(dx, dy, delay, torch=False):
+    # Movimiento a velocidad constante (semiperiodo `delay` en s), p. ej. manual
+    flags = bresenham_bits(dx, dy)
+    flags |= (DIR_X if dx > 0 else 0) | (DIR_Y if dy > 0 else 0)
+    if torch:
+        flags |= TORCH
+    records = np.empty(len(flags), dtype=RECORD)
+    records["flags"] = flags
+    records["interval"] = round(2 * delay * 1e6)
+    return records
+
+
+def end_record():
+    record = np.zeros(1, dtype=RECORD)
+    record["flags"] = END_OF_JOB
+    return record
+
+
+class StepIndexBuilder:
+    # Acumula las filas del índice a medida que se escriben los segmentos
+    def __init__(self, start=(0, 0)):
+        self.x, self.y = start
+        self._rows = []
+        self._torch = False
+
+    def add(self, segment, records, offset):
+        # `offset`: registros del flujo antes de este segmento
+        torch = bool(len(records) and records["flags"][0] & TORCH)
+        flags = 0
+        if torch:
+            flags = SEGMENT_CUT if self._torch else SEGMENT_CUT | SEGMENT_PIERCE
+        self._rows.append((offset, self.x, self.y, segment.index, segment.v_entry, segment.v_exit,
+                           flags))
+        self.x += segment.dx
+        self.y += segment.dy
+        self._torch = torch
+
+    def build(self, ticks):
+        rows = np.array(self._rows + [(ticks, self.x, self.y, -1, 0.0, 0.0, 0)], dtype=INDEX)
+        return StepIndex(rows)
+
+
+class StepIndex:
+    def __init__(self, rows):
+        self.rows = rows
+        self._pierces = None
+
+    def __len__(self):
+        return len(self.rows) - 1
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes
+
+    def span(self, segment):
+        # (primer registro, registro siguiente al último) del segmento
+        return int(self.rows["offset"][segment]), int(self.rows["offset"][segment + 1])
+
+    def start(self, segment):
+        row = self.rows[segment]
+        return int(row["x"]), int(row["y"])
+
+    def delta(self, segment):
+        first, last = self.rows[segment], self.rows[segment + 1]
+        return int(last["x"] - first["x"]), int(last["y"] - first["y"])
+
+    def segment_at(self, record):
+        # Segmento que contiene el registro `record`
+        offsets = self.rows["offset"][:-1]
+        return max(int(np.searchsorted(offsets, record, side="right")) - 1, 0)
+
+    def segment_after(self, tag):
+        # Primer segmento que termina más allá del punto `tag` (len si ninguno)
+        return int(np.searchsorted(self.rows["tag"][:-1], tag, side="right"))
+
+    def find(self, tag):
+        # Segmento que termina exactamente en el punto `tag`, o None
+        segment = int(np.searchsorted(self.rows["tag"][:-1], tag))
+        if segment < len(self) and self.rows["tag"][segment] == tag:
+            return segment
+        return None
+
+    def pierce_before(self, segment):
+        # Perforación del contorno al que pertenece `segment` (la primera si
+        # todavía no se había perforado nada)
+        if self._pierces is None:
+            self._pierces = np.flatnonzero(self.rows["flags"][:-1] & SEGMENT_PIERCE)
+        if not len(self._pierces):
+            return 0
+        i = int(np.searchsorted(self._pierces, segment, side="right")) - 1
+        return int(self._pierces[max(i, 0)])
+
+
+class StepStreamWriter:
+    def __init__(self, file_name, steps_per_cm, start=(0, 0)):
+        self.file_name = file_name
+        self.steps_per_cm = steps_per_cm
+        self.start = start
+        self.ticks = 0
+        self.segments = 0
+        self.index = StepIndexBuilder(start)
+        self._file = open(file_name, "wb")
+        self._file.write(b"\0" * _DATA_OFFSET)
+
+    def write(self, records, segment=None):
+        # Con `segment` (el PlannedSegment de los registros) se indexa el bloque
+        if segment is not None:
+            self.index.add(segment, records, self.ticks)
+        self._file.write(records.tobytes())
+        self.ticks += len(records)
+        self.segments += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        rows = self.index.build(self.ticks).rows
+        self._file.write(rows.tobytes())
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, self.steps_per_cm, self.start[0],
+                                      self.start[1], self.ticks, self.segments, len(rows)))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StepStream:
+    def __init__(self, records, steps_per_cm, start=(0, 0), segments=0, index=None):
+        self.records = records
+        self.steps_per_cm = steps_per_cm
+        self.start = start
+        self.segments = segments
+        self.index = index  # StepIndex, si los bloques se escribieron con su segmento
+
+    @classmethod
+    def open(cls, file_name):
+        with open(file_name, "rb") as f:
+            raw = f.read(_HEADER.size)
+        if len(raw) < _HEADER.size:
+            raise ValueError(f"Archivo de pasos truncado: {file_name}")
+        magic, version, steps_per_cm, x, y, ticks, segments, rows = _HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Formato de pasos no reconocido: {file_name}")
+        index_offset = _DATA_OFFSET + ticks * RECORD.itemsize
+        if os.path.getsize(file_name) != index_offset + rows * INDEX.itemsize:
+            raise ValueError(f"Archivo de pasos truncado: {file_name}")
+        if ticks:
+            records = np.memmap(file_name, dtype=RECORD, mode="r", offset=_DATA_OFFSET, shape=(ticks,))
+        else:
+            records = np.zeros(0, dtype=RECORD)
+        index = None
+        if rows > 1:
+            index = StepIndex(np.memmap(file_name, dtype=INDEX, mode="r", offset=index_offset,
+                                        shape=(rows,)))
+        return cls(records, steps_per_cm, (x, y), segments, index)
+
+    def duration(self):
+        return float(self.records["interval"].sum(dtype=np.uint64)) / 1e6
+
+    def step_counts(self):
+        flags = self.records["flags"]
+        return int(np.count_nonzero(flags & STEP_X)), int(np.count_nonzero(flags & STEP_Y))
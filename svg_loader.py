@@ -0,0 +1,167 @@
+# Lectura de SVG en una sola pasada.
+#
+# Un único recorrido con iterparse lee las dimensiones del encabezado, los
+# atributos d de cada <path> y las transformaciones acumuladas de los grupos.
+# Cada camino se aplana en cuanto se lee y el elemento XML se libera, de modo
+# que la memoria queda acotada por los contornos y no por el DOM. El mismo
+# resultado alimenta la verificación de límites, la vista previa y la
+# trayectoria.
+
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+import affine
+from svg_path import FLATTEN_TOLERANCE, flatten_subpaths, iter_subpaths
+
+# Centímetros por unidad (CSS: 96 px por pulgada)
+UNITS = {"cm": 1.0, "mm": 0.1, "in": 2.54, "pt": 2.54 / 72, "pc": 2.54 / 6, "px": 2.54 / 96}
+
+# Segmentos acumulados antes de aplanar en lote varios caminos a la vez
+BATCH_SEGMENTS = 4096
+FIRST_BATCH_SEGMENTS = 64  # Primer lote; crece al doble hasta BATCH_SEGMENTS
+
+# Contenedores cuyo contenido no se dibuja directamente
+NOT_RENDERED = {"defs", "clipPath", "mask", "marker", "pattern", "symbol"}
+
+_LENGTH = re.compile(r"\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*([a-z]*)\s*$")
+
+
+def parse_length(text):
+    # Longitud SVG en cm; sin unidad se toma como cm. None si no se entiende
+    if not text:
+        return None
+    match = _LENGTH.match(text)
+    if match is None:
+        return None
+    value, unit = match.groups()
+    if unit and unit not in UNITS:
+        return None
+    return float(value) * UNITS.get(unit, 1.0)
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+class SvgDocument:
+    def __init__(self, file_name=None):
+        self.file_name = file_name
+        self.width = None  # cm, del encabezado
+        self.height = None
+        self.view_box = None
+        self.paths = []  # Por cada <path>, su lista de contornos (n×2, cm)
+
+    @property
+    def contours(self):
+        return [contour for path in self.paths for contour in path]
+
+    def bounds(self):
+        # (min_x, min_y, max_x, max_y) de todos los contornos, o None
+        contours = self.contours
+        if not contours:
+            return None
+        points = np.concatenate(contours)
+        low, high = points.min(axis=0), points.max(axis=0)
+        return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+    def fits(self, width, height):
+        if self.width is not None and self.height is not None:
+            return self.width <= width and self.height <= height
+        bounds = self.bounds()
+        return bounds is None or (bounds[0] >= 0 and bounds[1] >= 0
+                                  and bounds[2] <= width and bounds[3] <= height)
+
+
+def _root_transform(document, root):
+    # viewBox → cm cuando el encabezado da un tamaño físico
+    view_box = root.get("viewBox")
+    if not view_box:
+        return affine.identity()
+    try:
+        x, y, w, h = (float(v) for v in re.split(r"[\s,]+", view_box.strip()))
+    except ValueError:
+        return affine.identity()
+    document.view_box = (x, y, w, h)
+    if w <= 0 or h <= 0 or document.width is None or document.height is None:
+        return affine.translate(-x, -y)
+    return affine.scale(document.width / w, document.height / h) @ affine.translate(-x, -y)
+
+
+def iter_svg_paths(source, document):
+    # Rellena el encabezado de `document` y entrega, por cada <path>,
+    # (subcaminos, transformación acumulada, estiramiento) sin aplanar
+    stack = []  # (transformación acumulada, estiramiento, elemento)
+    hidden = 0  # Profundidad dentro de <defs> y similares
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        tag = _local(element.tag)
+        if event == "start":
+            if not stack:
+                if tag == "svg":
+                    document.width = parse_length(element.get("width"))
+                    document.height = parse_length(element.get("height"))
+                    base = _root_transform(document, element)
+                else:
+                    base = affine.identity()
+                stretch = affine.max_scale(base)
+            else:
+                base, stretch, _ = stack[-1]
+            local = element.get("transform")
+            if local:
+                base = base @ affine.parse_transform(local)
+                stretch = affine.max_scale(base)
+            stack.append((base, stretch, element))
+            if tag in NOT_RENDERED:
+                hidden += 1
+            elif tag == "path" and not hidden:
+                yield list(iter_subpaths(element.get("d") or "")), base, stretch
+        else:
+            stack.pop()
+            if tag in NOT_RENDERED:
+                hidden -= 1
+            # Libera el subárbol ya procesado
+            element.clear()
+            if stack:
+                stack[-1][2].remove(element)
+
+
+def iter_svg(source, document, tolerance=FLATTEN_TOLERANCE):
+    # Entrega los contornos de cada <path>, en orden, a medida que se leen y
+    # se aplanan por lotes. Los primeros lotes son pequeños para que los
+    # primeros contornos lleguen enseguida
+    pending = []  # (subcaminos, transformación, estiramiento) aún sin aplanar
+    pending_segments = 0
+    limit = FIRST_BATCH_SEGMENTS
+    for path in iter_svg_paths(source, document):
+        pending.append(path)
+        pending_segments += sum(len(sp.segments) for sp in path[0])
+        if pending_segments >= limit:
+            yield from flatten_paths(pending, tolerance)
+            pending = []
+            pending_segments = 0
+            limit = min(2 * limit, BATCH_SEGMENTS)
+    yield from flatten_paths(pending, tolerance)
+
+
+def flatten_paths(paths, tolerance):
+    # Aplana juntos varios caminos de iter_svg_paths: cada uno en sus
+    # coordenadas locales con la tolerancia ajustada a su escala, y luego se
+    # transforma
+    subpaths, limits = [], []
+    for path_subpaths, _, stretch in paths:
+        subpaths.extend(path_subpaths)
+        limits.extend([tolerance / (stretch or 1.0)] * len(path_subpaths))
+    contours = iter(flatten_subpaths(subpaths, limits))
+    for path_subpaths, m, _ in paths:
+        path = [next(contours) for _ in path_subpaths]
+        if not affine.is_identity(m):
+            path = [affine.apply(m, contour) for contour in path]
+        yield path
+
+
+def read_svg(source, tolerance=FLATTEN_TOLERANCE):
+    document = SvgDocument(source if isinstance(source, str) else None)
+    for contours in iter_svg(source, document, tolerance):
+        document.paths.append(contours)
+    return document
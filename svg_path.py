@@ -0,0 +1,314 @@
+# Gramática completa de <path d="..."> y aplanado adaptativo de curvas.
+#
+# El tokenizador lee el atributo d sin partirlo de antemano (números como
+# "1e-3", ".5.5" o banderas de arco pegadas "011"). Las curvas de Bézier
+# cúbicas y cuadráticas y los arcos elípticos se subdividen de forma
+# adaptativa contra una tolerancia de error de cuerda en cm, evaluando todas
+# las curvas de un camino en lote con NumPy.
+
+import math
+import re
+
+import numpy as np
+
+FLATTEN_TOLERANCE = 0.01  # Error de cuerda máximo en cm
+MAX_DEPTH = 16  # Subdivisiones máximas por curva
+
+_COMMAND = re.compile(r"[\s,]*([MmZzLlHhVvCcSsQqTtAa])")
+_NUMBER = re.compile(r"[\s,]*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)")
+_FLAG = re.compile(r"[\s,]*([01])")
+_END = re.compile(r"[\s,]*$")
+
+
+class _Tokens:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def _match(self, pattern):
+        match = pattern.match(self.data, self.pos)
+        if match is None:
+            return None
+        self.pos = match.end()
+        return match.group(1)
+
+    def command(self):
+        return self._match(_COMMAND)
+
+    def number(self):
+        value = self._match(_NUMBER)
+        if value is None:
+            raise ValueError(f"Número esperado en la posición {self.pos}")
+        return float(value)
+
+    def flag(self):
+        value = self._match(_FLAG)
+        if value is None:
+            raise ValueError(f"Bandera de arco esperada en la posición {self.pos}")
+        return value == "1"
+
+    def has_number(self):
+        return _NUMBER.match(self.data, self.pos) is not None
+
+    def at_end(self):
+        return _END.match(self.data, self.pos) is not None
+
+
+class Subpath:
+    # Segmentos: ("L", fin), ("Q", control, fin), ("C", c1, c2, fin),
+    # ("A", (rx, ry, rotación, arco_grande, barrido), fin); cada uno empieza
+    # donde terminó el anterior
+    __slots__ = ("start", "segments", "closed")
+
+    def __init__(self, start):
+        self.start = start
+        self.segments = []
+        self.closed = False
+
+
+def iter_subpaths(data):
+    tokens = _Tokens(data)
+    current = start = (0.0, 0.0)
+    subpath = None
+    command = None
+    last = None  # Último segmento, para reflejar el control en S y T
+    while not tokens.at_end():
+        letter = tokens.command()
+        if letter is None:
+            # Repetición implícita del comando anterior
+            if command is None or command in "Zz" or not tokens.has_number():
+                break
+            letter = command
+        elif letter not in "Zz" and not tokens.has_number():
+            break
+        relative = letter.islower()
+        kind = letter.upper()
+        ox, oy = current if relative else (0.0, 0.0)
+        try:
+            if kind == "M":
+                if subpath is not None and subpath.segments:
+                    yield subpath
+                current = start = (ox + tokens.number(), oy + tokens.number())
+                subpath = Subpath(start)
+                command = "l" if relative else "L"
+                last = None
+                continue
+            if subpath is None:
+                subpath = Subpath(current)
+            if kind == "Z":
+                subpath.closed = True
+                if current != start:
+                    subpath.segments.append(("L", start))
+                if subpath.segments:
+                    yield subpath
+                subpath = None
+                current = start
+                command = letter
+                last = None
+                continue
+            if kind == "L":
+                segment = ("L", (ox + tokens.number(), oy + tokens.number()))
+            elif kind == "H":
+                segment = ("L", (ox + tokens.number(), current[1]))
+            elif kind == "V":
+                segment = ("L", (current[0], oy + tokens.number()))
+            elif kind == "C":
+                c1 = (ox + tokens.number(), oy + tokens.number())
+                c2 = (ox + tokens.number(), oy + tokens.number())
+                segment = ("C", c1, c2, (ox + tokens.number(), oy + tokens.number()))
+            elif kind == "S":
+                c1 = _reflect(last, "C", current)
+                c2 = (ox + tokens.number(), oy + tokens.number())
+                segment = ("C", c1, c2, (ox + tokens.number(), oy + tokens.number()))
+            elif kind == "Q":
+                c = (ox + tokens.number(), oy + tokens.number())
+                segment = ("Q", c, (ox + tokens.number(), oy + tokens.number()))
+            elif kind == "T":
+                c = _reflect(last, "Q", current)
+                segment = ("Q", c, (ox + tokens.number(), oy + tokens.number()))
+            else:
+                rx, ry, rotation = tokens.number(), tokens.number(), tokens.number()
+                large, sweep = tokens.flag(), tokens.flag()
+                segment = ("A", (rx, ry, rotation, large, sweep),
+                           (ox + tokens.number(), oy + tokens.number()))
+        except ValueError:
+            # Datos mal formados: como indica SVG, se conserva lo leído hasta el error
+            break
+        subpath.segments.append(segment)
+        current = segment[-1]
+        command = letter
+        last = (segment, current)
+    if subpath is not None and subpath.segments:
+        yield subpath
+
+
+def _reflect(last, kind, current):
+    if last is None or last[0][0] != kind:
+        return current
+    control = last[0][-2]
+    return (2 * current[0] - control[0], 2 * current[1] - control[1])
+
+
+def _arc_center(p0, params, p1):
+    # Conversión de parámetros de extremo a centro (SVG 1.1, apéndice F.6.5)
+    rx, ry, rotation, large, sweep = params
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0 or p0 == p1:
+        return None
+    phi = math.radians(rotation % 360)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    hx, hy = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1 = cos_phi * hx + sin_phi * hy
+    y1 = -sin_phi * hx + cos_phi * hy
+    scale = x1 * x1 / (rx * rx) + y1 * y1 / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    num = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    den = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    coef = math.sqrt(max(num, 0.0) / den)
+    if large == sweep:
+        coef = -coef
+    cx1, cy1 = coef * rx * y1 / ry, -coef * ry * x1 / rx
+    cx = cos_phi * cx1 - sin_phi * cy1 + (p0[0] + p1[0]) / 2
+    cy = sin_phi * cx1 + cos_phi * cy1 + (p0[1] + p1[1]) / 2
+    theta0 = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    theta1 = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx)
+    dtheta = theta1 - theta0
+    if sweep and dtheta < 0:
+        dtheta += 2 * math.pi
+    elif not sweep and dtheta > 0:
+        dtheta -= 2 * math.pi
+    return (cx, cy, rx, ry, cos_phi, sin_phi, theta0, dtheta)
+
+
+def _eval_cubic(ctrl):
+    def evaluate(ids, t):
+        p = ctrl[ids]
+        t = t[:, None]
+        mt = 1 - t
+        return (mt * mt * mt * p[:, 0] + 3 * mt * mt * t * p[:, 1]
+                + 3 * mt * t * t * p[:, 2] + t * t * t * p[:, 3])
+    return evaluate
+
+
+def _eval_arc(params):
+    cx, cy, rx, ry, cos_phi, sin_phi, theta0, dtheta = params.T
+
+    def evaluate(ids, t):
+        theta = theta0[ids] + t * dtheta[ids]
+        ex, ey = rx[ids] * np.cos(theta), ry[ids] * np.sin(theta)
+        return np.column_stack((cx[ids] + ex * cos_phi[ids] - ey * sin_phi[ids],
+                                cy[ids] + ex * sin_phi[ids] + ey * cos_phi[ids]))
+    return evaluate
+
+
+def _chord_error(points, a, b):
+    # Distancia de cada muestra a la cuerda a-b
+    chord = b - a
+    length = np.hypot(chord[:, 0], chord[:, 1])
+    rel = points - a
+    cross = np.abs(chord[:, 0] * rel[:, 1] - chord[:, 1] * rel[:, 0])
+    safe = np.where(length > 0, length, 1.0)
+    return np.where(length > 0, cross / safe, np.hypot(rel[:, 0], rel[:, 1]))
+
+
+def flatten_batch(evaluate, initial, tolerance, max_depth=MAX_DEPTH):
+    # Subdivide a la vez todas las curvas de un lote; devuelve, por curva,
+    # los puntos de t en (0, 1] (el punto inicial ya lo conoce quien llama).
+    # tolerance: un valor o uno por curva
+    initial = np.asarray(initial, dtype=np.int64)
+    count = len(initial)
+    if count == 0:
+        return []
+    tolerance = np.broadcast_to(np.asarray(tolerance, dtype=float), (count,))
+    ids = np.repeat(np.arange(count), initial)
+    offset = np.arange(len(ids)) - np.repeat(np.cumsum(initial) - initial, initial)
+    a = offset / initial[ids]
+    b = (offset + 1) / initial[ids]
+    done_ids, done_t = [], []
+    for depth in range(max_depth + 1):
+        pa, pb = evaluate(ids, a), evaluate(ids, b)
+        span = b - a
+        error = np.zeros(len(ids))
+        for fraction in (0.25, 0.5, 0.75):
+            error = np.maximum(error, _chord_error(evaluate(ids, a + span * fraction), pa, pb))
+        ok = error <= tolerance[ids] if depth < max_depth else np.ones(len(ids), dtype=bool)
+        done_ids.append(ids[ok])
+        done_t.append(b[ok])
+        if ok.all():
+            break
+        ids, a, b = ids[~ok], a[~ok], b[~ok]
+        mid = (a + b) / 2
+        ids = np.concatenate((ids, ids))
+        a, b = np.concatenate((a, mid)), np.concatenate((mid, b))
+    ids = np.concatenate(done_ids)
+    t = np.concatenate(done_t)
+    order = np.lexsort((t, ids))
+    ids, t = ids[order], t[order]
+    points = evaluate(ids, t)
+    counts = np.bincount(ids, minlength=count)
+    return np.split(points, np.cumsum(counts)[:-1])
+
+
+def flatten_subpaths(subpaths, tolerance=FLATTEN_TOLERANCE):
+    # Un contorno (arreglo n×2) por subcamino; las curvas se aplanan en lote.
+    # tolerance: un valor o uno por subcamino
+    subpaths = list(subpaths)
+    tolerances = np.broadcast_to(np.asarray(tolerance, dtype=float), (len(subpaths),)).tolist()
+    cubics, arcs, valid_arcs = [], [], []
+    cubic_tolerance, arc_tolerance = [], []
+    for subpath, limit in zip(subpaths, tolerances):
+        current = subpath.start
+        for segment in subpath.segments:
+            kind = segment[0]
+            if kind == "C":
+                cubics.append((current, segment[1], segment[2], segment[3]))
+                cubic_tolerance.append(limit)
+            elif kind == "Q":
+                c = segment[1]
+                end = segment[2]
+                c1 = (current[0] + 2 / 3 * (c[0] - current[0]), current[1] + 2 / 3 * (c[1] - current[1]))
+                c2 = (end[0] + 2 / 3 * (c[0] - end[0]), end[1] + 2 / 3 * (c[1] - end[1]))
+                cubics.append((current, c1, c2, end))
+                cubic_tolerance.append(limit)
+            elif kind == "A":
+                center = _arc_center(current, segment[1], segment[2])
+                valid_arcs.append(center is not None)
+                if center is not None:
+                    arcs.append(center)
+                    arc_tolerance.append(limit)
+            current = segment[-1]
+
+    cubic_points = iter(())
+    if cubics:
+        ctrl = np.array(cubics, dtype=float)
+        cubic_points = iter(flatten_batch(_eval_cubic(ctrl), np.full(len(cubics), 2), cubic_tolerance))
+    arc_points = iter(())
+    if arcs:
+        params = np.array(arcs, dtype=float)
+        initial = np.maximum(np.ceil(np.abs(params[:, 7]) / (math.pi / 2)), 1)
+        arc_points = iter(flatten_batch(_eval_arc(params), initial, arc_tolerance))
+
+    valid_arcs = iter(valid_arcs)
+    contours = []
+    for subpath in subpaths:
+        parts = [np.array([subpath.start], dtype=float)]
+        for segment in subpath.segments:
+            kind = segment[0]
+            if kind in "CQ":
+                parts.append(next(cubic_points))
+            elif kind == "A" and next(valid_arcs):
+                parts.append(next(arc_points))
+            else:
+                # Líneas y arcos degenerados (radio cero) van en línea recta
+                parts.append(np.array([segment[-1]], dtype=float))
+        contour = np.concatenate(parts)
+        if subpath.closed:
+            # Cierre exacto aunque la última curva termine con error de redondeo
+            contour[-1] = subpath.start
+        contours.append(contour)
+    return contours
+
+
+def flatten_path(data, tolerance=FLATTEN_TOLERANCE):
+    return flatten_subpaths(iter_subpaths(data), tolerance)
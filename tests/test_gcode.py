@@ -0,0 +1,13 @@
+# Pruebas de la lectura de programas G-code.
+
+from gcode import iter_load_gcode
+
+
+def test_consecutive_rapids_make_one_travel(tmp_path):
+    # Varios G0 seguidos son un solo recorrido en vacío: ningún contorno de un punto
+    program = tmp_path / "rapids.gcode"
+    program.write_text("G21 G90\nG0 X10 Y10\nG0 X50 Y10\nG0 X100 Y100\nM3\nG1 X200 Y100\n"
+                       "G1 X200 Y200\nM5\nG0 X300 Y300\nG0 X0 Y0\n")
+    toolpath = [value for kind, value, _ in iter_load_gcode(str(program)) if kind == "toolpath"][0]
+    assert len(toolpath) == 1
+    assert toolpath.contour(0).tolist() == [[10, 10], [20, 10], [20, 20]]
@@ -0,0 +1,46 @@
+# Pruebas del proceso de movimiento contra el backend de grabación.
+
+import time
+
+import pytest
+
+from motion_process import IDLE, MotionProcess
+from step_stream import move_records
+
+
+@pytest.fixture
+def motion():
+    motion = MotionProcess((6, 13), (16, 20), backend="recorder", stats=True)
+    motion.start()
+    yield motion
+    motion.shutdown()
+
+
+def drain(motion, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while motion.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert motion.wait_state((IDLE,), 1.0)
+
+
+def test_segment_timing_keyed_by_tag(motion):
+    for tag in range(5):
+        motion.write(move_records(20, 10, 0.0002), (20, 10), tag)
+    motion.finish()
+    motion.run()
+    drain(motion)
+    timing = motion.timing()
+    assert [tag for tag, _ in timing["segments"]] == list(range(5))
+    assert max(worst for _, worst in timing["segments"]) <= timing["worst_us"]
+    assert timing["steps"] == 100
+    assert motion.position() == (100, 50)
+
+
+def test_finished_stream_is_not_an_underrun(motion):
+    # Un flujo cerrado con finish() que se vacía termina el trabajo, no falta de datos
+    motion.run()
+    motion.write(move_records(30, -10, 0.0002), (30, -10))
+    motion.finish()
+    drain(motion)
+    assert motion.timing()["underruns"] == 0
+    assert motion.position() == (30, -10)
@@ -0,0 +1,23 @@
+# Pruebas del anidado de piezas.
+
+import numpy as np
+
+from nesting import Part, iter_nest
+
+
+def square(side):
+    return np.array([(0, 0), (side, 0), (side, side), (0, side), (0, 0)], dtype=np.float64)
+
+
+def test_budget_shorter_than_first_layout():
+    # Con más copias de las que caben en el plazo, las secuencias cortadas por
+    # el plazo terminan antes que la primera; el resultado es la primera
+    parts = [Part(f"square{i}", [square(2 + i % 3)], quantity=15) for i in range(10)]
+    result = None
+    for kind, value, _ in iter_nest(parts, time_budget=0.3, workers=2, optimize=False):
+        if kind == "nest":
+            result = value
+    assert result is not None
+    assert result.placed > 0
+    assert result.placed + sum(result.unplaced.values()) == 150
+    assert len(result.toolpath) == result.placed
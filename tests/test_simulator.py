@@ -0,0 +1,51 @@
+# Pruebas de la máquina simulada.
+
+import math
+import random
+
+import numpy as np
+
+from cnc_core import JobReport, JobSettings, plan_gcode
+from simulator import simulate_toolpath
+from step_stream import TORCH
+from toolpath import Toolpath
+
+
+def peak_rates(contours, settings):
+    toolpath = Toolpath.from_contours(contours, 0.01, *settings.work_area)
+    for kind, machine, _ in simulate_toolpath(toolpath, settings, trace_interval=None):
+        if kind == "simulation":
+            return machine.peak_rate_x, machine.peak_rate_y
+
+
+def test_fitted_arcs_stay_within_axis_speed():
+    # Los arcos reconocidos en polilíneas no pasan del límite de cada eje,
+    # tampoco en el último tic, que llega al punto final fuera de la circunferencia
+    settings = JobSettings()
+    rng = random.Random(3)
+    contours = []
+    for _ in range(60):
+        r = rng.uniform(0.3, 15)
+        cx, cy = rng.uniform(16, 60), rng.uniform(16, 28)
+        a0 = rng.uniform(0, 2 * math.pi)
+        a = np.linspace(a0, a0 + rng.uniform(0.5, 2 * math.pi), rng.randint(8, 150))
+        contours.append(np.column_stack((cx + r * np.cos(a), cy + r * np.sin(a))))
+    limits = [v * settings.steps_per_cm for v in settings.limits.max_velocity]
+    rate_x, rate_y = peak_rates(contours, settings)
+    assert rate_x <= limits[0] * 1.001
+    assert rate_y <= limits[1] * 1.001
+
+
+def test_machine_stops_where_the_torch_changes(tmp_path):
+    # Un recorrido en vacío alineado con el corte que le sigue no entra al
+    # corte con velocidad: la antorcha se enciende con la máquina detenida
+    program = tmp_path / "line.gcode"
+    program.write_text("G21 G90\nG0 X100 Y100\nG0 X200 Y100\nM3\nG1 X400 Y100 F6000\n"
+                       "G1 X500 Y100\nM5\nG0 X600 Y100\n")
+    segments = [(segment, bool(records["flags"][0] & TORCH))
+                for segment, records in plan_gcode(str(program), JobSettings(), JobReport(None))]
+    for (before, torch_before), (after, torch_after) in zip(segments, segments[1:]):
+        if torch_before != torch_after:
+            assert before.v_exit == 0.0
+            assert after.v_entry == 0.0
+    assert any(segment.v_exit > 0 for segment, _ in segments)
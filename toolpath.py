@@ -0,0 +1,290 @@
+# Trayectoria compilada y su caché en disco.
+#
+# Los contornos aplanados se guardan como arreglos contiguos (puntos float32
+# n×2 y desplazamientos int32 por contorno) detrás de un encabezado pequeño
+# con unidades, límites, tamaño declarado y tolerancia usada. El archivo se
+# abre con mmap sin copiar nada, y la caché lo indexa por el hash del SVG y
+# los parámetros de aplanado, con expulsión por tamaño. Opcionalmente los
+# contornos se simplifican (RDP) y se guardan ya en el orden de corte
+# optimizado.
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+import affine
+from cut_order import order_contours
+from simplify import simplify_contours
+from svg_loader import SvgDocument, iter_svg
+
+MAGIC = b"CNCTPATH"
+VERSION = 3
+UNITS_CM = 0
+
+# magic, versión, unidades, tolerancia, límites (4), ancho, alto,
+# recorrido en vacío antes y después de ordenar, puntos quitados al
+# simplificar, n puntos, n contornos
+_HEADER = struct.Struct("<8sIIdddddddddQQQ")
+_DATA_OFFSET = 128  # Inicio de los arreglos, alineado
+
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "cnc-plasma")
+
+
+class Toolpath:
+    def __init__(self, points, offsets, tolerance, width=None, height=None):
+        self.points = points  # float32 n×2 (cm)
+        self.offsets = offsets  # int32, n contornos + 1
+        self.tolerance = tolerance
+        self.width = width  # Tamaño declarado en el SVG (cm) o None
+        self.height = height
+        self.rapid_before = None  # Recorrido en vacío (cm) si se optimizó el orden
+        self.rapid_after = None
+        self.removed_points = 0  # Puntos quitados por la simplificación
+        if len(points):
+            low, high = points.min(axis=0), points.max(axis=0)
+            self.bounds = (float(low[0]), float(low[1]), float(high[0]), float(high[1]))
+        else:
+            self.bounds = None
+
+    @classmethod
+    def from_contours(cls, contours, tolerance, width=None, height=None):
+        contours = list(contours)
+        sizes = [len(c) for c in contours]
+        offsets = np.zeros(len(contours) + 1, dtype=np.int32)
+        np.cumsum(sizes, out=offsets[1:])
+        if contours:
+            points = np.ascontiguousarray(np.concatenate(contours), dtype=np.float32)
+        else:
+            points = np.zeros((0, 2), dtype=np.float32)
+        return cls(points, offsets, tolerance, width, height)
+
+    @classmethod
+    def from_document(cls, document, tolerance):
+        return cls.from_contours(document.contours, tolerance, document.width, document.height)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def contour(self, index):
+        return self.points[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def contours(self):
+        return [self.contour(i) for i in range(len(self))]
+
+    def iter_points(self, start=0, chunk=4096):
+        return iter_points(self.points, start, chunk)
+
+    def transformed(self, m):
+        # Copia con la matriz afín aplicada a todos los puntos de una vez; los
+        # contornos y su orden no cambian. El tamaño declarado deja de valer:
+        # la comprobación del área usa los límites nuevos
+        points = affine.apply(m, np.asarray(self.points, dtype=np.float64)).astype(np.float32)
+        toolpath = Toolpath(points, self.offsets, self.tolerance)
+        toolpath.removed_points = self.removed_points
+        return toolpath
+
+    def fits(self, width, height):
+        if self.width is not None and self.height is not None:
+            return self.width <= width and self.height <= height
+        bounds = self.bounds
+        return bounds is None or (bounds[0] >= 0 and bounds[1] >= 0
+                                  and bounds[2] <= width and bounds[3] <= height)
+
+    def save(self, file_name):
+        # Escritura atómica: nunca queda un archivo a medias en la caché
+        bounds = self.bounds or (0.0, 0.0, 0.0, 0.0)
+        header = _HEADER.pack(
+            MAGIC, VERSION, UNITS_CM, self.tolerance, *bounds,
+            _nan(self.width), _nan(self.height), _nan(self.rapid_before), _nan(self.rapid_after),
+            self.removed_points, len(self.points), len(self),
+        )
+        directory = os.path.dirname(os.path.abspath(file_name))
+        fd, temp_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header.ljust(_DATA_OFFSET, b"\0"))
+                f.write(np.ascontiguousarray(self.points, dtype="<f4").tobytes())
+                f.write(np.ascontiguousarray(self.offsets, dtype="<i4").tobytes())
+            os.replace(temp_name, file_name)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+    @classmethod
+    def open(cls, file_name):
+        # Arreglos mapeados en memoria directamente sobre el archivo
+        with open(file_name, "rb") as f:
+            raw = f.read(_HEADER.size)
+        if len(raw) < _HEADER.size:
+            raise ValueError(f"Archivo de trayectoria truncado: {file_name}")
+        (magic, version, units, tolerance, min_x, min_y, max_x, max_y,
+         width, height, rapid_before, rapid_after, removed, n_points, n_contours) = _HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION or units != UNITS_CM:
+            raise ValueError(f"Formato de trayectoria no reconocido: {file_name}")
+        expected = _DATA_OFFSET + n_points * 8 + (n_contours + 1) * 4
+        if os.path.getsize(file_name) != expected:
+            raise ValueError(f"Archivo de trayectoria truncado: {file_name}")
+        if n_points:
+            points = np.memmap(file_name, dtype="<f4", mode="r", offset=_DATA_OFFSET, shape=(n_points, 2))
+        else:
+            points = np.zeros((0, 2), dtype=np.float32)
+        offsets = np.memmap(file_name, dtype="<i4", mode="r", offset=_DATA_OFFSET + n_points * 8,
+                            shape=(n_contours + 1,))
+        toolpath = cls.__new__(cls)
+        toolpath.points = points
+        toolpath.offsets = offsets
+        toolpath.tolerance = tolerance
+        toolpath.width = _none(width)
+        toolpath.height = _none(height)
+        toolpath.rapid_before = _none(rapid_before)
+        toolpath.rapid_after = _none(rapid_after)
+        toolpath.removed_points = removed
+        toolpath.bounds = (min_x, min_y, max_x, max_y) if n_points else None
+        return toolpath
+
+
+def iter_points(points, start=0, chunk=4096):
+    # Recorre un arreglo n×2 (también mapeado) por bloques, sin copiarlo entero
+    for first in range(start, len(points), chunk):
+        yield from points[first:first + chunk].tolist()
+
+
+def _nan(value):
+    return float("nan") if value is None else value
+
+
+def _none(value):
+    return None if np.isnan(value) else value
+
+
+def cache_key(file_name, **settings):
+    # Hash del contenido del SVG más los parámetros que cambian el resultado
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    settings["format"] = VERSION
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ToolpathCache:
+    def __init__(self, directory=None, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".ctp")
+
+    def get(self, key):
+        file_name = self._path(key)
+        try:
+            toolpath = Toolpath.open(file_name)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error):
+            # Entrada dañada: se descarta y se recompila
+            self._remove(file_name)
+            return None
+        try:
+            os.utime(file_name)  # Uso reciente, para la expulsión
+        except OSError:
+            pass  # Otro proceso la expulsó: el mapeo abierto sigue siendo válido
+        return toolpath
+
+    def put(self, key, toolpath):
+        file_name = self._path(key)
+        toolpath.save(file_name)
+        self.evict(keep=file_name)
+
+    def evict(self, keep=None):
+        # Expulsa las entradas menos usadas hasta quedar bajo max_bytes
+        # Otros procesos usan la misma caché: una entrada puede desaparecer
+        # en cualquier momento y entonces simplemente no cuenta
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".ctp") and entry.path != keep:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            try:
+                total += os.path.getsize(keep)
+            except OSError:
+                pass
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, file_name):
+        try:
+            os.unlink(file_name)
+        except OSError:
+            pass
+
+
+def iter_load_toolpath(file_name, tolerance, cache=None, optimize=False, simplify=0.0,
+                       merge_collinear=False):
+    # Igual que load_toolpath, pero entrega el avance mientras trabaja:
+    #   ("contours", contornos de un <path>, fracción leída del archivo)
+    #   ("status", descripción de la etapa, fracción)
+    #   ("toolpath", trayectoria terminada, 1.0)
+    # Para cancelar basta con dejar de iterar (o cerrar el generador).
+    # simplify: tolerancia de la simplificación RDP en cm (0 para no simplificar)
+    key = None
+    if cache is not None:
+        key = cache_key(file_name, tolerance=tolerance, optimize=optimize, simplify=simplify,
+                        merge_collinear=merge_collinear)
+        toolpath = cache.get(key)
+        if toolpath is not None:
+            yield "toolpath", toolpath, 1.0
+            return
+    document = SvgDocument(file_name)
+    with open(file_name, "rb") as f:
+        size = os.fstat(f.fileno()).st_size or 1
+        for path in iter_svg(f, document, tolerance):
+            document.paths.append(path)
+            yield "contours", path, f.tell() / size
+    contours = document.contours
+    removed = 0
+    if simplify > 0 or merge_collinear:
+        yield "status", "Simplifying", 1.0
+        contours, removed = simplify_contours(contours, simplify, merge_collinear)
+    order = None
+    if optimize:
+        yield "status", "Optimizing cut order", 1.0
+        order = order_contours(contours)
+        contours = order.apply(contours)
+    toolpath = Toolpath.from_contours(contours, tolerance, document.width, document.height)
+    toolpath.removed_points = removed
+    if order is not None:
+        toolpath.rapid_before = order.rapid_before
+        toolpath.rapid_after = order.rapid_after
+    if key is not None:
+        cache.put(key, toolpath)
+    yield "toolpath", toolpath, 1.0
+
+
+def load_toolpath(file_name, tolerance, cache=None, optimize=False, simplify=0.0,
+                  merge_collinear=False):
+    # Trayectoria de un SVG, desde la caché si ya se compiló con los mismos parámetros
+    for kind, value, _ in iter_load_toolpath(file_name, tolerance, cache, optimize, simplify,
+                                             merge_collinear):
+        if kind == "toolpath":
+            return value